@@ -1,8 +1,9 @@
 from fastapi import APIRouter
-from app.api.endpoints import chat, crm, documents
+from app.api.endpoints import admin, chat, crm, documents
 
 api_router = APIRouter()
 
 api_router.include_router(chat.router, prefix="/chat", tags=["Chat"])
 api_router.include_router(crm.router, prefix="/crm", tags=["CRM"])
-api_router.include_router(documents.router, prefix="/documents", tags=["Documents"])
\ No newline at end of file
+api_router.include_router(documents.router, prefix="/documents", tags=["Documents"])
+api_router.include_router(admin.router, prefix="/admin", tags=["Admin"])
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException
+from app.services.dataset_service import dataset_manager
+
+router = APIRouter()
+
+@router.get("/datasets", tags=["Admin"])
+async def list_datasets():
+    """Lists the catalog of loaded datasets."""
+    return {"datasets": dataset_manager.list_datasets(), **dataset_manager.stats()}
+
+@router.get("/datasets/{dataset_id}/indexes", tags=["Admin"])
+async def get_dataset_indexes(dataset_id: str):
+    """Reports the indexes chosen by the index advisor, their observed speedups and pending candidates."""
+    if not dataset_manager.has_dataset(dataset_id):
+        raise HTTPException(status_code=404, detail="Dataset not found.")
+    return dataset_manager.get_service(dataset_id).index_advisor.report()
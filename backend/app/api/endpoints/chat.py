@@ -1,69 +1,169 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.db.session import get_database
 from app.schemas.message import ChatRequest, ChatResponse, ResetRequest
-from app.schemas.conversation import ConversationCreate, Message
+from app.schemas.conversation import ConversationWindow, Message
+from app.schemas.user import User
+from app.core.config import settings
 from app.crud import crud_conversation, crud_user
-from app.services.llm_service import generate_sql_from_prompt, synthesize_response_from_sql, generate_tags_for_conversation
-from app.services.text_to_sql_service import text_to_sql_service
+from app.services.llm_service import generate_sql_from_prompt, synthesize_response_from_sql, stream_response_from_sql, SQL_GENERATION_ERROR
+from app.services.dataset_service import dataset_manager
+from app.services.text_to_sql_service import TextToSQLService
+from app.services.cache_service import relevant_history, sql_translation_cache, sql_result_cache
+from app.services.metrics_service import SQL_ERRORS, STAGE_SECONDS, stage
+from app.services.memory_service import build_history, needs_summary_update, update_summary_in_background
+from app.services.tagging_worker import enqueue_tagging
+from app.services.session_service import get_session_user
+from app.services.query_guard import regeneration_feedback
+from app.services.response_router import CHAT_RESPONSES, small_talk_reply, template_reply
+from app.services.single_flight import SingleFlight
+from typing import Optional, Set
+import asyncio
+import json
+import logging
 import time
 
-router = APIRouter()
-
-async def update_tags_in_background(session_id: str, db: AsyncIOMotorDatabase):
-    """A background task to generate and save conversation tags."""
-    # Refetch the latest history to ensure it's complete
-    conversation = await crud_conversation.get_conversation_by_session_id(db, session_id)
-    if conversation:
-        history_str = "\n".join([f"{msg.role}: {msg.content}" for msg in conversation.messages])
-        tags = await generate_tags_for_conversation(history_str)
-        if tags:
-            await crud_conversation.update_conversation_tags(db, session_id, tags)
-            print(f"Updated tags for session {session_id}: {tags}")
+logger = logging.getLogger(__name__)
 
-@router.post("/", response_model=ChatResponse, tags=["Chat"])
-async def handle_chat(request: ChatRequest, background_tasks: BackgroundTasks, db: AsyncIOMotorDatabase = Depends(get_database)):
-    """Handles the Text-to-SQL conversation flow and CRM tagging."""
-    start_time = time.time()
+router = APIRouter()
 
-    # 1. Verify user
-    await crud_user.get_user_by_id(db, user_id=request.user_id)
+sql_generation_flights = SingleFlight("generate_sql")
+# Saves of streamed turns cut off by a disconnect; held so the tasks are not garbage-collected
+interrupted_turn_saves: Set[asyncio.Task] = set()
 
-    # 2. Get conversation history
-    conversation = await crud_conversation.get_conversation_by_session_id(db, session_id=request.session_id)
+async def load_turn_context(request: ChatRequest, db: AsyncIOMotorDatabase, session_user: Optional[User] = None):
+    """Verifies the user and returns the conversation and the user's dataset for this turn."""
+    # 1-2. Verify user and get the recent conversation window concurrently
+    if session_user is not None:
+        # The session token already identifies the user, so MongoDB is not asked again
+        if session_user.id != request.user_id:
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Session token does not belong to this user.")
+        conversation = await crud_conversation.get_conversation_window(db, request.session_id, settings.MEMORY_WINDOW_MESSAGES)
+    else:
+        _, conversation = await asyncio.gather(
+            crud_user.get_user_by_id(db, user_id=request.user_id),
+            crud_conversation.get_conversation_window(db, request.session_id, settings.MEMORY_WINDOW_MESSAGES),
+        )
     if not conversation:
-        new_convo_data = ConversationCreate(user_id=request.user_id, id=request.session_id)
-        conversation = await crud_conversation.create_conversation(db, new_convo_data)
-    
-    history_str = "\n".join([f"{msg.role}: {msg.content}" for msg in conversation.messages])
-
-    # 3. Get DB Schema
-    schema = text_to_sql_service.get_schema()
-    if "No schema loaded" in schema:
+        # New sessions are created by the upsert that saves the first turn
+        conversation = ConversationWindow(user_id=request.user_id, id=request.session_id)
+
+    # 3. Resolve the user's dataset and check its schema; a private dataset needs its owner's token
+    dataset_id = dataset_manager.resolve_dataset_id(request.user_id)
+    if dataset_id != settings.DEFAULT_DATASET_ID and session_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Querying a user's knowledge base requires their session token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    dataset = dataset_manager.get_service(dataset_id)
+    if "No schema loaded" in dataset.get_schema():
         raise HTTPException(status_code=400, detail="Knowledge base not loaded. Please upload a CSV file first.")
+    return conversation, dataset
+
+async def generate_sql_for_turn(request: ChatRequest, conversation, dataset: TextToSQLService) -> str:
+    """
+    Translates the user's question to SQL, serving cached translations without calling the LLM.
+    Identical questions that miss the cache at the same time share a single translation.
+    """
+    schema_hash = dataset.schema_hash
+    generated_sql = sql_translation_cache.get(dataset.dataset_id, schema_hash, request.message, conversation.messages)
+    if generated_sql is None:
+        # Keyed like the cache, so only questions that would share a cache entry share a translation
+        key = (dataset.version, sql_translation_cache.flight_key(dataset.dataset_id, schema_hash, request.message, conversation.messages))
+        generated_sql = await sql_generation_flights.do(key, lambda: translate_question(request, conversation, dataset, schema_hash))
+    return generated_sql
 
-    # 4. Generate SQL
+async def translate_question(request: ChatRequest, conversation, dataset: TextToSQLService, schema_hash: str) -> str:
+    """Asks the LLM for SQL. Queries the query guard rejects are regenerated with the reason before they are cached."""
+    history_str = build_history(conversation)
+    # Only the columns and data values relevant to the question go into the prompt
+    context = relevant_history(request.message, conversation.messages, settings.SQL_TRANSLATION_CACHE_CONTEXT_MESSAGES)
+    schema, literals = dataset.describe_for_question(request.message, context)
+    values_str = f"Values in the data that match the question:\n{literals}\n\n" if literals else ""
     sql_generation_prompt = (
-        f"Schema:\n{schema}\n\nConversation History:\n{history_str}\n\nUser's Latest Question: '{request.message}'\n\nQuery:"
+        f"Schema:\n{schema}\n\n{values_str}Conversation History:\n{history_str}\n\nUser's Latest Question: '{request.message}'\n\nQuery:"
     )
     generated_sql = await generate_sql_from_prompt(sql_generation_prompt)
+    checked = await dataset.check_query_async(generated_sql)
+    for _ in range(settings.SQL_GUARD_MAX_REGENERATIONS):
+        if not checked.rejected:
+            break
+        SQL_ERRORS.inc(reason="regenerated")
+        generated_sql = await generate_sql_from_prompt(sql_generation_prompt + regeneration_feedback(checked))
+        checked = await dataset.check_query_async(generated_sql)
+    if generated_sql != SQL_GENERATION_ERROR and not checked.rejected:
+        sql_translation_cache.put(dataset.dataset_id, schema_hash, request.message, conversation.messages, generated_sql)
+    return generated_sql
+
+async def save_turn(request: ChatRequest, llm_response: str, conversation, background_tasks: BackgroundTasks, db: AsyncIOMotorDatabase):
+    """Logs the turn to the CRM and schedules tagging and summary updates."""
+    messages = [Message(role="user", content=request.message)]
+    # A streamed turn the client left before any of the answer was sent has no assistant message
+    if llm_response:
+        messages.append(Message(role="assistant", content=llm_response))
+    await crud_conversation.append_turn(db, request.session_id, request.user_id, messages)
 
-    # 5. Execute SQL
-    sql_results = text_to_sql_service.execute_sql_query(generated_sql)
-
-    # 6. Synthesize Response
-    llm_response = await synthesize_response_from_sql(request.message, generated_sql, sql_results)
-    
-    # 7. Log messages to CRM
-    user_message = Message(role="user", content=request.message)
-    assistant_message = Message(role="assistant", content=llm_response)
-    await crud_conversation.add_message_to_conversation(db, session_id=request.session_id, message=user_message)
-    await crud_conversation.add_message_to_conversation(db, session_id=request.session_id, message=assistant_message)
-    
-    # 8. Trigger background task to update tags
     # This runs after the response is sent to the user, so it doesn't slow down the chat.
-    if len(conversation.messages) % 4 == 0: # Update tags every few turns
-         background_tasks.add_task(update_tags_in_background, request.session_id, db)
+    # Tagging is queued and debounced per session; the tagging worker batches the LLM calls
+    background_tasks.add_task(enqueue_tagging, db, request.session_id)
+    # The summary is only recomputed once the memory window has slid far enough
+    if needs_summary_update(conversation.message_count + len(messages), conversation.summarized_count):
+        background_tasks.add_task(update_summary_in_background, request.session_id, db)
+
+async def save_interrupted_turn(request: ChatRequest, partial_response: str, conversation, db: AsyncIOMotorDatabase):
+    """Logs a streamed turn the client disconnected from, with the part of the answer it was sent."""
+    background_tasks = BackgroundTasks()
+    await save_turn(request, partial_response, conversation, background_tasks, db)
+    # The response's own background tasks do not run once the client is gone
+    await background_tasks()
+
+@router.post("/", response_model=ChatResponse, tags=["Chat"])
+async def handle_chat(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    include_timings: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    session_user: Optional[User] = Depends(get_session_user),
+):
+    """
+    Handles the Text-to-SQL conversation flow and CRM tagging. Clients that send the session
+    token from `/crm/login` as a Bearer token skip the per-turn user lookup.
+    """
+    start_time = time.time()
+    timings = {}
+
+    with stage("total", timings):
+        # 1-3. Verify user, get conversation history and the user's dataset
+        with stage("load_context", timings):
+            conversation, dataset = await load_turn_context(request, db, session_user)
+
+        # Greetings and chit-chat need no SQL at all
+        llm_response = small_talk_reply(request.message)
+        if llm_response is not None:
+            CHAT_RESPONSES.inc(route="small_talk")
+        else:
+            # 4. Generate SQL
+            with stage("generate_sql", timings):
+                generated_sql = await generate_sql_for_turn(request, conversation, dataset)
+
+            # 5. Execute SQL
+            with stage("execute_sql", timings):
+                result = await dataset.run_query_async(generated_sql)
+
+            # 6. Synthesize Response; scalar and small results are phrased from templates
+            llm_response = template_reply(request.message, generated_sql, result)
+            if llm_response is not None:
+                CHAT_RESPONSES.inc(route="template")
+            else:
+                CHAT_RESPONSES.inc(route="llm")
+                with stage("synthesize", timings):
+                    llm_response = await synthesize_response_from_sql(request.message, generated_sql, result.text)
+
+        # 7-8. Log messages to CRM and trigger tagging
+        with stage("save_turn", timings):
+            await save_turn(request, llm_response, conversation, background_tasks, db)
 
     end_time = time.time()
     processing_time = round(end_time - start_time, 2)
@@ -72,12 +172,115 @@ async def handle_chat(request: ChatRequest, background_tasks: BackgroundTasks, d
         response=llm_response,
         session_id=request.session_id,
         processing_time=processing_time,
+        timings=timings if include_timings else None,
+    )
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/stream", tags=["Chat"])
+async def handle_chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    background_tasks: BackgroundTasks,
+    include_timings: bool = False,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    session_user: Optional[User] = Depends(get_session_user),
+):
+    """
+    Streams the Text-to-SQL conversation flow as Server-Sent Events: `sql_generated` and
+    `sql_executed` stage events, `token` events as the answer is synthesized, then `done`.
+    Answers that need no LLM call arrive as a single `token` event.
+    """
+    start_time = time.time()
+    timings = {}
+    # Validation errors are raised before the stream starts so they keep their status codes
+    with stage("load_context", timings):
+        conversation, dataset = await load_turn_context(request, db, session_user)
+
+    async def event_stream():
+        # The answer as sent so far, so a turn cut off by a disconnect can still be logged
+        sent = []
+        turn_saved = False
+        try:
+            llm_response = small_talk_reply(request.message)
+            if llm_response is not None:
+                CHAT_RESPONSES.inc(route="small_talk")
+                sent.append(llm_response)
+                yield format_sse("token", {"content": llm_response})
+            else:
+                with stage("generate_sql", timings):
+                    generated_sql = await generate_sql_for_turn(request, conversation, dataset)
+                yield format_sse("sql_generated", {"sql": generated_sql})
+
+                with stage("execute_sql", timings):
+                    result = await dataset.run_query_async(generated_sql)
+                yield format_sse("sql_executed", {"result_preview": result.text[:500]})
+
+                llm_response = template_reply(request.message, generated_sql, result)
+                if llm_response is not None:
+                    CHAT_RESPONSES.inc(route="template")
+                    sent.append(llm_response)
+                    yield format_sse("token", {"content": llm_response})
+                else:
+                    CHAT_RESPONSES.inc(route="llm")
+                    disconnected = False
+                    tokens = stream_response_from_sql(request.message, generated_sql, result.text)
+                    try:
+                        with stage("synthesize_stream", timings):
+                            async for token in tokens:
+                                if await http_request.is_disconnected():
+                                    disconnected = True
+                                    break
+                                sent.append(token)
+                                yield format_sse("token", {"content": token})
+                    finally:
+                        # Closing the generator cancels the upstream completion
+                        await tokens.aclose()
+                    if disconnected:
+                        logger.info(f"Client disconnected from session {request.session_id}; cancelled synthesis.")
+                        turn_saved = True
+                        await save_interrupted_turn(request, "".join(sent).strip(), conversation, db)
+                        return
+                    llm_response = "".join(sent).strip()
+
+            turn_saved = True
+            with stage("save_turn", timings):
+                await save_turn(request, llm_response, conversation, background_tasks, db)
+            processing_time = time.time() - start_time
+            STAGE_SECONDS.observe(processing_time, stage="stream_total")
+            done = {
+                "response": llm_response,
+                "session_id": request.session_id,
+                "processing_time": round(processing_time, 2),
+            }
+            if include_timings:
+                done["timings"] = {**timings, "total": round(processing_time, 4)}
+            yield format_sse("done", done)
+        except (asyncio.CancelledError, GeneratorExit):
+            # The server stops the stream when the client goes away. The turn is saved in its own
+            # task, since this one can no longer await.
+            if not turn_saved:
+                logger.info(f"Client disconnected from session {request.session_id}; saving the partial turn.")
+                task = asyncio.create_task(save_interrupted_turn(request, "".join(sent).strip(), conversation, db))
+                interrupted_turn_saves.add(task)
+                task.add_done_callback(interrupted_turn_saves.discard)
+            raise
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background_tasks,
     )
 
+@router.get("/cache/stats", tags=["Chat"])
+async def get_cache_stats():
+    """Reports hit/miss counters for the NL->SQL translation and SQL result caches."""
+    return {"sql_translation": sql_translation_cache.stats(), "sql_result": sql_result_cache.stats()}
+
 @router.post("/reset", tags=["Chat"])
 async def reset_conversation(request: ResetRequest, db: AsyncIOMotorDatabase = Depends(get_database)):
-    conversation = await crud_conversation.get_conversation_by_session_id(db, session_id=request.session_id)
-    if not conversation:
+    if not await crud_conversation.delete_conversation(db, session_id=request.session_id):
         raise HTTPException(status_code=404, detail="Session ID not found.")
-    await db["conversations"].delete_one({"id": request.session_id})
     return {"message": f"Conversation memory for session {request.session_id} has been cleared."}
\ No newline at end of file
@@ -1,15 +1,16 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Form, UploadFile, File
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.db.session import get_database
-from app.schemas.user import UserCreate, UserUpdate, User
+from app.schemas.user import UserCreate, UserUpdate, User, LoginResponse
 from app.crud import crud_user
-from app.schemas.conversation import ConversationInDB
+from app.schemas.conversation import ConversationInDB, ConversationPage
 from app.crud import crud_conversation
-from app.core.security import verify_password
-from app.services.text_to_sql_service import text_to_sql_service
-from typing import List
-import os
-import shutil
+from app.core.security import verify_password_async
+from app.services.session_service import get_session_user, session_service
+from app.services.ingestion_service import ingestion_service
+from app.core.config import settings
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -21,46 +22,42 @@ async def create_new_user(user: UserCreate, db: AsyncIOMotorDatabase = Depends(g
     return await crud_user.create_user(db=db, user_in=user)
 
 # --- NEW COMBINED LOGIN AND UPLOAD ENDPOINT ---
-@router.post("/login", response_model=User, tags=["CRM"])
+@router.post("/login", response_model=LoginResponse, tags=["CRM"])
 async def login_and_upload(
-    email: str = Form(...),
-    password: str = Form(...),
+    email: Optional[str] = Form(None),
+    password: Optional[str] = Form(None),
     file: UploadFile = File(...),
-    db: AsyncIOMotorDatabase = Depends(get_database)
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    session_user: Optional[User] = Depends(get_session_user),
 ):
     """
     Authenticates a user and uploads their CSV knowledge base in a single step.
+    The CSV is loaded in the background; poll `/documents/jobs/{ingestion_job_id}` for progress.
+    Returns a session token; sending it as a Bearer token instead of the password skips bcrypt.
     """
-    # Step 1: Authenticate user
-    user = await crud_user.get_user_by_email(db, email=email)
-    if not user or not verify_password(password, user.hashed_password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password",
-        )
+    # Step 1: Authenticate user, by session token or by password
+    if session_user is not None:
+        user = session_user
+    else:
+        db_user = await crud_user.get_user_by_email(db, email=email) if email and password else None
+        # bcrypt runs on the password thread pool so logins don't stall other requests
+        if not db_user or not await verify_password_async(password, db_user.hashed_password):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Incorrect email or password",
+            )
+        user = User(**db_user.dict())
 
-    # Step 2: Process and save the uploaded CSV file
+    # Step 2: Save the uploaded CSV file and queue it for loading
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are accepted.")
-    
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
-    file_path = os.path.join(temp_dir, file.filename)
 
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        success = text_to_sql_service.load_csv_to_sql(file_path)
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to process and load CSV into database.")
+        job = await ingestion_service.submit_upload(file, dataset_id=user.id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process file: {e}")
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
 
-    return User(**user.dict())
+    return LoginResponse(**user.dict(), ingestion_job_id=job.id, access_token=session_service.issue(user))
 # -----------------------------------------
 
 @router.get("/users/by_email", response_model=User, tags=["CRM"])
@@ -75,11 +72,67 @@ async def update_existing_user(user_id: str, user_update: UserUpdate, db: AsyncI
     db_user = await crud_user.get_user_by_id(db, user_id=user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found.")
-    return await crud_user.update_user(db=db, user_id=user_id, user_update=user_update)
+    updated_user = await crud_user.update_user(db=db, user_id=user_id, user_update=user_update)
+    # Cached sessions hold the old profile
+    session_service.invalidate_user(user_id)
+    return updated_user
 
-@router.get("/conversations/{user_id}", response_model=List[ConversationInDB], tags=["CRM"])
-async def get_user_conversations(user_id: str, db: AsyncIOMotorDatabase = Depends(get_database)):
+async def ensure_user_exists(db: AsyncIOMotorDatabase, user_id: str):
     db_user = await crud_user.get_user_by_id(db, user_id=user_id)
     if not db_user:
         raise HTTPException(status_code=404, detail="User not found.")
-    return await crud_conversation.get_conversations_by_user_id(db=db, user_id=user_id)
+
+@router.get("/conversations/{user_id}", response_model=List[ConversationInDB], tags=["CRM"])
+async def get_user_conversations(
+    user_id: str,
+    tag: Optional[str] = Query(None, description="Only conversations carrying this tag."),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """Every conversation of a user, newest first. Prefer `/page` or `/export` for large histories."""
+    await ensure_user_exists(db, user_id)
+    return await crud_conversation.get_conversations_by_user_id(db=db, user_id=user_id, tag=tag)
+
+@router.get("/conversations/{user_id}/page", response_model=ConversationPage, tags=["CRM"])
+async def get_user_conversations_page(
+    user_id: str,
+    limit: int = Query(settings.CRM_PAGE_SIZE, ge=1, le=settings.CRM_PAGE_SIZE_MAX),
+    cursor: Optional[str] = Query(None, description="`next_cursor` of the previous page."),
+    tag: Optional[str] = Query(None, description="Only conversations carrying this tag."),
+    include_messages: bool = Query(False, description="Include message bodies; `message_count` is always set."),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    One page of a user's conversations, newest first. Pages are keyed on (created_at, id),
+    so conversations added while paging do not shift or repeat entries.
+    """
+    try:
+        after = crud_conversation.decode_page_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    await ensure_user_exists(db, user_id)
+    items, has_more = await crud_conversation.get_conversations_page(
+        db, user_id, limit, tag=tag, include_messages=include_messages, after=after
+    )
+    next_cursor = crud_conversation.encode_page_cursor(items[-1]) if has_more else None
+    return ConversationPage(items=items, next_cursor=next_cursor)
+
+@router.get("/conversations/{user_id}/export", tags=["CRM"])
+async def export_user_conversations(
+    user_id: str,
+    tag: Optional[str] = Query(None, description="Only conversations carrying this tag."),
+    include_messages: bool = Query(True, description="Include message bodies."),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+):
+    """
+    Streams a user's conversations as NDJSON, one conversation per line, newest first.
+    Each document is serialized as it comes off the cursor, so memory does not grow with the history.
+    """
+    await ensure_user_exists(db, user_id)
+
+    async def ndjson_lines():
+        async for conversation in crud_conversation.iter_conversations_by_user_id(
+            db, user_id, tag=tag, include_messages=include_messages
+        ):
+            yield conversation.model_dump_json() + "\n"
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
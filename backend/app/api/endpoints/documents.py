@@ -1,32 +1,62 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, status
-from app.services.text_to_sql_service import text_to_sql_service
-import os
-import shutil
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, status
+from app.core.config import settings
+from app.schemas.ingestion import IngestionJob
+from app.schemas.user import User
+from app.services.ingestion_service import ingestion_service
+from app.services.row_delta import LOAD_MODES
+from app.services.session_service import get_session_user
+from typing import Optional
 
 router = APIRouter()
 
-@router.post("/upload-docs", status_code=status.HTTP_200_OK, tags=["Documents"])
-async def upload_document(file: UploadFile = File(...)):
+@router.post("/upload-docs", response_model=IngestionJob, status_code=status.HTTP_202_ACCEPTED, tags=["Documents"])
+async def upload_document(
+    file: UploadFile = File(...),
+    user_id: Optional[str] = Form(None),
+    mode: str = Form(
+        "replace",
+        description="replace, append, upsert or sync. The last three write to the loaded table whatever the file is "
+        "called, and fail without changes if the file's columns differ from it.",
+    ),
+    key_column: Optional[str] = Form(None),
+    session_user: Optional[User] = Depends(get_session_user),
+):
+    """
+    Accepts a CSV upload and loads it into the SQL knowledge base of the user the Bearer session
+    token belongs to, in the background, or into the shared default knowledge base without a token.
+    `user_id` is optional and must match the token's user.
+    `mode` is `replace` (the default) to rebuild the table from the file, or `append`, `upsert`
+    or `sync` to write only the rows that differ from the loaded table, matched on `key_column`
+    if given and on their full content otherwise. `sync` also deletes rows missing from the file.
+    These three modes always write to the loaded table, whatever the file is called, and the job
+    fails without changing anything if the file's columns differ from that table's.
+    Poll `/documents/jobs/{job_id}` for progress and the rows the load changed.
+    """
     if not file.filename.endswith(".csv"):
         raise HTTPException(status_code=400, detail="Only CSV files are accepted.")
-    
-    temp_dir = "temp_uploads"
-    os.makedirs(temp_dir, exist_ok=True)
-    file_path = os.path.join(temp_dir, file.filename)
+    if mode not in LOAD_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(LOAD_MODES)}.")
+    # A user's dataset is only written with that user's session token
+    if user_id and session_user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Uploading to a user's knowledge base requires their session token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if user_id and session_user.id != user_id:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Session token does not belong to this user.")
+    dataset_id = session_user.id if session_user is not None else settings.DEFAULT_DATASET_ID
 
     try:
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        success = text_to_sql_service.load_csv_to_sql(file_path)
-        if not success:
-            raise HTTPException(status_code=500, detail="Failed to process and load CSV into database.")
-
+        return await ingestion_service.submit_upload(
+            file, dataset_id=dataset_id, mode=mode, key_column=key_column or None,
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to process file: {e}")
-    finally:
-        if os.path.exists(file_path):
-            os.remove(file_path)
-
-    return {"message": f"Successfully uploaded and loaded {file.filename} into the SQL knowledge base."}
 
+@router.get("/jobs/{job_id}", response_model=IngestionJob, tags=["Documents"])
+async def get_ingestion_job(job_id: str):
+    job = ingestion_service.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found.")
+    return job
@@ -1,4 +1,5 @@
 import os
+import secrets
 from dotenv import load_dotenv
 from pathlib import Path
 
@@ -9,9 +10,124 @@ class Settings:
     PROJECT_NAME: str = "Multi-Agentic Conversational AI System"
     API_V1_STR: str = "/api/v1"
     OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
+    # Any OpenAI-compatible endpoint, e.g. the fake server used by the benchmarks
+    OPENAI_BASE_URL: str = os.getenv("OPENAI_BASE_URL")
+    # LLM gateway: "openai" for any OpenAI-compatible API, or "local" for the offline stand-in
+    LLM_BACKEND: str = os.getenv("LLM_BACKEND", "openai")
+    LLM_MODEL: str = os.getenv("LLM_MODEL", "gpt-4o-mini")
+    LLM_LOCAL_LATENCY_SECONDS: float = float(os.getenv("LLM_LOCAL_LATENCY_SECONDS", 0))
+    # Provider rate limits shared by all calls; 0 means unlimited
+    LLM_REQUESTS_PER_MINUTE: float = float(os.getenv("LLM_REQUESTS_PER_MINUTE", 0))
+    LLM_TOKENS_PER_MINUTE: float = float(os.getenv("LLM_TOKENS_PER_MINUTE", 0))
+    # Share of each rate-limit bucket that background calls (tagging, summaries) must leave free
+    LLM_BACKGROUND_RESERVE: float = float(os.getenv("LLM_BACKGROUND_RESERVE", 0.2))
+    LLM_INTERACTIVE_CONCURRENCY: int = int(os.getenv("LLM_INTERACTIVE_CONCURRENCY", 32))
+    LLM_BACKGROUND_CONCURRENCY: int = int(os.getenv("LLM_BACKGROUND_CONCURRENCY", 4))
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", 2))
+    LLM_BACKGROUND_MAX_RETRIES: int = int(os.getenv("LLM_BACKGROUND_MAX_RETRIES", 5))
+    LLM_RETRY_BASE_SECONDS: float = float(os.getenv("LLM_RETRY_BASE_SECONDS", 0.25))
+    LLM_RETRY_MAX_SECONDS: float = float(os.getenv("LLM_RETRY_MAX_SECONDS", 8))
+    LLM_ATTEMPT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", 20))
+    LLM_SQL_DEADLINE_SECONDS: float = float(os.getenv("LLM_SQL_DEADLINE_SECONDS", 20))
+    LLM_SYNTHESIS_DEADLINE_SECONDS: float = float(os.getenv("LLM_SYNTHESIS_DEADLINE_SECONDS", 45))
+    LLM_BACKGROUND_DEADLINE_SECONDS: float = float(os.getenv("LLM_BACKGROUND_DEADLINE_SECONDS", 120))
+    # A second SQL generation request is sent if the first takes longer than this; 0 disables hedging
+    LLM_SQL_HEDGE_AFTER_SECONDS: float = float(os.getenv("LLM_SQL_HEDGE_AFTER_SECONDS", 3))
     MONGO_URI: str = os.getenv("MONGO_URI")
     DB_NAME: str = os.getenv("DB_NAME")
-    # Path for the new SQLite database
+    # Signs session tokens. Must be set for deployments with several workers or nodes, and to keep
+    # sessions valid across restarts: without it every process generates its own key at startup
+    SECRET_KEY_CONFIGURED: bool = bool(os.getenv("SECRET_KEY"))
+    SECRET_KEY: str = os.getenv("SECRET_KEY") or secrets.token_urlsafe(32)
+    SESSION_TOKEN_TTL_SECONDS: int = int(os.getenv("SESSION_TOKEN_TTL_SECONDS", 12 * 3600))
+    # Verified sessions are cached so authenticated requests skip the user lookup in MongoDB
+    SESSION_CACHE_MAX_ENTRIES: int = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", 10_000))
+    SESSION_CACHE_TTL_SECONDS: float = float(os.getenv("SESSION_CACHE_TTL_SECONDS", 300))
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    MONGO_MAX_POOL_SIZE: int = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE: int = int(os.getenv("MONGO_MIN_POOL_SIZE", 10))
+    MONGO_MAX_IDLE_TIME_MS: int = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", 300_000))
+    # Path for the SQLite database of the shared default dataset
     SQLITE_DB_PATH: str = "knowledge_base.db"
+    # Per-user datasets, each in its own SQLite file
+    DATASETS_DIR: str = os.getenv("DATASETS_DIR", "datasets")
+    DEFAULT_DATASET_ID: str = "default"
+    # Persisted dataset catalog shared by all workers; keep it on the same volume as the datasets
+    CATALOG_DB_PATH: str = os.getenv("CATALOG_DB_PATH", os.path.join(os.getenv("DATASETS_DIR", "datasets"), "catalog.db"))
+    MAX_OPEN_DATASETS: int = int(os.getenv("MAX_OPEN_DATASETS", 64))
+    # NL->SQL translation cache
+    SQL_TRANSLATION_CACHE_MAX_ENTRIES: int = int(os.getenv("SQL_TRANSLATION_CACHE_MAX_ENTRIES", 2048))
+    SQL_TRANSLATION_CACHE_TTL_SECONDS: float = float(os.getenv("SQL_TRANSLATION_CACHE_TTL_SECONDS", 3600))
+    SQL_TRANSLATION_CACHE_CONTEXT_MESSAGES: int = int(os.getenv("SQL_TRANSLATION_CACHE_CONTEXT_MESSAGES", 2))
+    # SQL result cache, bounded by the size of the stored results
+    SQL_RESULT_CACHE_MAX_BYTES: int = int(os.getenv("SQL_RESULT_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+    # Identical concurrent questions share one SQL generation, query and synthesis
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+    # Read-only SQLite connection pool used to run queries off the event loop
+    SQLITE_POOL_SIZE: int = int(os.getenv("SQLITE_POOL_SIZE", 4))
+    SQLITE_POOL_SIZE_PER_DATASET: int = int(os.getenv("SQLITE_POOL_SIZE_PER_DATASET", 2))
+    SQLITE_QUERY_TIMEOUT_SECONDS: float = float(os.getenv("SQLITE_QUERY_TIMEOUT_SECONDS", 10))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+    SQLITE_PROGRESS_HANDLER_STEPS: int = int(os.getenv("SQLITE_PROGRESS_HANDLER_STEPS", 1000))
+    # Query guard: generated SQL must be a single read-only SELECT within these limits; 0 disables a limit
+    SQL_GUARD_MAX_ROWS: int = int(os.getenv("SQL_GUARD_MAX_ROWS", 100_000))
+    SQL_GUARD_MAX_SCAN_ROWS: int = int(os.getenv("SQL_GUARD_MAX_SCAN_ROWS", 10_000_000))
+    SQL_GUARD_MAX_JOIN_ROWS: int = int(os.getenv("SQL_GUARD_MAX_JOIN_ROWS", 100_000_000))
+    # SQLite VM instructions a query may run before it is cancelled, bounding CPU per request
+    SQL_GUARD_MAX_VM_STEPS: int = int(os.getenv("SQL_GUARD_MAX_VM_STEPS", 200_000_000))
+    # How often a rejected query is sent back to the LLM with the reason
+    SQL_GUARD_MAX_REGENERATIONS: int = int(os.getenv("SQL_GUARD_MAX_REGENERATIONS", 1))
+    # Reviews and plans kept per dataset, so a checked query is not planned again when it runs
+    SQL_GUARD_REVIEW_CACHE_MAX_ENTRIES: int = int(os.getenv("SQL_GUARD_REVIEW_CACHE_MAX_ENTRIES", 1024))
+    SQL_GUARD_REVIEW_CACHE_TTL_SECONDS: float = float(os.getenv("SQL_GUARD_REVIEW_CACHE_TTL_SECONDS", 600))
+    # Background CSV ingestion
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "temp_uploads")
+    INGESTION_CHUNK_ROWS: int = int(os.getenv("INGESTION_CHUNK_ROWS", 50_000))
+    INGESTION_ROWS_PER_TRANSACTION: int = int(os.getenv("INGESTION_ROWS_PER_TRANSACTION", 500_000))
+    INGESTION_MAX_WORKERS: int = int(os.getenv("INGESTION_MAX_WORKERS", 1))
+    INGESTION_MAX_TRACKED_JOBS: int = int(os.getenv("INGESTION_MAX_TRACKED_JOBS", 200))
+    # In-place loads (append, upsert, sync) refresh the planner statistics when they change more than this share of the rows
+    INGESTION_ANALYZE_CHANGED_SHARE: float = float(os.getenv("INGESTION_ANALYZE_CHANGED_SHARE", 0.1))
+    # Budget for query results rendered into the synthesis prompt
+    RESULT_TOKEN_BUDGET: int = int(os.getenv("RESULT_TOKEN_BUDGET", 1500))
+    RESULT_SUMMARY_MAX_ROWS: int = int(os.getenv("RESULT_SUMMARY_MAX_ROWS", 100_000))
+    # Schema and value index used to show the model only the columns and values a question needs
+    SCHEMA_INDEX_ENABLED: bool = os.getenv("SCHEMA_INDEX_ENABLED", "true").lower() == "true"
+    # Tables narrower than this always get the full schema
+    SCHEMA_PRUNE_MIN_COLUMNS: int = int(os.getenv("SCHEMA_PRUNE_MIN_COLUMNS", 30))
+    # The first columns (usually IDs, names and addresses) are always shown
+    SCHEMA_PRUNE_KEY_COLUMNS: int = int(os.getenv("SCHEMA_PRUNE_KEY_COLUMNS", 3))
+    SCHEMA_INDEX_MAX_DISTINCT_PER_COLUMN: int = int(os.getenv("SCHEMA_INDEX_MAX_DISTINCT_PER_COLUMN", 25_000))
+    SCHEMA_INDEX_MAX_VALUES: int = int(os.getenv("SCHEMA_INDEX_MAX_VALUES", 100_000))
+    SCHEMA_INDEX_MAX_VALUE_CHARS: int = int(os.getenv("SCHEMA_INDEX_MAX_VALUE_CHARS", 80))
+    # Share of a value's words that must appear in the question for it to count as mentioned
+    SCHEMA_INDEX_MATCH_THRESHOLD: float = float(os.getenv("SCHEMA_INDEX_MATCH_THRESHOLD", 0.6))
+    SCHEMA_INDEX_MAX_LITERALS: int = int(os.getenv("SCHEMA_INDEX_MAX_LITERALS", 10))
+    # Response router: greetings and small results are answered from templates without the synthesis LLM call
+    RESPONSE_ROUTER_ENABLED: bool = os.getenv("RESPONSE_ROUTER_ENABLED", "true").lower() == "true"
+    RESPONSE_TEMPLATE_MAX_ROWS: int = int(os.getenv("RESPONSE_TEMPLATE_MAX_ROWS", 5))
+    RESPONSE_TEMPLATE_MAX_COLUMNS: int = int(os.getenv("RESPONSE_TEMPLATE_MAX_COLUMNS", 4))
+    # Conversation memory: a verbatim window of recent messages plus a rolling summary
+    MEMORY_WINDOW_MESSAGES: int = int(os.getenv("MEMORY_WINDOW_MESSAGES", 8))
+    MEMORY_SUMMARY_STEP_MESSAGES: int = int(os.getenv("MEMORY_SUMMARY_STEP_MESSAGES", 4))
+    MEMORY_TOKEN_BUDGET: int = int(os.getenv("MEMORY_TOKEN_BUDGET", 1200))
+    MEMORY_SUMMARY_MAX_TOKENS: int = int(os.getenv("MEMORY_SUMMARY_MAX_TOKENS", 300))
+    # CRM conversation listing: keyset pages, newest first
+    CRM_PAGE_SIZE: int = int(os.getenv("CRM_PAGE_SIZE", 50))
+    CRM_PAGE_SIZE_MAX: int = int(os.getenv("CRM_PAGE_SIZE_MAX", 500))
+    # Automatic index advisor
+    INDEX_ADVISOR_ENABLED: bool = os.getenv("INDEX_ADVISOR_ENABLED", "true").lower() == "true"
+    INDEX_ADVISOR_USAGE_THRESHOLD: int = int(os.getenv("INDEX_ADVISOR_USAGE_THRESHOLD", 5))
+    INDEX_ADVISOR_MAX_INDEXES: int = int(os.getenv("INDEX_ADVISOR_MAX_INDEXES", 8))
+    INDEX_ADVISOR_MAX_COMPOSITE_COLUMNS: int = int(os.getenv("INDEX_ADVISOR_MAX_COMPOSITE_COLUMNS", 3))
+    INDEX_ADVISOR_IDLE_SECONDS: float = float(os.getenv("INDEX_ADVISOR_IDLE_SECONDS", 7 * 24 * 3600))
+    INDEX_ADVISOR_IDLE_CHECK_EVERY: int = int(os.getenv("INDEX_ADVISOR_IDLE_CHECK_EVERY", 500))
+    # Background conversation tagging
+    TAGGING_DEBOUNCE_SECONDS: float = float(os.getenv("TAGGING_DEBOUNCE_SECONDS", 120))
+    TAGGING_BATCH_SIZE: int = int(os.getenv("TAGGING_BATCH_SIZE", 10))
+    TAGGING_MAX_CONCURRENCY: int = int(os.getenv("TAGGING_MAX_CONCURRENCY", 2))
+    TAGGING_POLL_INTERVAL_SECONDS: float = float(os.getenv("TAGGING_POLL_INTERVAL_SECONDS", 5))
+    TAGGING_LEASE_SECONDS: float = float(os.getenv("TAGGING_LEASE_SECONDS", 300))
+    TAGGING_YIELD_TO_INTERACTIVE: int = int(os.getenv("TAGGING_YIELD_TO_INTERACTIVE", 8))
 
 settings = Settings()
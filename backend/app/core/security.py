@@ -1,9 +1,71 @@
-from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from app.core.config import settings
+from typing import Optional
+import asyncio
+import base64
+import bcrypt
+import hashlib
+import hmac
+import json
+import time
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt only uses the first 72 bytes of a password; longer ones are truncated as passlib did
+BCRYPT_MAX_PASSWORD_BYTES = 72
+
+# bcrypt releases the GIL, so hashing in these threads keeps the event loop responsive
+password_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+
+def _password_bytes(password: str) -> bytes:
+    return password.encode("utf-8")[:BCRYPT_MAX_PASSWORD_BYTES]
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(_password_bytes(plain_password), hashed_password.encode("utf-8"))
+    except ValueError:
+        # Not a bcrypt hash
+        return False
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt()).decode("utf-8")
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verifies a password on the password thread pool instead of the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hashes a password on the password thread pool instead of the event loop."""
+    return await asyncio.get_running_loop().run_in_executor(password_executor, get_password_hash, password)
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(settings.SECRET_KEY.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest())
+
+def create_session_token(user_id: str, ttl_seconds: int = settings.SESSION_TOKEN_TTL_SECONDS) -> str:
+    """Issues an HMAC-signed session token: base64url(JSON claims) + "." + base64url(signature)."""
+    now = int(time.time())
+    payload = _b64encode(json.dumps({"sub": user_id, "iat": now, "exp": now + ttl_seconds}, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+def decode_session_token(token: str) -> Optional[dict]:
+    """Returns the token's claims, or None if it is malformed, forged or expired."""
+    payload, _, signature = token.partition(".")
+    if not payload or not signature:
+        return None
+    try:
+        if not hmac.compare_digest(signature.encode("ascii"), _sign(payload).encode("ascii")):
+            return None
+    except UnicodeEncodeError:
+        # Tokens are issued in base64url; a non-ASCII one was never issued by us
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or not isinstance(claims.get("sub"), str) or claims.get("exp", 0) < time.time():
+        return None
+    return claims
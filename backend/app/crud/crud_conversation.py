@@ -1,26 +1,151 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from app.schemas.conversation import ConversationCreate, ConversationInDB, Message
-from typing import List, Optional
+from pymongo import DESCENDING
+from app.schemas.conversation import ConversationCreate, ConversationInDB, ConversationWindow, Message
+from app.services.metrics_service import track_mongo
+from datetime import datetime
+from typing import AsyncIterator, List, Optional, Tuple
+import base64
+import json
 
+# Everything on a conversation except the message array, for projections
+CONVERSATION_FIELDS = {"id": 1, "user_id": 1, "tags": 1, "created_at": 1, "summary": 1, "summarized_count": 1}
+# Newest first; the id breaks ties between conversations created in the same millisecond
+CONVERSATION_ORDER = [("created_at", DESCENDING), ("id", DESCENDING)]
+
+@track_mongo
 async def create_conversation(db: AsyncIOMotorDatabase, conversation: ConversationCreate) -> ConversationInDB:
     convo_data = conversation.dict()
     await db["conversations"].insert_one(convo_data)
     return ConversationInDB(**convo_data)
 
+@track_mongo
 async def get_conversation_by_session_id(db: AsyncIOMotorDatabase, session_id: str) -> Optional[ConversationInDB]:
     convo_data = await db["conversations"].find_one({"id": session_id})
     return ConversationInDB(**convo_data) if convo_data else None
 
+@track_mongo
+async def get_conversation_window(db: AsyncIOMotorDatabase, session_id: str, last_messages: int) -> Optional[ConversationWindow]:
+    """Fetches a conversation with only its last messages and the total message count."""
+    convo_data = await db["conversations"].find_one(
+        {"id": session_id},
+        {
+            **CONVERSATION_FIELDS,
+            "_id": 0,
+            "messages": {"$slice": -last_messages},
+            "message_count": {"$size": {"$ifNull": ["$messages", []]}},
+        },
+    )
+    return ConversationWindow(**convo_data) if convo_data else None
+
+@track_mongo
+async def get_messages_range(db: AsyncIOMotorDatabase, session_id: str, start: int, count: int) -> List[Message]:
+    """Fetches `count` messages starting at index `start` without loading the rest of the array."""
+    convo_data = await db["conversations"].find_one({"id": session_id}, {"_id": 0, "id": 1, "messages": {"$slice": [start, count]}})
+    return [Message(**msg) for msg in convo_data.get("messages", [])] if convo_data else []
+
+@track_mongo
+async def append_turn(db: AsyncIOMotorDatabase, session_id: str, user_id: str, messages: List[Message]):
+    """Appends a turn's messages in one round trip, creating the conversation if it does not exist."""
+    await db["conversations"].update_one(
+        {"id": session_id},
+        {
+            "$push": {"messages": {"$each": [message.dict() for message in messages]}},
+            "$setOnInsert": {
+                "user_id": user_id,
+                "tags": [],
+                "created_at": datetime.utcnow(),
+                "summary": "",
+                "summarized_count": 0,
+            },
+        },
+        upsert=True,
+    )
+
+@track_mongo
+async def delete_conversation(db: AsyncIOMotorDatabase, session_id: str) -> bool:
+    result = await db["conversations"].delete_one({"id": session_id})
+    return result.deleted_count > 0
+
+@track_mongo
 async def add_message_to_conversation(db: AsyncIOMotorDatabase, session_id: str, message: Message):
     await db["conversations"].update_one({"id": session_id}, {"$push": {"messages": message.dict()}})
 
+@track_mongo
 async def update_conversation_tags(db: AsyncIOMotorDatabase, session_id: str, tags: List[str]):
     """Updates the tags for a given conversation."""
     await db["conversations"].update_one({"id": session_id}, {"$set": {"tags": tags}})
 
-async def get_conversations_by_user_id(db: AsyncIOMotorDatabase, user_id: str) -> List[ConversationInDB]:
+@track_mongo
+async def update_conversation_summary(db: AsyncIOMotorDatabase, session_id: str, summary: str, summarized_count: int):
+    """Stores the rolling summary and how many leading messages it covers."""
+    await db["conversations"].update_one(
+        {"id": session_id, "summarized_count": {"$not": {"$gt": summarized_count}}},
+        {"$set": {"summary": summary, "summarized_count": summarized_count}},
+    )
+
+def encode_page_cursor(conversation: ConversationInDB) -> str:
+    """Opaque cursor for the page that starts after `conversation`."""
+    position = json.dumps([conversation.created_at.isoformat(), conversation.id])
+    return base64.urlsafe_b64encode(position.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+def decode_page_cursor(cursor: str) -> Tuple[datetime, str]:
+    """Inverse of encode_page_cursor. Raises ValueError for a cursor it did not issue."""
+    try:
+        created_at, convo_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), str(convo_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid page cursor: {cursor!r}") from e
+
+def _user_conversations_query(user_id: str, tag: Optional[str], after: Optional[Tuple[datetime, str]] = None) -> dict:
+    query = {"user_id": user_id}
+    if tag is not None:
+        query["tags"] = tag
+    if after is not None:
+        # Keyset: everything strictly after the last (created_at, id) seen, in CONVERSATION_ORDER
+        created_at, convo_id = after
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "id": {"$lt": convo_id}},
+        ]
+    return query
+
+def _listing_projection(include_messages: bool) -> dict:
+    projection = {**CONVERSATION_FIELDS, "_id": 0, "message_count": {"$size": {"$ifNull": ["$messages", []]}}}
+    if include_messages:
+        projection["messages"] = 1
+    return projection
+
+@track_mongo
+async def get_conversations_by_user_id(db: AsyncIOMotorDatabase, user_id: str, tag: Optional[str] = None) -> List[ConversationInDB]:
     conversations = []
-    cursor = db["conversations"].find({"user_id": user_id})
+    cursor = db["conversations"].find(_user_conversations_query(user_id, tag), {"_id": 0}).sort(CONVERSATION_ORDER)
     async for document in cursor:
         conversations.append(ConversationInDB(**document))
-    return conversations
\ No newline at end of file
+    return conversations
+
+@track_mongo
+async def get_conversations_page(
+    db: AsyncIOMotorDatabase,
+    user_id: str,
+    limit: int,
+    tag: Optional[str] = None,
+    include_messages: bool = False,
+    after: Optional[Tuple[datetime, str]] = None,
+) -> Tuple[List[ConversationWindow], bool]:
+    """
+    Fetches up to `limit` conversations after the keyset position `after`, newest first.
+    Returns the page and whether more conversations follow it.
+    """
+    cursor = db["conversations"].find(
+        _user_conversations_query(user_id, tag, after), _listing_projection(include_messages)
+    ).sort(CONVERSATION_ORDER).limit(limit + 1)
+    documents = await cursor.to_list(length=limit + 1)
+    return [ConversationWindow(**document) for document in documents[:limit]], len(documents) > limit
+
+async def iter_conversations_by_user_id(
+    db: AsyncIOMotorDatabase, user_id: str, tag: Optional[str] = None, include_messages: bool = True
+) -> AsyncIterator[ConversationWindow]:
+    """Yields a user's conversations, newest first, as the cursor returns them."""
+    cursor = db["conversations"].find(_user_conversations_query(user_id, tag), _listing_projection(include_messages))
+    async for document in cursor.sort(CONVERSATION_ORDER):
+        yield ConversationWindow(**document)
\ No newline at end of file
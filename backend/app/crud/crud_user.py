@@ -1,22 +1,27 @@
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from app.schemas.user import UserCreate, UserUpdate, UserInDBBase, User
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async
+from app.services.metrics_service import track_mongo
 from typing import Optional
 
+@track_mongo
 async def get_user_by_email(db: AsyncIOMotorDatabase, email: str) -> Optional[UserInDBBase]:
     user = await db["users"].find_one({"email": email})
     return UserInDBBase(**user) if user else None
 
+@track_mongo
 async def get_user_by_id(db: AsyncIOMotorDatabase, user_id: str) -> Optional[User]:
-    user = await db["users"].find_one({"id": user_id})
+    user = await db["users"].find_one({"id": user_id}, {"_id": 0, "hashed_password": 0})
     return User(**user) if user else None
 
+@track_mongo
 async def create_user(db: AsyncIOMotorDatabase, user_in: UserCreate) -> User:
-    hashed_password = get_password_hash(user_in.password)
+    hashed_password = await get_password_hash_async(user_in.password)
     db_user = UserInDBBase(**user_in.dict(exclude={"password"}), hashed_password=hashed_password)
     await db["users"].insert_one(db_user.dict())
     return User(**db_user.dict())
 
+@track_mongo
 async def update_user(db: AsyncIOMotorDatabase, user_id: str, user_update: UserUpdate) -> Optional[User]:
     update_data = {k: v for k, v in user_update.dict().items() if v is not None}
     if not update_data:
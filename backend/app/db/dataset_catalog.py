@@ -0,0 +1,127 @@
+from dataclasses import dataclass
+from datetime import datetime
+from typing import List, Optional
+import os
+import sqlite3
+import threading
+
+CATALOG_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS datasets (
+        dataset_id TEXT PRIMARY KEY,
+        db_path TEXT NOT NULL,
+        table_name TEXT,
+        schema TEXT,
+        version INTEGER NOT NULL,
+        row_count INTEGER NOT NULL DEFAULT 0,
+        content_hash TEXT,
+        updated_at TEXT
+    )
+    """,
+    # Versions are handed out before a load starts, so concurrent loads never share one
+    """
+    CREATE TABLE IF NOT EXISTS dataset_versions (
+        dataset_id TEXT PRIMARY KEY,
+        last_version INTEGER NOT NULL
+    )
+    """,
+)
+CATALOG_COLUMNS = "dataset_id, db_path, table_name, schema, version, row_count, content_hash, updated_at"
+
+
+@dataclass
+class DatasetCatalogEntry:
+    """Where a dataset lives and what is loaded in it."""
+    dataset_id: str
+    db_path: str
+    table_name: Optional[str] = None
+    schema: Optional[str] = None
+    version: int = 0
+    row_count: int = 0
+    # SHA-256 of the CSV the table was loaded from
+    content_hash: Optional[str] = None
+    updated_at: Optional[datetime] = None
+
+
+class DatasetCatalogStore:
+    """
+    The dataset catalog persisted in a SQLite file next to the datasets, shared by every worker
+    and node that uses the same DATASETS_DIR. Changes made by other connections are detected
+    with PRAGMA data_version, which costs no I/O when nothing changed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._data_version: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            connection.execute("PRAGMA journal_mode = WAL")
+            for statement in CATALOG_SCHEMA:
+                connection.execute(statement)
+            connection.commit()
+            self._connection = connection
+        return self._connection
+
+    def changed(self) -> bool:
+        """True on the first call and whenever another connection has committed since the last call."""
+        with self._lock:
+            data_version = self._connect().execute("PRAGMA data_version").fetchone()[0]
+            changed = data_version != self._data_version
+            self._data_version = data_version
+            return changed
+
+    def load_all(self) -> List[DatasetCatalogEntry]:
+        with self._lock:
+            rows = self._connect().execute(f"SELECT {CATALOG_COLUMNS} FROM datasets").fetchall()
+        return [
+            DatasetCatalogEntry(*row[:7], updated_at=datetime.fromisoformat(row[7]) if row[7] else None)
+            for row in rows
+        ]
+
+    def reserve_version(self, dataset_id: str) -> int:
+        """Returns a new version number for the dataset, unique across all workers."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                row = connection.execute(
+                    """
+                    INSERT INTO dataset_versions (dataset_id, last_version)
+                    SELECT ?, COALESCE(MAX(version), 0) + 1 FROM datasets WHERE dataset_id = ?
+                    ON CONFLICT (dataset_id) DO UPDATE SET last_version = last_version + 1
+                    RETURNING last_version
+                    """,
+                    (dataset_id, dataset_id),
+                ).fetchone()
+            return row[0]
+
+    def save(self, entry: DatasetCatalogEntry) -> bool:
+        """Records a finished load. A load that finishes after a newer one does not overwrite it."""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                cursor = connection.execute(
+                    f"""
+                    INSERT INTO datasets ({CATALOG_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (dataset_id) DO UPDATE SET
+                        db_path = excluded.db_path, table_name = excluded.table_name, schema = excluded.schema,
+                        version = excluded.version, row_count = excluded.row_count,
+                        content_hash = excluded.content_hash, updated_at = excluded.updated_at
+                    WHERE excluded.version > datasets.version
+                    """,
+                    (
+                        entry.dataset_id, entry.db_path, entry.table_name, entry.schema, entry.version,
+                        entry.row_count, entry.content_hash, entry.updated_at.isoformat() if entry.updated_at else None,
+                    ),
+                )
+            return cursor.rowcount > 0
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
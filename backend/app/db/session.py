@@ -1,4 +1,5 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
 from app.core.config import settings
 
 class DBMongo:
@@ -19,8 +20,32 @@ async def connect_to_mongo():
     Establishes the connection to the MongoDB database.
     """
     print("Connecting to MongoDB...")
-    db.client = AsyncIOMotorClient(settings.MONGO_URI)
+    db.client = AsyncIOMotorClient(
+        settings.MONGO_URI,
+        maxPoolSize=settings.MONGO_MAX_POOL_SIZE,
+        minPoolSize=settings.MONGO_MIN_POOL_SIZE,
+        maxIdleTimeMS=settings.MONGO_MAX_IDLE_TIME_MS,
+    )
     print("Successfully connected to MongoDB.")
+    await ensure_indexes(db.client[settings.DB_NAME])
+
+async def ensure_indexes(database: AsyncIOMotorDatabase):
+    """
+    Creates the indexes the CRUD layer relies on. create_index is a no-op for existing indexes.
+    """
+    try:
+        await database["conversations"].create_index([("id", ASCENDING)], unique=True)
+        # Keyset pages of a user's conversations, with and without a tag filter
+        await database["conversations"].create_index([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)])
+        await database["conversations"].create_index(
+            [("user_id", ASCENDING), ("tags", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]
+        )
+        await database["users"].create_index([("email", ASCENDING)], unique=True)
+        await database["users"].create_index([("id", ASCENDING)], unique=True)
+        print("MongoDB indexes ensured.")
+    except Exception as e:
+        # Duplicate legacy data must not keep the API from starting
+        print(f"Error ensuring MongoDB indexes: {e}")
 
 async def close_mongo_connection():
     """
@@ -0,0 +1,139 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from app.core.config import settings
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Dedicated threads for SQLite work so slow queries never block the event loop
+query_executor = ThreadPoolExecutor(max_workers=settings.SQLITE_POOL_SIZE, thread_name_prefix="sqlite-query")
+# A single background writer for index maintenance, kept apart from the query threads
+maintenance_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-maintenance")
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query is interrupted for exceeding its wall-clock budget."""
+
+
+class QueryBudgetError(Exception):
+    """Raised when a query is interrupted for exceeding its VM-step budget."""
+
+
+class SQLiteReadPool:
+    """
+    A bounded pool of read-only SQLite connections. Connections are opened lazily in
+    query_only mode with memory-mapped I/O, and queries are interrupted through SQLite's
+    progress handler once they exceed their timeout.
+    """
+
+    def __init__(self, db_path: str, size: int = settings.SQLITE_POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._closed = False
+        # VM steps counted by the progress handler, per checked-out connection
+        self._steps: Dict[int, int] = {}
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        connection.execute("PRAGMA query_only = ON")
+        connection.execute(f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}")
+        # Sorts and DISTINCTs over huge results spill to temporary files instead of growing memory
+        connection.execute("PRAGMA temp_store = FILE")
+        return connection
+
+    def acquire(self, timeout: float = None) -> sqlite3.Connection:
+        """
+        Checks out an idle connection, opening one while the pool is below its size. Waits at most
+        `timeout` seconds (forever when None) for a busy connection and then raises QueryTimeoutError.
+        """
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise QueryTimeoutError(f"No SQLite connection became free within {timeout:.3g}s.") from None
+
+    def release(self, connection: sqlite3.Connection):
+        if self._closed:
+            connection.close()
+            with self._lock:
+                self._opened -= 1
+            return
+        self._idle.put(connection)
+
+    @contextmanager
+    def connection(self, timeout: float = settings.SQLITE_QUERY_TIMEOUT_SECONDS, max_steps: int = settings.SQL_GUARD_MAX_VM_STEPS):
+        """
+        Yields a pooled connection whose queries are interrupted after `timeout` seconds or
+        once they have run `max_steps` SQLite VM instructions in total (0 for no step limit).
+        Waiting for a free connection counts against the same deadline.
+        """
+        deadline = time.monotonic() + timeout
+        connection = self.acquire(timeout)
+        key = id(connection)
+        self._steps[key] = 0
+        steps_per_call = settings.SQLITE_PROGRESS_HANDLER_STEPS
+        steps = 0
+
+        def progress():
+            nonlocal steps
+            steps += steps_per_call
+            self._steps[key] = steps
+            if max_steps and steps > max_steps:
+                return 1
+            return 1 if time.monotonic() > deadline else 0
+
+        connection.set_progress_handler(progress, steps_per_call)
+        try:
+            yield connection
+        except sqlite3.OperationalError as e:
+            if "interrupted" in str(e) and max_steps and steps > max_steps:
+                raise QueryBudgetError(f"Query exceeded the budget of {max_steps:,} SQLite VM steps and was cancelled.") from e
+            if "interrupted" in str(e) and time.monotonic() > deadline:
+                raise QueryTimeoutError(f"Query exceeded the {timeout}s time limit and was interrupted.") from e
+            raise
+        finally:
+            connection.set_progress_handler(None, 0)
+            self._steps.pop(key, None)
+            self.release(connection)
+
+    def steps_run(self, connection: sqlite3.Connection) -> int:
+        """
+        SQLite VM instructions run so far on a connection checked out with connection(), counted
+        in units of SQLITE_PROGRESS_HANDLER_STEPS.
+        """
+        return self._steps.get(id(connection), 0)
+
+    def close(self):
+        """Closes idle connections; connections in use are closed when they are released."""
+        self._closed = True
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._opened -= 1
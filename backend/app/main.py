@@ -1,8 +1,14 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
 from app.api.api import api_router
-from app.db.session import close_mongo_connection, connect_to_mongo
+from app.db.session import close_mongo_connection, connect_to_mongo, get_database
+from app.services.metrics_service import registry
+from app.services.tagging_worker import tagging_worker
 from fastapi.middleware.cors import CORSMiddleware
+import logging
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="Multi-Agentic Conversational AI System",
@@ -27,13 +33,20 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
-    """Connect to MongoDB on startup."""
+    """Connect to MongoDB and start the tagging worker on startup."""
+    if not settings.SECRET_KEY_CONFIGURED:
+        logger.warning(
+            "SECRET_KEY is not set; this process signs session tokens with a random key of its own. "
+            "Tokens will fail on other workers and after a restart. Set SECRET_KEY for any multi-worker deployment."
+        )
     await connect_to_mongo()
+    await tagging_worker.start(await get_database())
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    """Close MongoDB connection on shutdown."""
+    """Stop the tagging worker and close MongoDB connection on shutdown."""
+    await tagging_worker.stop()
     await close_mongo_connection()
 
 app.include_router(api_router, prefix=settings.API_V1_STR)
@@ -41,4 +54,9 @@ app.include_router(api_router, prefix=settings.API_V1_STR)
 @app.get("/", tags=["Root"])
 async def read_root():
     """A simple root endpoint to confirm the API is running."""
-    return {"message": "Welcome to the Multi-Agentic Conversational AI API!"}
\ No newline at end of file
+    return {"message": "Welcome to the Multi-Agentic Conversational AI API!"}
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Root"])
+async def metrics():
+    """Exposes latency histograms, LLM token counts, SQL row counts, cache and ingestion metrics for Prometheus."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
@@ -13,6 +13,9 @@ class ConversationBase(BaseModel):
     # Added tags field for CRM categorization
     tags: List[str] = Field(default_factory=list, example=["Property Inquiry"])
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    # Rolling summary of the messages that have slid out of the verbatim memory window
+    summary: str = ""
+    summarized_count: int = 0
 
 class ConversationCreate(ConversationBase):
     pass
@@ -20,3 +23,12 @@ class ConversationCreate(ConversationBase):
 class ConversationInDB(ConversationBase):
     class Config:
         from_attributes = True
+
+# A conversation fetched with only some (or none) of its messages
+class ConversationWindow(ConversationInDB):
+    message_count: int = 0
+
+# One keyset page of a user's conversations; pass next_cursor back to get the following page
+class ConversationPage(BaseModel):
+    items: List[ConversationWindow]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,25 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+import uuid
+
+class IngestionJob(BaseModel):
+    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    filename: str = Field(..., example="listings.csv")
+    dataset_id: str = Field(..., example="user_abc_123")
+    status: str = Field("queued", example="running")  # queued, running, completed, failed
+    mode: str = Field("replace", example="sync")  # replace, append, upsert, sync
+    key_column: Optional[str] = Field(None, example="listing_id")
+    rows_loaded: int = 0
+    bytes_read: int = 0
+    total_bytes: int = 0
+    progress: float = Field(0.0, example=0.42)
+    # What the load changed in the table
+    rows_inserted: int = 0
+    rows_updated: int = 0
+    rows_deleted: int = 0
+    rows_unchanged: int = 0
+    changed_columns: List[str] = Field(default_factory=list)
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, Optional
 
 class ChatRequest(BaseModel):
     user_id: str = Field(..., example="user_abc_123")
@@ -10,6 +10,8 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str
     processing_time: float
+    # Per-stage latency in seconds, returned when requested with include_timings
+    timings: Optional[Dict[str, float]] = None
 
 class ResetRequest(BaseModel):
     session_id: str = Field(..., example="session_xyz_789")
@@ -24,3 +24,10 @@ class User(UserBase):
     id: str
     class Config:
         from_attributes = True
+
+# Returned by the combined login and upload endpoint
+class LoginResponse(User):
+    ingestion_job_id: str
+    # Signed session token; send it as `Authorization: Bearer <token>` on later requests
+    access_token: str
+    token_type: str = "bearer"
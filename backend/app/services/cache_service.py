@@ -0,0 +1,360 @@
+from collections import OrderedDict
+from app.core.config import settings
+from app.services.metrics_service import registry
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+import hashlib
+import logging
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Numbers standing on their own or as the start of a token ("5" in "5th Ave").
+NUMBER_PATTERN = re.compile(r"(?<![\w.])\d+(?:\.\d+)?")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s#]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# SQL whose result can change between runs against the same data. SQLite's date and time
+# functions read the clock for 'now' and when called without a time value.
+NON_DETERMINISTIC_SQL_PATTERN = re.compile(
+    r"\b(random|randomblob|changes|total_changes|last_insert_rowid)\s*\("
+    r"|'\s*now\s*'"
+    r"|\bcurrent_(date|time|timestamp)\b"
+    r"|\b(date|time|datetime|julianday|unixepoch)\s*\(\s*\)"
+    r"|\bstrftime\s*\(\s*('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")\s*\)",
+    re.IGNORECASE,
+)
+SQL_STRING_LITERAL_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")")
+# SQL ending where a comparison or LIMIT/OFFSET operand starts; only literals there are parameterized.
+SQL_OPERAND_CONTEXT_PATTERN = re.compile(
+    r"(?:[=<>]|\b(?:like|glob|limit|offset)|\bbetween\s+\S+\s+and|\bbetween)\s*\(?\s*$", re.IGNORECASE
+)
+
+# Words that signal a follow-up question whose meaning depends on the previous turn.
+CONTEXT_DEPENDENT_WORDS = {
+    "it", "its", "that", "those", "these", "this", "they", "them", "their",
+    "same", "also", "else", "previous", "above", "again", "one", "ones",
+}
+CONTEXT_DEPENDENT_PREFIXES = ("and ", "what about", "how about", "only ", "but ")
+
+
+class LRUCache:
+    """A thread-safe LRU cache with per-entry TTL and hit/miss counters."""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, record_miss: bool = True) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                if record_miss:
+                    self.misses += 1
+                return None
+            value = entry[1]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def remove_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes every entry whose key matches the predicate and returns how many were removed."""
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+def _normalize_text(text: str) -> str:
+    text = PUNCTUATION_PATTERN.sub(" ", text.strip().lower())
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
+
+def normalize_question(question: str) -> Tuple[str, List[str]]:
+    """
+    Normalizes a question for cache lookups. Returns the normalized template, in which
+    number literals are replaced by placeholders, and the extracted numbers in order.
+    """
+    text = question.strip().lower()
+    numbers = NUMBER_PATTERN.findall(text)
+    return _normalize_text(NUMBER_PATTERN.sub(" # ", text)), numbers
+
+
+def relevant_history(question: str, messages: list, max_messages: int) -> str:
+    """
+    Returns the part of the conversation history that can change the meaning of the question.
+    Standalone questions translate to the same SQL regardless of history, so they get no context.
+    """
+    if not messages or max_messages <= 0:
+        return ""
+    lowered = question.strip().lower()
+    words = set(PUNCTUATION_PATTERN.sub(" ", lowered).split())
+    if not (words & CONTEXT_DEPENDENT_WORDS or lowered.startswith(CONTEXT_DEPENDENT_PREFIXES)):
+        return ""
+    recent = messages[-max_messages:]
+    return "\n".join(f"{msg.role}: {_normalize_text(msg.content)}" for msg in recent)
+
+
+class SQLTranslationCache:
+    """
+    Caches natural language to SQL translations. Entries are keyed on the dataset, its schema
+    hash, the normalized question and the relevant history, and number literals are
+    parameterized so "units on 5th Ave" and "units on 7th Ave" share one entry.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, context_messages: int):
+        self.cache = LRUCache(max_entries, ttl_seconds)
+        self.context_messages = context_messages
+
+    def _key(self, dataset_id: str, schema_hash: str, question: str, context: str) -> Tuple[str, str]:
+        raw = f"{schema_hash}\x00{question}\x00{context}"
+        return dataset_id, hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _keys(self, dataset_id: str, schema_hash: str, question: str, messages: list) -> Tuple[Tuple[str, str], Tuple[str, str], List[str]]:
+        template, numbers = normalize_question(question)
+        literal = _normalize_text(question)
+        context = relevant_history(question, messages, self.context_messages)
+        return (
+            self._key(dataset_id, schema_hash, template, context),
+            self._key(dataset_id, schema_hash, "=" + literal, context),
+            numbers,
+        )
+
+    def flight_key(self, dataset_id: str, schema_hash: str, question: str, messages: list) -> Tuple[str, str]:
+        """Identifies a translation the way a cache hit would, so identical questions in flight can share one."""
+        return self._keys(dataset_id, schema_hash, question, messages)[1]
+
+    def get(self, dataset_id: str, schema_hash: str, question: str, messages: list) -> Optional[str]:
+        """Returns the cached SQL for the question, or None on a miss."""
+        template_key, literal_key, numbers = self._keys(dataset_id, schema_hash, question, messages)
+        sql_template = self.cache.get(template_key, record_miss=False)
+        if sql_template is not None:
+            return _fill_sql_template(sql_template, numbers)
+        return self.cache.get(literal_key)
+
+    def put(self, dataset_id: str, schema_hash: str, question: str, messages: list, sql_query: str):
+        template_key, literal_key, numbers = self._keys(dataset_id, schema_hash, question, messages)
+        sql_template = _parameterize_sql(sql_query, numbers)
+        if sql_template is not None:
+            self.cache.put(template_key, sql_template)
+        else:
+            self.cache.put(literal_key, sql_query)
+
+    def invalidate(self, dataset_id: str):
+        """Drops every translation made for the dataset."""
+        removed = self.cache.remove_where(lambda key: key[0] == dataset_id)
+        logger.info(f"SQL translation cache invalidated for dataset {dataset_id} ({removed} entries).")
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+
+def _placeholder(index: int) -> str:
+    return f"\x00{index}\x00"
+
+
+def _parameterize_sql(sql_query: str, numbers: List[str]) -> Optional[str]:
+    """
+    Replaces the question's number literals in the SQL with placeholders. Returns None when the
+    mapping is ambiguous: a number repeats in the question, does not appear in the SQL exactly
+    once, or appears somewhere other than a comparison or LIMIT/OFFSET operand, e.g. the
+    precision of ROUND(x, 3).
+    """
+    if not numbers:
+        return sql_query
+    if len(set(numbers)) != len(numbers):
+        return None
+    positions = {number: index for index, number in enumerate(numbers)}
+    occurrences = []
+    offset = 0
+    for part_index, part in enumerate(SQL_STRING_LITERAL_PATTERN.split(sql_query)):
+        # split() with a capturing group puts the quoted literals at odd indexes
+        quoted = part_index % 2 == 1
+        for match in NUMBER_PATTERN.finditer(part):
+            index = positions.get(match.group(0))
+            if index is None:
+                continue
+            start = offset + match.start()
+            # A number inside a quoted literal counts when the literal itself is the operand
+            context = sql_query[:offset] if quoted else sql_query[:start]
+            if SQL_OPERAND_CONTEXT_PATTERN.search(context) is None:
+                return None
+            occurrences.append((start, offset + match.end(), index))
+        offset += len(part)
+    if sorted(index for _, _, index in occurrences) != list(range(len(numbers))):
+        return None
+    sql_template = sql_query
+    for start, end, index in reversed(occurrences):
+        sql_template = sql_template[:start] + _placeholder(index) + sql_template[end:]
+    return sql_template
+
+
+def _fill_sql_template(sql_template: str, numbers: List[str]) -> str:
+    for index, number in enumerate(numbers):
+        sql_template = sql_template.replace(_placeholder(index), number)
+    return sql_template
+
+
+def canonicalize_sql(sql_query: str) -> str:
+    """Lowercases and collapses whitespace outside of quoted literals and drops trailing semicolons."""
+    parts = SQL_STRING_LITERAL_PATTERN.split(sql_query.strip().rstrip(";").strip())
+    canonical = []
+    for index, part in enumerate(parts):
+        # split() with a capturing group puts the quoted literals at odd indexes
+        canonical.append(part if index % 2 else WHITESPACE_PATTERN.sub(" ", part.lower()))
+    return "".join(canonical).strip()
+
+
+def is_deterministic_sql(sql_query: str) -> bool:
+    """Returns False for SQL that calls random(), date('now'), datetime() and similar functions."""
+    return NON_DETERMINISTIC_SQL_PATTERN.search(canonicalize_sql(sql_query)) is None
+
+
+class SQLResultCache:
+    """
+    Caches rendered query results keyed on (dataset, dataset version, canonicalized SQL). Eviction
+    is LRU bounded by the estimated size of the stored results in bytes rather than entry count.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._versions: Dict[str, int] = {}
+        self._entries: "OrderedDict[Tuple[str, int, str], Tuple[int, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, dataset_id: str, version: int, sql_query: str) -> Optional[Any]:
+        key = (dataset_id, version, canonicalize_sql(sql_query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, dataset_id: str, version: int, sql_query: str, value: Any, size_bytes: int):
+        """Stores a result unless it was computed against an outdated version or is too large."""
+        if size_bytes > self.max_bytes:
+            return
+        key = (dataset_id, version, canonicalize_sql(sql_query))
+        with self._lock:
+            if version != self._versions.get(dataset_id, version):
+                return
+            self._versions[dataset_id] = version
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous[0]
+            self._entries[key] = (size_bytes, value)
+            self.total_bytes += size_bytes
+            while self.total_bytes > self.max_bytes:
+                _, (evicted_size, _) = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, dataset_id: str, new_version: int):
+        """Drops the dataset's entries and only accepts its results for new_version from now on."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == dataset_id]:
+                self.total_bytes -= self._entries.pop(key)[0]
+            self._versions[dataset_id] = new_version
+        logger.info(f"SQL result cache invalidated for dataset {dataset_id}, now at version {new_version}.")
+
+    def carry_over(self, dataset_id: str, new_version: int, keep: Callable[[str], bool]):
+        """
+        Moves the dataset's entries for which keep(canonical SQL) is true to new_version and drops
+        the rest, for loads that changed only part of the table.
+        """
+        with self._lock:
+            entries: "OrderedDict[Tuple[str, int, str], Tuple[int, Any]]" = OrderedDict()
+            kept = 0
+            for key, entry in self._entries.items():
+                if key[0] != dataset_id:
+                    entries[key] = entry
+                elif keep(key[2]):
+                    entries[(dataset_id, new_version, key[2])] = entry
+                    kept += 1
+                else:
+                    self.total_bytes -= entry[0]
+            self._entries = entries
+            self._versions[dataset_id] = new_version
+        logger.info(f"SQL result cache kept {kept} results for dataset {dataset_id}, now at version {new_version}.")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.total_bytes,
+                "max_bytes": self.max_bytes,
+                "datasets": len(self._versions),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+sql_translation_cache = SQLTranslationCache(
+    max_entries=settings.SQL_TRANSLATION_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.SQL_TRANSLATION_CACHE_TTL_SECONDS,
+    context_messages=settings.SQL_TRANSLATION_CACHE_CONTEXT_MESSAGES,
+)
+
+sql_result_cache = SQLResultCache(max_bytes=settings.SQL_RESULT_CACHE_MAX_BYTES)
+
+
+def collect_cache_metrics():
+    """Exposes the caches' own counters at scrape time, so lookups pay nothing extra."""
+    caches = {"sql_translation": sql_translation_cache.stats(), "sql_result": sql_result_cache.stats()}
+    for name, metric_type, help in (
+        ("hits", "counter", "Cache hits."),
+        ("misses", "counter", "Cache misses."),
+        ("evictions", "counter", "Cache evictions."),
+        ("entries", "gauge", "Entries currently cached."),
+        ("hit_rate", "gauge", "Hits divided by lookups since startup."),
+    ):
+        samples = [({"cache": cache}, stats[name]) for cache, stats in caches.items()]
+        suffix = "_total" if metric_type == "counter" else ""
+        yield f"cache_{name}{suffix}", metric_type, help, samples
+
+
+registry.register_collector(collect_cache_metrics)
@@ -0,0 +1,219 @@
+from collections import OrderedDict
+from dataclasses import asdict
+from app.core.config import settings
+from app.db.dataset_catalog import DatasetCatalogEntry, DatasetCatalogStore
+from app.db.sqlite_pool import quote_identifier
+from app.services.cache_service import sql_result_cache, sql_translation_cache
+from app.services.row_delta import HASH_STATE_TABLE, HASH_TABLE_SUFFIX, LoadDelta
+from app.services.text_to_sql_service import TextToSQLService, ProgressCallback, build_create_table
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+UNSAFE_DATASET_ID_PATTERN = re.compile(r"[^A-Za-z0-9_-]")
+HASH_READ_SIZE = 1024 * 1024
+
+
+class DatasetManager:
+    """
+    Maps users to their own datasets. Each dataset is a separate SQLite file with an entry in
+    the persisted catalog, and open services (connection pools and schemas) are kept in an LRU
+    capped at MAX_OPEN_DATASETS so the number of open file handles stays bounded. Loads done by
+    other workers are picked up lazily: every lookup checks whether the catalog changed.
+    """
+
+    def __init__(self, max_open: int = settings.MAX_OPEN_DATASETS, catalog_path: str = settings.CATALOG_DB_PATH):
+        self.max_open = max_open
+        self.store = DatasetCatalogStore(catalog_path)
+        self.catalog: Dict[str, DatasetCatalogEntry] = {}
+        self._open: "OrderedDict[str, TextToSQLService]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._adopted_legacy = False
+
+    def db_path_for(self, dataset_id: str) -> str:
+        if dataset_id == settings.DEFAULT_DATASET_ID:
+            return settings.SQLITE_DB_PATH
+        safe_id = UNSAFE_DATASET_ID_PATTERN.sub("_", dataset_id)
+        if safe_id != dataset_id:
+            # Keep sanitized ids from colliding with each other
+            safe_id = f"{safe_id}_{hashlib.sha256(dataset_id.encode('utf-8')).hexdigest()[:8]}"
+        return os.path.join(settings.DATASETS_DIR, f"{safe_id}.db")
+
+    def sync(self):
+        """Reloads the catalog if another worker changed it, and refreshes open services whose version moved."""
+        with self._lock:
+            if not self.store.changed():
+                return
+            if not self._adopted_legacy:
+                self._adopted_legacy = True
+                self._adopt_legacy_default()
+            self.catalog = {entry.dataset_id: entry for entry in self.store.load_all()}
+            for dataset_id, service in self._open.items():
+                entry = self.catalog.get(dataset_id)
+                if entry is not None and entry.version != service.version:
+                    logger.info(f"Dataset {dataset_id} changed to version {entry.version}; reloading.")
+                    self._restore(service, entry)
+
+    def _adopt_legacy_default(self):
+        """Registers a default dataset that was loaded before the catalog was persisted."""
+        if settings.DEFAULT_DATASET_ID in {entry.dataset_id for entry in self.store.load_all()}:
+            return
+        if not os.path.exists(settings.SQLITE_DB_PATH):
+            return
+        try:
+            connection = sqlite3.connect(f"file:{settings.SQLITE_DB_PATH}?mode=ro", uri=True)
+            try:
+                row = connection.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                    "AND name NOT LIKE '%\\_\\_staging\\_%' ESCAPE '\\' AND name NOT LIKE ? AND name != ? ORDER BY rowid LIMIT 1",
+                    (f"%{HASH_TABLE_SUFFIX}", HASH_STATE_TABLE),
+                ).fetchone()
+                if row is None:
+                    return
+                table_name = row[0]
+                columns = [(info[1], info[2]) for info in connection.execute(f"PRAGMA table_info({quote_identifier(table_name)})")]
+                row_count = connection.execute(f"SELECT COUNT(*) FROM {quote_identifier(table_name)}").fetchone()[0]
+            finally:
+                connection.close()
+            entry = DatasetCatalogEntry(
+                dataset_id=settings.DEFAULT_DATASET_ID,
+                db_path=settings.SQLITE_DB_PATH,
+                table_name=table_name,
+                schema=build_create_table(table_name, columns),
+                version=self.store.reserve_version(settings.DEFAULT_DATASET_ID),
+                row_count=row_count,
+                updated_at=datetime.utcnow(),
+            )
+            self.store.save(entry)
+            logger.info(f"Added the existing table {table_name} in {settings.SQLITE_DB_PATH} to the dataset catalog.")
+        except Exception as e:
+            logger.warning(f"Could not add {settings.SQLITE_DB_PATH} to the dataset catalog: {e}")
+
+    def resolve_dataset_id(self, user_id: Optional[str]) -> str:
+        """Returns the user's own dataset, falling back to the shared default dataset."""
+        self.sync()
+        if user_id and user_id in self.catalog:
+            return user_id
+        return settings.DEFAULT_DATASET_ID
+
+    def has_dataset(self, dataset_id: str) -> bool:
+        self.sync()
+        return dataset_id in self.catalog
+
+    def get_service(self, dataset_id: str) -> TextToSQLService:
+        """Returns the open service for the dataset, opening it (and evicting the LRU one) if needed."""
+        with self._lock:
+            self.sync()
+            service = self._open.get(dataset_id)
+            if service is not None:
+                self._open.move_to_end(dataset_id)
+                return service
+
+            entry = self.catalog.get(dataset_id)
+            service = TextToSQLService(dataset_id, entry.db_path if entry else self.db_path_for(dataset_id))
+            if entry:
+                self._restore(service, entry)
+            self._open[dataset_id] = service
+            while len(self._open) > self.max_open:
+                evicted_id, evicted = self._open.popitem(last=False)
+                evicted.close()
+                logger.info(f"Closed dataset {evicted_id} (LRU eviction).")
+            return service
+
+    def load_csv(
+        self,
+        dataset_id: str,
+        file_path: str,
+        table_name: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        mode: str = "replace",
+        key_column: Optional[str] = None,
+    ) -> Optional[LoadDelta]:
+        """
+        Loads a CSV into the dataset's own SQLite file and records it in the persisted catalog.
+        Re-uploading the file that is already loaded is a no-op. Returns what the load changed,
+        or None if it failed.
+        """
+        db_path = self.db_path_for(dataset_id)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        table_name = table_name or os.path.splitext(os.path.basename(file_path))[0]
+        content_hash = file_sha256(file_path)
+        self.sync()
+        current = self.catalog.get(dataset_id)
+        if current is not None and current.content_hash == content_hash and current.table_name == table_name:
+            logger.info(f"Dataset {dataset_id} already holds this file (version {current.version}); skipping the load.")
+            if progress_callback:
+                total_bytes = os.path.getsize(file_path)
+                progress_callback(current.row_count, total_bytes, total_bytes)
+            return LoadDelta(mode=mode, unchanged=current.row_count)
+
+        service = self.get_service(dataset_id)
+        version = self.store.reserve_version(dataset_id)
+        delta = service.load_csv_to_sql(
+            file_path, table_name=table_name, progress_callback=progress_callback, version=version, mode=mode, key_column=key_column,
+        )
+        if delta is None:
+            return None
+
+        entry = DatasetCatalogEntry(
+            dataset_id=dataset_id,
+            db_path=service.db_path,
+            table_name=service.table_name,
+            schema=service.schema,
+            version=service.version,
+            row_count=service.row_count,
+            # After an append or upsert the table holds more than this one file
+            content_hash=content_hash if delta.mode in ("replace", "sync") else None,
+            updated_at=datetime.utcnow(),
+        )
+        if not self.store.save(entry):
+            logger.warning(f"A newer load of dataset {dataset_id} finished first; version {version} was not recorded.")
+        with self._lock:
+            self.catalog[dataset_id] = entry
+            # The service may have been evicted and reopened while the load was running
+            current = self._open.get(dataset_id)
+            if current is not None and current is not service:
+                self._restore(current, entry)
+                current.schema_index = service.schema_index
+        return delta
+
+    def _restore(self, service: TextToSQLService, entry: DatasetCatalogEntry):
+        changed = service.version != entry.version
+        service.table_name = entry.table_name
+        service.schema = entry.schema
+        service.version = entry.version
+        service.row_count = entry.row_count
+        service.index_advisor.reset(entry.table_name)
+        if changed:
+            # Rebuilt lazily from the new table
+            service.schema_index = None
+            sql_result_cache.invalidate(entry.dataset_id, entry.version)
+            sql_translation_cache.invalidate(entry.dataset_id)
+
+    def list_datasets(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            self.sync()
+            return [asdict(entry) for entry in self.catalog.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"datasets": len(self.catalog), "open": len(self._open), "max_open": self.max_open}
+
+
+def file_sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as handle:
+        for block in iter(lambda: handle.read(HASH_READ_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Create a single instance of the manager
+dataset_manager = DatasetManager()
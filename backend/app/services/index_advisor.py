@@ -0,0 +1,250 @@
+from dataclasses import dataclass, field
+from app.core.config import settings
+from app.db.sqlite_pool import maintenance_executor, quote_identifier
+from typing import Any, Dict, List, Optional, Tuple
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+AUTO_INDEX_PREFIX = "auto_idx_"
+STRING_LITERAL_PATTERN = re.compile(r"'(?:[^']|'')*'")
+CLAUSE_PATTERN = re.compile(
+    r"\b(select|from|join|on|where|group\s+by|order\s+by|having|limit|union|intersect|except)\b", re.IGNORECASE
+)
+IDENTIFIER_PATTERN = re.compile(r'"((?:[^"]|"")+)"|`([^`]+)`|\[([^\]]+)\]|([A-Za-z_][A-Za-z0-9_]*)')
+CLAUSE_KINDS = {"where": "filter", "on": "join", "group by": "group", "order by": "order"}
+
+
+def extract_clause_columns(sql_query: str, known_columns: List[str]) -> Dict[str, List[str]]:
+    """
+    Returns the known columns referenced in the WHERE, JOIN ... ON, GROUP BY and ORDER BY clauses
+    of a query, in order of appearance. This is a lexical scan, good enough for advising indexes.
+    """
+    lookup = {column.lower(): column for column in known_columns}
+    text = STRING_LITERAL_PATTERN.sub("''", sql_query)
+    matches = list(CLAUSE_PATTERN.finditer(text))
+    found: Dict[str, List[str]] = {kind: [] for kind in CLAUSE_KINDS.values()}
+    for index, match in enumerate(matches):
+        kind = CLAUSE_KINDS.get(re.sub(r"\s+", " ", match.group(1).lower()))
+        if kind is None:
+            continue
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(text)
+        for identifier in IDENTIFIER_PATTERN.finditer(text[match.end():end]):
+            name = next(group for group in identifier.groups() if group is not None).replace('""', '"')
+            column = lookup.get(name.lower())
+            if column and column not in found[kind]:
+                found[kind].append(column)
+    return found
+
+
+def candidate_indexes(clause_columns: Dict[str, List[str]]) -> List[Tuple[str, ...]]:
+    """Turns clause columns into index candidates: a composite over the filters plus single columns."""
+    candidates: List[Tuple[str, ...]] = []
+    filters = clause_columns["filter"][:settings.INDEX_ADVISOR_MAX_COMPOSITE_COLUMNS]
+    if len(filters) > 1:
+        candidates.append(tuple(filters))
+    for column in filters + clause_columns["join"] + clause_columns["group"][:1] + clause_columns["order"][:1]:
+        if (column,) not in candidates:
+            candidates.append((column,))
+    return candidates
+
+
+@dataclass
+class CandidateStats:
+    uses: int = 0
+    scan_seconds: float = 0.0
+
+
+@dataclass
+class AutoIndex:
+    name: str
+    columns: Tuple[str, ...]
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    # Average latency of the queries that scanned before the index existed
+    seconds_before: Optional[float] = None
+    uses_after: int = 0
+    seconds_after: float = 0.0
+
+    def report(self) -> Dict[str, Any]:
+        avg_after = self.seconds_after / self.uses_after if self.uses_after else None
+        return {
+            "name": self.name,
+            "columns": list(self.columns),
+            "created_at": self.created_at,
+            "last_used": self.last_used,
+            "uses_since_created": self.uses_after,
+            "avg_ms_before": round(self.seconds_before * 1000, 2) if self.seconds_before is not None else None,
+            "avg_ms_after": round(avg_after * 1000, 2) if avg_after is not None else None,
+            "speedup": round(self.seconds_before / avg_after, 2) if self.seconds_before and avg_after else None,
+        }
+
+
+class IndexAdvisor:
+    """
+    Watches the SQL executed against one dataset table. Columns used by queries that the
+    planner answers with a full scan are counted, and once a candidate crosses the usage
+    threshold an index is created in the background. Auto-created indexes that go unused
+    for INDEX_ADVISOR_IDLE_SECONDS are dropped again.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.table_name: Optional[str] = None
+        self.columns: List[str] = []
+        self.candidates: Dict[Tuple[str, ...], CandidateStats] = {}
+        self.indexes: Dict[Tuple[str, ...], AutoIndex] = {}
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        self._queries_seen = 0
+        # Bumped whenever the advisor creates or drops an index, so cached query plans can be told apart
+        self.generation = 0
+
+    def reset(self, table_name: Optional[str]):
+        """Forgets everything about the previous table; its indexes were dropped with it."""
+        with self._lock:
+            self.table_name = table_name
+            self.columns = []
+            self.candidates.clear()
+            self.indexes.clear()
+            self._pending.clear()
+            self.generation += 1
+
+    def record(self, sql_query: str, elapsed_seconds: float, connection: sqlite3.Connection, plan: Optional[List[tuple]] = None):
+        """
+        Records an executed query. Called on the query thread with the connection that ran it,
+        and with the query's EXPLAIN QUERY PLAN rows when the caller already has them.
+        """
+        if not settings.INDEX_ADVISOR_ENABLED or not self.table_name:
+            return
+        if not self.columns:
+            self._load_table_state(connection)
+        candidates = candidate_indexes(extract_clause_columns(sql_query, self.columns))
+        if not candidates:
+            return
+
+        if plan is None:
+            plan = connection.execute(f"EXPLAIN QUERY PLAN {sql_query}").fetchall()
+        details = [row[-1] for row in plan]
+        scanned = any(detail.startswith("SCAN") and "USING" not in detail for detail in details)
+        used_indexes = {name for detail in details for name in re.findall(r"INDEX (\w+)", detail)}
+        now = time.time()
+        to_create = []
+        with self._lock:
+            for index in self.indexes.values():
+                if index.name in used_indexes:
+                    index.last_used = now
+                    index.uses_after += 1
+                    index.seconds_after += elapsed_seconds
+            if scanned:
+                for columns in candidates:
+                    stats = self.candidates.setdefault(columns, CandidateStats())
+                    stats.uses += 1
+                    stats.scan_seconds += elapsed_seconds
+                    if (
+                        stats.uses >= settings.INDEX_ADVISOR_USAGE_THRESHOLD
+                        and not self._covered(columns)
+                        and len(self.indexes) + len(self._pending) < settings.INDEX_ADVISOR_MAX_INDEXES
+                    ):
+                        self._pending.add(columns)
+                        to_create.append((columns, stats.scan_seconds / stats.uses))
+            self._queries_seen += 1
+            check_idle = self._queries_seen % settings.INDEX_ADVISOR_IDLE_CHECK_EVERY == 0
+
+        for columns, seconds_before in to_create:
+            maintenance_executor.submit(self._create_index, self.table_name, columns, seconds_before)
+        if check_idle:
+            maintenance_executor.submit(self._drop_idle_indexes)
+
+    def _covered(self, columns: Tuple[str, ...]) -> bool:
+        """True if an existing or pending index starts with these columns and can serve them."""
+        return any(existing[:len(columns)] == columns for existing in list(self.indexes) + list(self._pending))
+
+    def _load_table_state(self, connection: sqlite3.Connection):
+        """Reads the table's columns and any auto indexes left from a previous process."""
+        table = quote_identifier(self.table_name)
+        columns = [row[1] for row in connection.execute(f"PRAGMA table_info({table})").fetchall()]
+        existing = {}
+        for name, in connection.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND name LIKE ?",
+            (self.table_name, AUTO_INDEX_PREFIX + "%"),
+        ).fetchall():
+            index_columns = tuple(row[2] for row in connection.execute(f"PRAGMA index_info({quote_identifier(name)})"))
+            existing[index_columns] = AutoIndex(name=name, columns=index_columns)
+        with self._lock:
+            self.columns = columns
+            for index_columns, index in existing.items():
+                self.indexes.setdefault(index_columns, index)
+
+    def _writer(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.db_path, timeout=30)
+        connection.execute("PRAGMA journal_mode = WAL")
+        return connection
+
+    def _create_index(self, table_name: str, columns: Tuple[str, ...], seconds_before: float):
+        name = index_name(table_name, columns)
+        try:
+            connection = self._writer()
+            try:
+                column_list = ", ".join(quote_identifier(column) for column in columns)
+                connection.execute(f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} ON {quote_identifier(table_name)} ({column_list})")
+                connection.execute(f"ANALYZE {quote_identifier(name)}")
+                connection.commit()
+            finally:
+                connection.close()
+            with self._lock:
+                if self.table_name == table_name:
+                    self.indexes[columns] = AutoIndex(name=name, columns=columns, seconds_before=seconds_before)
+                    self.generation += 1
+            logger.info(f"Index advisor created {name} on {table_name}({', '.join(columns)}).")
+        except Exception as e:
+            logger.error(f"Index advisor failed to create {name}: {e}")
+        finally:
+            with self._lock:
+                self._pending.discard(columns)
+
+    def _drop_idle_indexes(self):
+        cutoff = time.time() - settings.INDEX_ADVISOR_IDLE_SECONDS
+        with self._lock:
+            idle = [index for index in self.indexes.values() if index.last_used < cutoff]
+        if not idle:
+            return
+        try:
+            connection = self._writer()
+            try:
+                for index in idle:
+                    connection.execute(f"DROP INDEX IF EXISTS {quote_identifier(index.name)}")
+                connection.commit()
+            finally:
+                connection.close()
+            with self._lock:
+                for index in idle:
+                    self.indexes.pop(index.columns, None)
+                    # Start counting again so the index can come back if the workload returns
+                    self.candidates.pop(index.columns, None)
+                self.generation += 1
+            logger.info(f"Index advisor dropped idle indexes: {[index.name for index in idle]}")
+        except Exception as e:
+            logger.error(f"Index advisor failed to drop idle indexes: {e}")
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "table": self.table_name,
+                "indexes": [index.report() for index in self.indexes.values()],
+                "candidates": [
+                    {"columns": list(columns), "uses": stats.uses, "avg_scan_ms": round(stats.scan_seconds / stats.uses * 1000, 2)}
+                    for columns, stats in sorted(self.candidates.items(), key=lambda item: -item[1].uses)
+                    if not self._covered(columns)
+                ],
+            }
+
+
+def index_name(table_name: str, columns: Tuple[str, ...]) -> str:
+    digest = hashlib.sha256(f"{table_name}\x00{'|'.join(columns)}".encode("utf-8")).hexdigest()[:10]
+    return f"{AUTO_INDEX_PREFIX}{digest}"
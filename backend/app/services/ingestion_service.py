@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from fastapi import UploadFile
+from app.core.config import settings
+from app.schemas.ingestion import IngestionJob
+from app.services.dataset_service import dataset_manager
+from app.services.metrics_service import INGESTION_BYTES, INGESTION_JOBS, INGESTION_ROW_CHANGES, INGESTION_ROWS, INGESTION_SECONDS
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_READ_SIZE = 1024 * 1024
+
+
+class IngestionService:
+    """Runs CSV loads as background jobs and tracks their progress."""
+
+    def __init__(self):
+        self.executor = ThreadPoolExecutor(max_workers=settings.INGESTION_MAX_WORKERS, thread_name_prefix="csv-ingestion")
+        self.jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+
+    async def save_upload(self, file: UploadFile, job: IngestionJob) -> str:
+        """Streams the upload to disk in fixed-size chunks instead of buffering it in memory."""
+        os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+        file_path = os.path.join(settings.UPLOAD_DIR, f"{job.id}_{os.path.basename(file.filename)}")
+        with open(file_path, "wb") as buffer:
+            while True:
+                data = await file.read(UPLOAD_READ_SIZE)
+                if not data:
+                    break
+                buffer.write(data)
+        return file_path
+
+    async def submit_upload(self, file: UploadFile, dataset_id: str, mode: str = "replace", key_column: Optional[str] = None) -> IngestionJob:
+        """Saves the uploaded CSV and queues it for loading into the dataset. Returns immediately with the job."""
+        job = IngestionJob(filename=file.filename, dataset_id=dataset_id, mode=mode, key_column=key_column)
+        file_path = await self.save_upload(file, job)
+        self._track(job)
+        loop = asyncio.get_running_loop()
+        loop.run_in_executor(self.executor, self._run, job, file_path)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        return self.jobs.get(job_id)
+
+    def _track(self, job: IngestionJob):
+        self.jobs[job.id] = job
+        # Forget the oldest finished jobs so the registry stays bounded
+        while len(self.jobs) > settings.INGESTION_MAX_TRACKED_JOBS:
+            oldest_id = next((job_id for job_id, tracked in self.jobs.items() if tracked.finished_at), None)
+            if oldest_id is None:
+                break
+            del self.jobs[oldest_id]
+
+    def _run(self, job: IngestionJob, file_path: str):
+        job.status = "running"
+        started = time.perf_counter()
+
+        def report_progress(rows_loaded: int, bytes_read: int, total_bytes: int):
+            job.rows_loaded = rows_loaded
+            job.bytes_read = bytes_read
+            job.total_bytes = total_bytes
+            job.progress = round(bytes_read / total_bytes, 4) if total_bytes else 1.0
+
+        try:
+            table_name = os.path.splitext(os.path.basename(job.filename))[0]
+            delta = dataset_manager.load_csv(
+                job.dataset_id, file_path, table_name=table_name, progress_callback=report_progress,
+                mode=job.mode, key_column=job.key_column,
+            )
+            if delta is not None:
+                job.status = "completed"
+                job.rows_inserted = delta.inserted
+                job.rows_updated = delta.updated
+                job.rows_deleted = delta.deleted
+                job.rows_unchanged = delta.unchanged
+                job.changed_columns = delta.changed_columns
+            else:
+                job.status = "failed"
+                job.error = "Failed to process and load CSV into database."
+        except Exception as e:
+            logger.error(f"Ingestion job {job.id} failed: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = datetime.utcnow()
+            INGESTION_SECONDS.observe(time.perf_counter() - started)
+            INGESTION_ROWS.inc(job.rows_loaded)
+            INGESTION_BYTES.inc(job.bytes_read)
+            INGESTION_JOBS.inc(status=job.status)
+            for change, rows in (("inserted", job.rows_inserted), ("updated", job.rows_updated), ("deleted", job.rows_deleted)):
+                INGESTION_ROW_CHANGES.inc(rows, change=change)
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        logger.info(f"Ingestion job {job.id} finished with status {job.status} ({job.rows_loaded} rows).")
+
+
+# Create a single instance of the service
+ingestion_service = IngestionService()
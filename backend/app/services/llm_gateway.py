@@ -0,0 +1,442 @@
+from abc import ABC, abstractmethod
+from openai import AsyncOpenAI
+from app.core.config import settings
+from app.services.metrics_service import LLM_ERRORS, LLM_SECONDS, record_llm_usage, registry
+from app.services.result_renderer import CHARS_PER_TOKEN
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from types import SimpleNamespace
+from typing import AsyncIterator, Dict, List, Optional
+import asyncio
+import json
+import logging
+import openai
+import random
+import re
+import time
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+LLM_RETRIES = registry.counter("llm_retries_total", "LLM attempts retried after a transient failure.", ["operation"])
+LLM_HEDGES = registry.counter("llm_hedges_total", "Hedged LLM requests, by which attempt answered first.", ["operation", "winner"])
+
+
+class LLMError(Exception):
+    """An LLM call failed for good: retries were exhausted, the deadline passed or the error is permanent."""
+
+
+class RetryableLLMError(LLMError):
+    """A transient failure such as a rate limit, timeout or 5xx."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class CompletionRequest:
+    messages: List[Dict[str, str]]
+    temperature: float = 0.0
+    max_tokens: Optional[int] = None
+    json_mode: bool = False
+
+    def estimated_tokens(self) -> int:
+        """Prompt plus completion tokens, as counted against the tokens-per-minute limit."""
+        prompt_tokens = sum(len(message["content"]) for message in self.messages) // CHARS_PER_TOKEN
+        return prompt_tokens + (self.max_tokens or 256)
+
+
+@dataclass
+class Completion:
+    content: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class LLMBackend(ABC):
+    """A chat completion provider. Streams yield content deltas, then optionally one usage-only chunk."""
+
+    @abstractmethod
+    async def complete(self, request: CompletionRequest) -> Completion:
+        """Returns the whole completion."""
+
+    @abstractmethod
+    def stream(self, request: CompletionRequest) -> AsyncIterator[Completion]:
+        """Yields the completion as it is generated; implement it as an async generator."""
+
+
+class OpenAIBackend(LLMBackend):
+    """Any OpenAI-compatible API. The SDK's own retries are disabled; the gateway owns the retry policy."""
+
+    def __init__(self, client: AsyncOpenAI, model: str):
+        self.client = client
+        self.model = model
+
+    def _params(self, request: CompletionRequest) -> dict:
+        params = {"model": self.model, "messages": request.messages, "temperature": request.temperature}
+        if request.max_tokens:
+            params["max_tokens"] = request.max_tokens
+        if request.json_mode:
+            params["response_format"] = {"type": "json_object"}
+        return params
+
+    async def complete(self, request: CompletionRequest) -> Completion:
+        try:
+            response = await self.client.chat.completions.create(**self._params(request))
+        except Exception as e:
+            raise self._translate(e) from e
+        usage = response.usage
+        return Completion(
+            content=response.choices[0].message.content or "",
+            prompt_tokens=usage.prompt_tokens if usage else 0,
+            completion_tokens=usage.completion_tokens if usage else 0,
+        )
+
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[Completion]:
+        try:
+            # The final chunk then carries the token usage
+            stream = await self.client.chat.completions.create(**self._params(request), stream=True, stream_options={"include_usage": True})
+        except Exception as e:
+            raise self._translate(e) from e
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield Completion(content=chunk.choices[0].delta.content)
+                if chunk.usage:
+                    yield Completion(content="", prompt_tokens=chunk.usage.prompt_tokens, completion_tokens=chunk.usage.completion_tokens)
+        except Exception as e:
+            raise self._translate(e) from e
+        finally:
+            await stream.close()
+
+    @staticmethod
+    def _translate(error: Exception) -> LLMError:
+        if isinstance(error, openai.RateLimitError):
+            retry_after = error.response.headers.get("retry-after") if error.response is not None else None
+            try:
+                return RetryableLLMError(str(error), retry_after=float(retry_after) if retry_after else None)
+            except ValueError:
+                return RetryableLLMError(str(error))
+        if isinstance(error, (openai.APIConnectionError, openai.InternalServerError)):
+            return RetryableLLMError(str(error))
+        if isinstance(error, openai.APIStatusError) and error.status_code in (408, 409):
+            return RetryableLLMError(str(error))
+        return LLMError(str(error))
+
+
+class LocalBackend(LLMBackend):
+    """
+    An offline stand-in that answers from the prompt alone: a row count for SQL generation,
+    generic tags for tagging and an excerpt of the query result for synthesis. Useful for
+    development and tests without an API key.
+    """
+
+    TABLE_PATTERN = re.compile(r'CREATE TABLE ("[^"]+"|\S+)')
+    SESSION_PATTERN = re.compile(r"^### Session (.+)$", re.MULTILINE)
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+
+    def _reply(self, request: CompletionRequest) -> str:
+        prompt = "\n".join(message["content"] for message in request.messages)
+        if "generates SQLite queries" in prompt:
+            table = self.TABLE_PATTERN.search(prompt)
+            return f"SELECT COUNT(*) FROM {table.group(1)}" if table else "SELECT 1"
+        if request.json_mode:
+            sessions = self.SESSION_PATTERN.findall(prompt)
+            if sessions:
+                return json.dumps({"results": [{"session_id": session, "tags": ["General Question"]} for session in sessions]})
+            return json.dumps({"tags": ["General Question"]})
+        if "The result of the query was:" in prompt:
+            result = prompt.split("The result of the query was:", 1)[1].split("\n\nPlease synthesize", 1)[0].strip()
+            return f"Here is what I found: {result[:500]}"
+        return prompt[-500:]
+
+    async def complete(self, request: CompletionRequest) -> Completion:
+        await asyncio.sleep(self.latency_seconds)
+        content = self._reply(request)
+        return Completion(content=content, prompt_tokens=request.estimated_tokens(), completion_tokens=len(content) // CHARS_PER_TOKEN + 1)
+
+    async def stream(self, request: CompletionRequest) -> AsyncIterator[Completion]:
+        completion = await self.complete(request)
+        for word in re.findall(r"\S+\s*", completion.content):
+            yield Completion(content=word)
+        yield Completion(content="", prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens)
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute / 60` tokens per second up to a minute's worth. Callers may ask to leave
+    a reserve untouched, which is how background calls keep headroom for interactive ones.
+    A limit of 0 disables the bucket.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self, cost: float, reserve: float = 0.0) -> bool:
+        if not self.enabled:
+            return True
+        self._refill()
+        cost = min(cost, self.capacity - reserve)
+        if self.tokens - cost < reserve:
+            return False
+        self.tokens -= cost
+        return True
+
+    async def acquire(self, cost: float, reserve: float, deadline: float):
+        while not self.try_acquire(cost, reserve):
+            wait = (min(cost, self.capacity - reserve) + reserve - self.tokens) / self.rate
+            if time.monotonic() + wait > deadline:
+                raise LLMError("Rate limit would delay the call past its deadline")
+            await asyncio.sleep(min(wait, 1.0))
+
+
+@dataclass
+class CallPolicy:
+    priority: str
+    max_concurrency: int
+    deadline_seconds: float
+    max_retries: int = settings.LLM_MAX_RETRIES
+    # Start a second, identical request if the first has not answered by then; 0 disables hedging
+    hedge_after_seconds: float = 0.0
+
+
+def default_policies() -> Dict[str, CallPolicy]:
+    interactive = dict(priority=INTERACTIVE, max_concurrency=settings.LLM_INTERACTIVE_CONCURRENCY)
+    background = dict(
+        priority=BACKGROUND,
+        max_concurrency=settings.LLM_BACKGROUND_CONCURRENCY,
+        deadline_seconds=settings.LLM_BACKGROUND_DEADLINE_SECONDS,
+        max_retries=settings.LLM_BACKGROUND_MAX_RETRIES,
+    )
+    return {
+        "generate_sql": CallPolicy(**interactive, deadline_seconds=settings.LLM_SQL_DEADLINE_SECONDS, hedge_after_seconds=settings.LLM_SQL_HEDGE_AFTER_SECONDS),
+        "synthesize": CallPolicy(**interactive, deadline_seconds=settings.LLM_SYNTHESIS_DEADLINE_SECONDS),
+        "synthesize_stream": CallPolicy(**interactive, deadline_seconds=settings.LLM_SYNTHESIS_DEADLINE_SECONDS),
+        "tag": CallPolicy(**background),
+        "tag_batch": CallPolicy(**background),
+        "summarize": CallPolicy(**background),
+    }
+
+
+class LLMGateway:
+    """
+    The single path to the LLM. Each call type has its own concurrency limit, deadline and retry
+    budget. Requests and tokens are drawn from shared rate-limit buckets in which background
+    calls leave a reserve and wait behind interactive ones. Transient failures are retried with
+    jittered exponential backoff inside the deadline, and SQL generation can be hedged.
+    """
+
+    def __init__(self, backend: LLMBackend, policies: Dict[str, CallPolicy], requests_per_minute: float = 0, tokens_per_minute: float = 0):
+        self.backend = backend
+        self.policies = policies
+        self._semaphores = {operation: asyncio.Semaphore(policy.max_concurrency) for operation, policy in policies.items()}
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.in_flight = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._interactive_waiting = 0
+
+    async def complete(self, operation: str, request: CompletionRequest) -> Completion:
+        policy = self.policies[operation]
+        deadline = time.monotonic() + policy.deadline_seconds
+        started = time.perf_counter()
+        try:
+            if policy.hedge_after_seconds > 0:
+                completion = await self._hedged(operation, policy, request, deadline)
+            else:
+                completion = await self._attempts(operation, policy, request, deadline, policy.max_retries)
+        except LLMError:
+            LLM_ERRORS.inc(operation=operation)
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started, operation=operation)
+        record_llm_usage(operation, SimpleNamespace(prompt_tokens=completion.prompt_tokens, completion_tokens=completion.completion_tokens))
+        return completion
+
+    async def stream(self, operation: str, request: CompletionRequest) -> AsyncIterator[str]:
+        """
+        Streams content deltas. Failures before the first token are retried like any other call;
+        once content has been sent, errors are raised to the caller.
+        """
+        policy = self.policies[operation]
+        deadline = time.monotonic() + policy.deadline_seconds
+        started = time.perf_counter()
+        try:
+            attempt = 0
+            while True:
+                async with self._slot(operation, policy, request, deadline):
+                    chunks = self.backend.stream(request)
+                    try:
+                        first = await asyncio.wait_for(anext(chunks, None), timeout=self._attempt_timeout(deadline))
+                    except (RetryableLLMError, asyncio.TimeoutError) as e:
+                        await chunks.aclose()
+                        error = e
+                    except BaseException:
+                        await chunks.aclose()
+                        raise
+                    else:
+                        async for content in self._relay(operation, first, chunks, deadline):
+                            yield content
+                        return
+                attempt += 1
+                await self._before_retry(operation, policy.max_retries, attempt, error, deadline)
+        except LLMError:
+            LLM_ERRORS.inc(operation=operation)
+            raise
+        finally:
+            LLM_SECONDS.observe(time.perf_counter() - started, operation=operation)
+
+    async def _relay(self, operation: str, chunk: Optional[Completion], chunks: AsyncIterator[Completion], deadline: float) -> AsyncIterator[str]:
+        try:
+            while chunk is not None:
+                if chunk.content:
+                    yield chunk.content
+                if chunk.prompt_tokens or chunk.completion_tokens:
+                    record_llm_usage(operation, SimpleNamespace(prompt_tokens=chunk.prompt_tokens, completion_tokens=chunk.completion_tokens))
+                try:
+                    chunk = await asyncio.wait_for(anext(chunks, None), timeout=max(deadline - time.monotonic(), 0.001))
+                except asyncio.TimeoutError:
+                    raise LLMError(f"{operation} stream passed its deadline")
+        finally:
+            await chunks.aclose()
+
+    async def _attempts(self, operation: str, policy: CallPolicy, request: CompletionRequest, deadline: float, max_retries: int) -> Completion:
+        attempt = 0
+        while True:
+            try:
+                async with self._slot(operation, policy, request, deadline):
+                    return await asyncio.wait_for(self.backend.complete(request), timeout=self._attempt_timeout(deadline))
+            except (RetryableLLMError, asyncio.TimeoutError) as e:
+                error = e
+            attempt += 1
+            await self._before_retry(operation, max_retries, attempt, error, deadline)
+
+    async def _hedged(self, operation: str, policy: CallPolicy, request: CompletionRequest, deadline: float) -> Completion:
+        """Sends a backup request if the first is slow and returns whichever succeeds first."""
+        primary = asyncio.ensure_future(self._attempts(operation, policy, request, deadline, policy.max_retries))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=policy.hedge_after_seconds)
+            # Only hedge with spare capacity; hedging into a saturated limit adds load and no speed
+            if done or self._semaphores[operation].locked() or not self.request_bucket.try_acquire(0, reserve=1):
+                return await primary
+            hedge = asyncio.ensure_future(self._attempts(operation, policy, request, deadline, max_retries=0))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        LLM_HEDGES.inc(operation=operation, winner="hedge" if task is hedge else "primary")
+                        return task.result()
+            # Both failed; report the primary's error, which went through the retries
+            raise primary.exception()
+        finally:
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    @asynccontextmanager
+    async def _slot(self, operation: str, policy: CallPolicy, request: CompletionRequest, deadline: float):
+        """Holds a concurrency slot of the call type and draws from the rate-limit buckets."""
+        semaphore = self._semaphores[operation]
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=max(deadline - time.monotonic(), 0.001))
+        except asyncio.TimeoutError:
+            raise LLMError(f"{operation} passed its deadline waiting for a free slot")
+        try:
+            await self._admit(policy, request, deadline)
+            self.in_flight[policy.priority] += 1
+            try:
+                yield
+            finally:
+                self.in_flight[policy.priority] -= 1
+        finally:
+            semaphore.release()
+
+    async def _admit(self, policy: CallPolicy, request: CompletionRequest, deadline: float):
+        reserve = self._reserve(policy)
+        if policy.priority == INTERACTIVE:
+            self._interactive_waiting += 1
+        else:
+            # Background calls queue behind interactive calls that are waiting for the rate limit
+            while self._interactive_waiting:
+                if time.monotonic() >= deadline:
+                    raise LLMError("Passed the deadline waiting behind interactive calls")
+                await asyncio.sleep(0.05)
+        try:
+            await self.request_bucket.acquire(1, reserve * self.request_bucket.capacity, deadline)
+            await self.token_bucket.acquire(request.estimated_tokens(), reserve * self.token_bucket.capacity, deadline)
+        finally:
+            if policy.priority == INTERACTIVE:
+                self._interactive_waiting -= 1
+
+    @staticmethod
+    def _reserve(policy: CallPolicy) -> float:
+        """The fraction of each bucket a call must leave untouched."""
+        return settings.LLM_BACKGROUND_RESERVE if policy.priority == BACKGROUND else 0.0
+
+    @staticmethod
+    def _attempt_timeout(deadline: float) -> float:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise LLMError("Passed the deadline before the attempt started")
+        return min(settings.LLM_ATTEMPT_TIMEOUT_SECONDS, remaining)
+
+    @staticmethod
+    async def _before_retry(operation: str, max_retries: int, attempt: int, error: Exception, deadline: float):
+        """Sleeps a jittered exponential backoff, or raises once the retries or the deadline are used up."""
+        reason = str(error) or type(error).__name__
+        if attempt > max_retries:
+            raise LLMError(f"{operation} failed after {attempt} attempts: {reason}") from error
+        # Full jitter keeps clients that failed together from retrying together
+        delay = random.uniform(0, min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** (attempt - 1)))
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            delay = max(delay, retry_after)
+        if time.monotonic() + delay >= deadline:
+            raise LLMError(f"{operation} cannot be retried before its deadline: {reason}") from error
+        LLM_RETRIES.inc(operation=operation)
+        logger.warning(f"Retrying {operation} in {delay:.2f}s (attempt {attempt}): {reason}")
+        await asyncio.sleep(delay)
+
+
+def create_backend() -> LLMBackend:
+    if settings.LLM_BACKEND == "local":
+        return LocalBackend(latency_seconds=settings.LLM_LOCAL_LATENCY_SECONDS)
+    client = AsyncOpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        timeout=settings.LLM_ATTEMPT_TIMEOUT_SECONDS,
+        max_retries=0,
+    )
+    return OpenAIBackend(client, model=settings.LLM_MODEL)
+
+
+# Create a single instance of the gateway
+llm_gateway = LLMGateway(
+    create_backend(),
+    default_policies(),
+    requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+)
+
+registry.register_collector(lambda: [
+    ("llm_in_flight", "gauge", "LLM calls in flight, by priority class.",
+     [({"priority": priority}, count) for priority, count in llm_gateway.in_flight.items()]),
+])
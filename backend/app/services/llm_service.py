@@ -1,47 +1,88 @@
-from openai import AsyncOpenAI
 from app.core.config import settings
-from typing import List, Dict
+from app.services.result_renderer import CHARS_PER_TOKEN
+from app.services.llm_gateway import CompletionRequest, LLMError, llm_gateway
+from app.services.cache_service import normalize_question
+from app.services.single_flight import SingleFlight
+from typing import AsyncIterator, List, Dict
 import json
 
-client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+SQL_GENERATION_ERROR = "SELECT 'Error generating query';"
+SYNTHESIS_ERROR = "I found some data, but I'm having trouble interpreting it."
+
+synthesis_flights = SingleFlight("synthesize")
 
 async def generate_sql_from_prompt(prompt: str) -> str:
     """Generates a SQL query from a natural language prompt."""
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
+        completion = await llm_gateway.complete("generate_sql", CompletionRequest(
             messages=[
                 {"role": "system", "content": "You are a helpful assistant that generates SQLite queries based on user questions and a database schema. Only return the SQL query, with no other text or explanation."},
                 {"role": "user", "content": prompt}
             ],
             temperature=0.0,
-        )
-        sql_query = response.choices[0].message.content.strip()
+        ))
+        sql_query = completion.content.strip()
         if sql_query.startswith("```sql"):
             sql_query = sql_query[6:-3].strip()
         return sql_query
-    except Exception as e:
+    except LLMError as e:
         print(f"Error generating SQL query: {e}")
-        return "SELECT 'Error generating query';"
+        return SQL_GENERATION_ERROR
 
-async def synthesize_response_from_sql(user_question: str, sql_query: str, sql_results: str) -> str:
-    """Generates a natural language response from the SQL query and its results."""
-    prompt = (
+def build_synthesis_prompt(user_question: str, sql_query: str, sql_results: str) -> str:
+    # Results are rendered within the token budget already; this guards other callers
+    max_chars = settings.RESULT_TOKEN_BUDGET * CHARS_PER_TOKEN * 2
+    if len(sql_results) > max_chars:
+        sql_results = sql_results[:max_chars] + "\n... (truncated)"
+    return (
         f"You are a helpful assistant. The user asked the following question: '{user_question}'.\n"
         f"To answer this, the following SQL query was run: '{sql_query}'.\n"
         f"The result of the query was: \n{sql_results}\n\n"
         "Please synthesize a clear, natural language response to the user's original question based on these results."
     )
+
+async def synthesize_response_from_sql(user_question: str, sql_query: str, sql_results: str) -> str:
+    """
+    Generates a natural language response from the SQL query and its results. The same question
+    about the same results, asked while an answer is being written, gets that answer.
+    """
+    template, numbers = normalize_question(user_question)
+    key = (template, tuple(numbers), sql_query, sql_results)
+    return await synthesis_flights.do(key, lambda: _synthesize(user_question, sql_query, sql_results))
+
+async def _synthesize(user_question: str, sql_query: str, sql_results: str) -> str:
+    prompt = build_synthesis_prompt(user_question, sql_query, sql_results)
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
+        completion = await llm_gateway.complete("synthesize", CompletionRequest(
             messages=[{"role": "system", "content": prompt}],
             temperature=0.2,
-        )
-        return response.choices[0].message.content.strip()
-    except Exception as e:
+        ))
+        return completion.content.strip()
+    except LLMError as e:
         print(f"Error synthesizing response: {e}")
-        return "I found some data, but I'm having trouble interpreting it."
+        return SYNTHESIS_ERROR
+
+async def stream_response_from_sql(user_question: str, sql_query: str, sql_results: str) -> AsyncIterator[str]:
+    """
+    Streams the natural language response token by token. Closing the generator closes the
+    upstream HTTP stream, which cancels the completion.
+    """
+    prompt = build_synthesis_prompt(user_question, sql_query, sql_results)
+    tokens = llm_gateway.stream("synthesize_stream", CompletionRequest(
+        messages=[{"role": "system", "content": prompt}],
+        temperature=0.2,
+    ))
+    sent_any = False
+    try:
+        async for token in tokens:
+            sent_any = True
+            yield token
+    except LLMError as e:
+        print(f"Error streaming response: {e}")
+        if not sent_any:
+            yield SYNTHESIS_ERROR
+    finally:
+        await tokens.aclose()
 
 async def generate_tags_for_conversation(conversation_history: str) -> List[str]:
     """Analyzes a conversation and generates a list of relevant tags."""
@@ -53,15 +94,66 @@ async def generate_tags_for_conversation(conversation_history: str) -> List[str]
         "JSON Tag List:"
     )
     try:
-        response = await client.chat.completions.create(
-            model="gpt-4o-mini",
+        completion = await llm_gateway.complete("tag", CompletionRequest(
             messages=[{"role": "system", "content": prompt}],
             temperature=0.1,
-            response_format={"type": "json_object"},
-        )
+            json_mode=True,
+        ))
         # The response is expected to be a JSON object like {"tags": ["tag1", "tag2"]}
-        tags_data = json.loads(response.choices[0].message.content)
+        tags_data = json.loads(completion.content)
         return tags_data.get("tags", [])
-    except Exception as e:
+    except (LLMError, ValueError) as e:
+        print(f"Error generating tags: {e}")
+        return []
+
+async def generate_tags_for_conversations(conversation_histories: Dict[str, str]) -> Dict[str, List[str]]:
+    """Tags several conversations in a single call. Returns the tags keyed by session ID."""
+    conversations = "\n\n".join(
+        f"### Session {session_id}\n{history}" for session_id, history in conversation_histories.items()
+    )
+    prompt = (
+        "You are a helpful assistant that categorizes conversations. For each of the following conversations, "
+        "generate 1 to 3 relevant tags. Example tags include: 'Property Inquiry', 'Price Comparison', "
+        "'Specific Unit Question', 'Resolved', 'Unresolved', 'General Question'.\n"
+        'Reply with a JSON object like {"results": [{"session_id": "...", "tags": ["tag1", "tag2"]}]} '
+        "containing one entry per session.\n\n"
+        f"{conversations}\n\n"
+        "JSON Result:"
+    )
+    try:
+        completion = await llm_gateway.complete("tag_batch", CompletionRequest(
+            messages=[{"role": "system", "content": prompt}],
+            temperature=0.1,
+            json_mode=True,
+        ))
+        results = json.loads(completion.content).get("results", [])
+        return {
+            str(result["session_id"]): [str(tag) for tag in result.get("tags", [])][:3]
+            for result in results
+            if isinstance(result, dict) and str(result.get("session_id")) in conversation_histories
+        }
+    except (LLMError, ValueError, AttributeError) as e:
         print(f"Error generating tags: {e}")
-        return []
\ No newline at end of file
+        return {}
+
+async def summarize_conversation(previous_summary: str, new_messages: str) -> str:
+    """Folds messages that left the memory window into the running conversation summary."""
+    prompt = (
+        "You maintain a running summary of a conversation between a user and a real estate data assistant. "
+        "Update the summary with the new messages. Keep the facts needed to answer follow-up questions: "
+        "properties, addresses, units, figures and the user's goals. Reply with the summary only, "
+        f"in at most {settings.MEMORY_SUMMARY_MAX_TOKENS // 2} words.\n\n"
+        f"Current Summary:\n{previous_summary or '(empty)'}\n\n"
+        f"New Messages:\n{new_messages}\n\n"
+        "Updated Summary:"
+    )
+    try:
+        completion = await llm_gateway.complete("summarize", CompletionRequest(
+            messages=[{"role": "system", "content": prompt}],
+            temperature=0.0,
+            max_tokens=settings.MEMORY_SUMMARY_MAX_TOKENS,
+        ))
+        return completion.content.strip()
+    except LLMError as e:
+        print(f"Error summarizing conversation: {e}")
+        return previous_summary
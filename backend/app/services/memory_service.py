@@ -0,0 +1,62 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core.config import settings
+from app.crud import crud_conversation
+from app.services.llm_service import summarize_conversation
+from app.services.result_renderer import CHARS_PER_TOKEN
+from typing import List
+
+# Long assistant answers are clipped in the prompt; the summary carries their gist
+MAX_MESSAGE_CHARS = 1200
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_messages(messages: list) -> List[str]:
+    lines = []
+    for msg in messages:
+        content = msg.content if len(msg.content) <= MAX_MESSAGE_CHARS else msg.content[:MAX_MESSAGE_CHARS] + " ..."
+        lines.append(f"{msg.role}: {content}")
+    return lines
+
+
+def build_history(conversation) -> str:
+    """
+    Builds the conversation context for prompts: the rolling summary followed by the last
+    MEMORY_WINDOW_MESSAGES messages verbatim, trimmed from the oldest message until the whole
+    context fits MEMORY_TOKEN_BUDGET. Its size does not grow with the length of the session.
+    """
+    summary = conversation.summary
+    max_summary_chars = settings.MEMORY_SUMMARY_MAX_TOKENS * CHARS_PER_TOKEN
+    if len(summary) > max_summary_chars:
+        summary = summary[:max_summary_chars] + " ..."
+    summary_block = f"Summary of earlier conversation: {summary}" if summary else ""
+
+    lines = format_messages(conversation.messages[-settings.MEMORY_WINDOW_MESSAGES:])
+    budget = settings.MEMORY_TOKEN_BUDGET - estimate_tokens(summary_block)
+    while lines and sum(estimate_tokens(line) for line in lines) > budget:
+        lines.pop(0)
+    return "\n".join(([summary_block] if summary_block else []) + lines)
+
+
+def needs_summary_update(total_messages: int, summarized_count: int) -> bool:
+    """True once enough messages have slid out of the window to be worth folding into the summary."""
+    outside_window = total_messages - settings.MEMORY_WINDOW_MESSAGES
+    return outside_window - summarized_count >= settings.MEMORY_SUMMARY_STEP_MESSAGES
+
+
+async def update_summary_in_background(session_id: str, db: AsyncIOMotorDatabase):
+    """A background task that folds the messages that left the window into the stored summary."""
+    conversation = await crud_conversation.get_conversation_window(db, session_id, settings.MEMORY_WINDOW_MESSAGES)
+    if not conversation:
+        return
+    end = conversation.message_count - settings.MEMORY_WINDOW_MESSAGES
+    if end <= conversation.summarized_count:
+        return
+    # Only the messages being folded in are fetched, never the whole array
+    messages = await crud_conversation.get_messages_range(db, session_id, conversation.summarized_count, end - conversation.summarized_count)
+    new_messages = "\n".join(format_messages(messages))
+    summary = await summarize_conversation(conversation.summary, new_messages)
+    if summary:
+        await crud_conversation.update_conversation_summary(db, session_id, summary, end)
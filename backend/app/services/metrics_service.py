@@ -0,0 +1,202 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import functools
+import math
+import threading
+import time
+
+# Bucket upper bounds; +Inf is implicit
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1_024, 2_048, 4_096, 8_192, 16_384)
+VM_STEP_BUCKETS = (0, 1_000, 10_000, 100_000, 1_000_000, 10_000_000, 100_000_000, 1_000_000_000)
+
+# A collector returns (name, type, help, [(labels, value)]) families computed at scrape time
+Sample = Tuple[Dict[str, str], float]
+Collector = Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """A monotonically increasing value per label set."""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_number(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram per label set. Observing is a bisect and three additions under an
+    uncontended lock, so it is cheap enough for every request.
+    """
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum, count
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """In-process metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._metrics: list = []
+        self._collectors: List[Collector] = []
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        metric = Counter(f"{self.namespace}_{name}", help, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(f"{self.namespace}_{name}", help, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Collector):
+        """Registers a callback for values that are already tracked elsewhere, e.g., cache stats."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, metric_type, help, samples in collector():
+                name = f"{self.namespace}_{name}"
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(list(labels), list(labels.values()))} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Create a single instance of the registry
+registry = MetricsRegistry("app")
+
+STAGE_SECONDS = registry.histogram("chat_stage_seconds", "Latency of each stage of a chat turn.", ["stage"])
+MONGO_SECONDS = registry.histogram("mongo_operation_seconds", "Latency of MongoDB CRUD operations.", ["operation"])
+LLM_SECONDS = registry.histogram("llm_request_seconds", "Latency of LLM calls.", ["operation"])
+LLM_TOKENS = registry.histogram("llm_tokens", "Prompt and completion tokens per LLM call.", ["operation", "kind"], TOKEN_BUCKETS)
+LLM_ERRORS = registry.counter("llm_errors_total", "LLM calls that failed.", ["operation"])
+SQL_SECONDS = registry.histogram("sql_execution_seconds", "SQLite query execution and rendering time.")
+# The sqlite3 module reports no per-query work, so the progress handler counts VM instructions, a rough proxy for it
+SQL_VM_STEPS = registry.histogram(
+    "sql_vm_steps", "SQLite VM instructions run per query (approximate; counted in SQLITE_PROGRESS_HANDLER_STEPS increments)", buckets=VM_STEP_BUCKETS
+)
+SQL_ROWS_FETCHED = registry.histogram("sql_rows_fetched", "Result rows fetched from SQLite per query.", buckets=ROW_BUCKETS)
+SQL_ROWS_RETURNED = registry.histogram("sql_rows_returned", "Result rows rendered into the prompt per query.", buckets=ROW_BUCKETS)
+SQL_ERRORS = registry.counter("sql_errors_total", "SQL queries that failed.", ["reason"])
+INGESTION_SECONDS = registry.histogram("ingestion_seconds", "Duration of CSV ingestion jobs.", buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800))
+INGESTION_ROWS = registry.counter("ingestion_rows_total", "Rows loaded by ingestion jobs.")
+INGESTION_BYTES = registry.counter("ingestion_bytes_total", "CSV bytes read by ingestion jobs.")
+INGESTION_JOBS = registry.counter("ingestion_jobs_total", "Finished ingestion jobs.", ["status"])
+INGESTION_ROW_CHANGES = registry.counter("ingestion_row_changes_total", "Rows inserted, updated or deleted by ingestion jobs.", ["change"])
+
+
+@contextmanager
+def stage(name: str, timings: Optional[Dict[str, float]] = None):
+    """Times one stage of a chat turn, recording it in the histogram and the per-response timings."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0.0) + elapsed, 4)
+
+
+def track_mongo(func):
+    """Records the latency of an async CRUD function under its name."""
+    operation = func.__name__
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            MONGO_SECONDS.observe(time.perf_counter() - started, operation=operation)
+    return wrapper
+
+
+def record_llm_usage(operation: str, usage):
+    """Records the token counts reported by the OpenAI API, if any."""
+    if usage is None:
+        return
+    LLM_TOKENS.observe(usage.prompt_tokens or 0, operation=operation, kind="prompt")
+    LLM_TOKENS.observe(usage.completion_tokens or 0, operation=operation, kind="completion")
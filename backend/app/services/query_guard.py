@@ -0,0 +1,189 @@
+from collections import defaultdict
+from dataclasses import dataclass, field
+from app.core.config import settings
+from typing import Dict, List, Optional, Sequence, Tuple
+import re
+import sqlite3
+
+# Literals, quoted identifiers and comments are masked before the SQL is scanned for keywords
+MASK_PATTERN = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]|--[^\n]*|/\*.*?(?:\*/|$)", re.DOTALL)
+READ_ONLY_PREFIX = re.compile(r"^\s*(select|with)\b", re.IGNORECASE)
+LIMIT_KEYWORD = re.compile(r"\blimit\b", re.IGNORECASE)
+FROM_KEYWORD = re.compile(r"\bfrom\b", re.IGNORECASE)
+LIMIT_CLAUSE = re.compile(r"^limit\s+(?P<first>\d+)\s*(?:(?P<comma>,)\s*(?P<second>\d+)|offset\s+\d+)?\s*$", re.IGNORECASE)
+# Actions the guard's authorizer lets through while a query is prepared
+ALLOWED_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# Rows an index search is assumed to return, as a share of the table, when estimating joins
+SEARCH_SELECTIVITY = 0.01
+
+
+@dataclass
+class GuardedQuery:
+    """A generated query after the guard reviewed it: possibly rewritten, or rejected with a reason."""
+    sql: str
+    original_sql: str
+    rejection: Optional[str] = None
+    # Set when the guard added or lowered the LIMIT
+    row_limit: Optional[int] = None
+    notes: List[str] = field(default_factory=list)
+    # EXPLAIN QUERY PLAN rows of `sql`, for callers that inspect the plan after the review
+    plan: List[Tuple[int, int, int, str]] = field(default_factory=list)
+
+    @property
+    def rejected(self) -> bool:
+        return self.rejection is not None
+
+
+def _mask(sql: str) -> str:
+    """Blanks out literals, quoted identifiers and comments, keeping every other character in place."""
+    return MASK_PATTERN.sub(lambda match: " " * len(match.group(0)), sql)
+
+
+def _strip_trailing(sql: str) -> str:
+    """Drops trailing comments, semicolons and whitespace, so clauses can be appended to the SQL."""
+    comments_masked = MASK_PATTERN.sub(
+        lambda match: match.group(0) if match.group(0)[0] in "'\"`[" else " " * len(match.group(0)), sql
+    )
+    return sql[:len(comments_masked.rstrip(" \t\r\n;"))]
+
+
+def _top_level_positions(masked: str, pattern: re.Pattern) -> List[int]:
+    depth = 0
+    depths = []
+    for char in masked:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        depths.append(depth)
+    return [match.start() for match in pattern.finditer(masked) if depths[match.start()] == 0]
+
+
+def check_read_only(sql: str) -> Optional[str]:
+    """Returns why the SQL is not a single read-only SELECT, or None if it is."""
+    masked = _mask(sql).strip().rstrip(";").strip()
+    if not masked:
+        return "the query is empty"
+    if ";" in masked:
+        return "only a single statement is allowed"
+    if not READ_ONLY_PREFIX.match(masked):
+        return "only SELECT statements are allowed"
+    # Writes hidden behind WITH are caught by the authorizer when the query is prepared
+    return None
+
+
+def apply_row_limit(sql: str, max_rows: int) -> Tuple[str, Optional[int], Optional[str]]:
+    """
+    Makes sure a query that reads a table returns at most max_rows rows, by appending a LIMIT,
+    lowering a larger one, or wrapping the query when its LIMIT is an expression.
+    Returns the SQL, the limit applied (None if unchanged) and a note describing the rewrite.
+    """
+    sql = _strip_trailing(sql.strip())
+    masked = _mask(sql)
+    if max_rows <= 0 or not FROM_KEYWORD.search(masked):
+        return sql, None, None
+    limits = _top_level_positions(masked, LIMIT_KEYWORD)
+    if not limits:
+        return f"{sql} LIMIT {max_rows}", max_rows, f"Added LIMIT {max_rows}."
+    position = limits[-1]
+    clause = LIMIT_CLAUSE.match(sql[position:])
+    if clause is None:
+        return f"SELECT * FROM ({sql}) LIMIT {max_rows}", max_rows, f"Wrapped the query to apply LIMIT {max_rows}."
+    count_group = "second" if clause.group("comma") else "first"
+    if int(clause.group(count_group)) <= max_rows:
+        return sql, None, None
+    start, end = clause.span(count_group)
+    clamped = sql[:position + start] + str(max_rows) + sql[position + end:]
+    return clamped, max_rows, f"Lowered the LIMIT to {max_rows}."
+
+
+def _loop_rows(detail: str, table_rows: int) -> Optional[int]:
+    """Estimated rows visited by one loop of the plan, or None if the node is not a loop."""
+    if detail.startswith("SCAN CONSTANT ROW"):
+        return 1
+    if detail.startswith("SCAN "):
+        # Aliases, CTEs and subqueries are all assumed to be as large as the table
+        return table_rows
+    if detail.startswith("SEARCH "):
+        if "INTEGER PRIMARY KEY" in detail:
+            return 1
+        return max(1, int(table_rows * SEARCH_SELECTIVITY))
+    return None
+
+
+def estimate_plan(plan: Sequence[Tuple[int, int, int, str]], table_rows: int) -> Tuple[int, int]:
+    """
+    Estimates the largest full scan and the largest nested loop (rows of the loops multiplied
+    together) from EXPLAIN QUERY PLAN output. Correlated subqueries run once per outer row.
+    """
+    children: Dict[int, List[Tuple[int, str]]] = defaultdict(list)
+    for node_id, parent, _, detail in plan:
+        children[parent].append((node_id, detail))
+    largest_scan = 0
+    largest_loop = 0
+
+    def visit(parent: int, outer: int):
+        nonlocal largest_scan, largest_loop
+        loops = outer
+        for node_id, detail in children.get(parent, []):
+            rows = _loop_rows(detail, table_rows)
+            if rows is not None:
+                loops *= rows
+                if detail.startswith("SCAN "):
+                    largest_scan = max(largest_scan, rows)
+            visit(node_id, loops if detail.startswith("CORRELATED") else 1)
+        largest_loop = max(largest_loop, loops)
+
+    visit(0, 1)
+    return largest_scan, largest_loop
+
+
+def _authorize(action: int, *_) -> int:
+    return sqlite3.SQLITE_OK if action in ALLOWED_ACTIONS else sqlite3.SQLITE_DENY
+
+
+def review_query(connection: sqlite3.Connection, sql: str, table_rows: int) -> GuardedQuery:
+    """
+    Checks a generated query before it runs: it must be a single read-only SELECT, its plan
+    must not scan or join more rows than configured, and its result is capped with a LIMIT.
+    """
+    rejection = check_read_only(sql)
+    if rejection:
+        return GuardedQuery(sql=sql, original_sql=sql, rejection=rejection)
+
+    guarded_sql, row_limit, note = apply_row_limit(sql, settings.SQL_GUARD_MAX_ROWS)
+    connection.set_authorizer(_authorize)
+    try:
+        plan = connection.execute(f"EXPLAIN QUERY PLAN {guarded_sql}").fetchall()
+    except sqlite3.DatabaseError as e:
+        if "not authorized" in str(e):
+            return GuardedQuery(sql=sql, original_sql=sql, rejection="only read-only SELECT statements on the dataset are allowed")
+        return GuardedQuery(sql=sql, original_sql=sql, rejection=f"the query is not valid SQLite: {e}")
+    finally:
+        connection.set_authorizer(None)
+
+    largest_scan, largest_loop = estimate_plan(plan, table_rows)
+    if settings.SQL_GUARD_MAX_SCAN_ROWS and largest_scan > settings.SQL_GUARD_MAX_SCAN_ROWS:
+        return GuardedQuery(
+            sql=sql, original_sql=sql,
+            rejection=f"the query scans about {largest_scan:,} rows without an index, more than the {settings.SQL_GUARD_MAX_SCAN_ROWS:,} allowed",
+        )
+    if settings.SQL_GUARD_MAX_JOIN_ROWS and largest_loop > settings.SQL_GUARD_MAX_JOIN_ROWS:
+        return GuardedQuery(
+            sql=sql, original_sql=sql,
+            rejection=(
+                f"the query would combine about {largest_loop:,} rows, more than the {settings.SQL_GUARD_MAX_JOIN_ROWS:,} allowed; "
+                "avoid joining the table to itself or correlated subqueries over the whole table"
+            ),
+        )
+    if row_limit is None:
+        return GuardedQuery(sql=sql, original_sql=sql, plan=plan)
+    return GuardedQuery(sql=guarded_sql, original_sql=sql, row_limit=row_limit, notes=[note], plan=plan)
+
+
+def regeneration_feedback(query: GuardedQuery) -> str:
+    """Explains a rejected query to the model so it can write a different one."""
+    return (
+        f"\n\nA previous attempt produced this query, which was rejected:\n{query.original_sql}\n"
+        f"Reason: {query.rejection}.\nWrite a different query that avoids this problem.\n\nQuery:"
+    )
@@ -0,0 +1,239 @@
+from app.core.config import settings
+from app.services.llm_service import SQL_GENERATION_ERROR
+from app.services.metrics_service import registry
+from app.services.result_renderer import format_value
+from app.services.text_to_sql_service import QueryResult
+from typing import Any, Optional
+import re
+
+# Decides how a chat turn is answered: greetings and chit-chat get a canned reply without any SQL,
+# scalar and tiny tabular results are phrased from templates derived from the SQL, and only the
+# remaining results go through the synthesis LLM call.
+
+CHAT_RESPONSES = registry.counter("chat_responses_total", "Chat answers by how they were produced.", ["route"])
+
+GREETING_REPLY = (
+    "Hello! Ask me anything about your data, for example how many listings there are "
+    "or what the average rent is."
+)
+THANKS_REPLY = "You're welcome! Let me know if there is anything else you'd like to know about your data."
+GOODBYE_REPLY = "Goodbye! Come back any time you have more questions about your data."
+HOW_ARE_YOU_REPLY = "I'm doing well, thanks for asking! What would you like to know about your data?"
+HELP_REPLY = (
+    "I'm a data assistant. I answer questions about the CSV you uploaded by turning them into SQL queries, "
+    "for example \"How many properties are there?\" or \"What is the highest rent?\"."
+)
+GENERATION_FAILED_REPLY = "Sorry, I couldn't turn that question into a query. Could you rephrase it?"
+NO_ROWS_REPLY = "I couldn't find any records matching your question."
+
+# Matched against the whole normalized message, so "hi, how many units are vacant?" still gets SQL
+SMALL_TALK = [
+    (re.compile(r"(hi|hello|hey|hiya|howdy|greetings|yo|good (morning|afternoon|evening|day))( there| all| everyone)?( \w+)?"), GREETING_REPLY),
+    (re.compile(r"(thanks|thank you|thx|ty|cheers|great|perfect|awesome|nice|cool|ok|okay|got it)( (so much|a lot|very much|again))?( \w+)?"), THANKS_REPLY),
+    (re.compile(r"(bye|goodbye|bye bye|see you|see ya|good night|later)( later| soon| then)?"), GOODBYE_REPLY),
+    (re.compile(r"(hi |hello |hey )?(how are you|how are you doing|hows it going|whats up|sup)( today)?"), HOW_ARE_YOU_REPLY),
+    (re.compile(r"(who are you|what are you|what can you do|what do you do|help|help me)"), HELP_REPLY),
+]
+
+# Questions with these words ask for more than the numbers, so they always go to the LLM
+INTERPRETATION_WORDS = {
+    "why", "explain", "compare", "comparison", "recommend", "recommendation", "should", "suggest",
+    "summarize", "summary", "analyze", "analyse", "analysis", "trend", "trends", "insight", "insights",
+    "describe", "difference", "differences", "interpret", "opinion", "think",
+}
+
+_SELECT_PREFIX = re.compile(r"^\s*select\s+(?:all\s+)?", re.IGNORECASE)
+_FROM = re.compile(r"\bfrom\b", re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]")
+_ROUND = re.compile(r"^round\s*\((?P<inner>.+),\s*\d+\s*\)$", re.IGNORECASE | re.DOTALL)
+_AGGREGATE = re.compile(
+    r"^(?P<func>count|sum|total|avg|min|max)\s*\(\s*(?P<distinct>distinct\s+)?(?P<arg>.+?)\s*\)$",
+    re.IGNORECASE | re.DOTALL,
+)
+_ALIAS = re.compile(r"^(?P<expression>.+?)\s+as\s+(?P<alias>\"[^\"]+\"|`[^`]+`|\[[^\]]+\]|\w+)$", re.IGNORECASE | re.DOTALL)
+_IDENTIFIER = re.compile(r"^(?:(?:\w+|\"[^\"]+\")\.)?(?P<name>\w+|\"[^\"]+\"|`[^`]+`|\[[^\]]+\])$")
+# Result column names as SQLite reports them; anything else is an unaliased expression
+_COLUMN_NAME = re.compile(r"^[\w][\w \-]*$")
+_WHERE = re.compile(r"\b(where|having)\b", re.IGNORECASE)
+MAX_TEMPLATE_VALUE_CHARS = 200
+
+
+def _normalize(message: str) -> str:
+    message = message.lower().replace("'", "").replace("’", "")
+    return " ".join(re.sub(r"[^\w\s]", " ", message).split())
+
+
+def small_talk_reply(message: str) -> Optional[str]:
+    """Returns a canned reply if the message is only a greeting or chit-chat, otherwise None."""
+    if not settings.RESPONSE_ROUTER_ENABLED:
+        return None
+    normalized = _normalize(message)
+    for pattern, reply in SMALL_TALK:
+        if pattern.fullmatch(normalized):
+            return reply
+    return None
+
+
+def _label(column: str) -> Optional[str]:
+    """Turns a column reference like `t."Monthly_Rent"` into "monthly rent"; None for expressions."""
+    match = _IDENTIFIER.match(column.strip())
+    if not match:
+        return None
+    name = match.group("name").strip("\"`[]")
+    return " ".join(name.replace("_", " ").split())
+
+
+def _column_label(name: str) -> Optional[str]:
+    if not _COLUMN_NAME.match(name.strip()):
+        return None
+    return " ".join(name.replace("_", " ").split())
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, bool):
+        return str(value)
+    if isinstance(value, int):
+        return f"{value:,}"
+    if isinstance(value, float):
+        if value.is_integer() and abs(value) < 1e15:
+            return f"{int(value):,}"
+        return f"{value:,.2f}" if abs(value) >= 1 else format_value(value)
+    return format_value(value)
+
+
+def _mask_literals(text: str) -> str:
+    """Blanks out quoted literals and identifiers, keeping every other character in place."""
+    return _LITERAL.sub(lambda match: "_" * len(match.group(0)), text)
+
+
+def _single_select_expression(sql: str) -> Optional[str]:
+    """Returns the select list if it is a single expression, i.e. has no top-level comma."""
+    prefix = _SELECT_PREFIX.match(sql)
+    if not prefix:
+        return None
+    masked = _mask_literals(sql)
+    depth = 0
+    for index in range(prefix.end(), len(masked)):
+        char = masked[index]
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        elif depth == 0 and char == ",":
+            return None
+        elif depth == 0 and _FROM.match(masked, index):
+            # Only the outer query's FROM ends the select list, not one in a subquery
+            return sql[prefix.end():index].strip()
+    return None
+
+
+def _whole_call(pattern: re.Pattern, expression: str) -> Optional[re.Match]:
+    """
+    Matches a call like COUNT(x) only when its parentheses enclose everything after the function
+    name, so "COUNT(*) - COUNT(rent)" or "MAX(rent) - MIN(rent)" are not taken for one aggregate.
+    """
+    match = pattern.match(expression)
+    if match is None:
+        return None
+    masked = _mask_literals(expression)
+    depth = 0
+    for index in range(masked.index("("), len(masked)):
+        if masked[index] == "(":
+            depth += 1
+        elif masked[index] == ")":
+            depth -= 1
+            if depth == 0:
+                return match if index == len(masked) - 1 else None
+    return None
+
+
+def _scalar_reply(sql: str, value: Any) -> Optional[str]:
+    # Only a single aggregate or column, optionally rounded and aliased, is phrased from a template;
+    # arithmetic, subqueries and other expressions are left to the LLM
+    expression = _single_select_expression(sql)
+    if expression is None:
+        return None
+    alias_match = _ALIAS.match(expression)
+    alias = None
+    if alias_match:
+        expression, alias = alias_match.group("expression").strip(), alias_match.group("alias")
+    round_match = _whole_call(_ROUND, expression)
+    if round_match:
+        expression = round_match.group("inner").strip()
+
+    aggregate = _whole_call(_AGGREGATE, expression)
+    if aggregate is None:
+        label = _label(expression)
+        if label is None:
+            return None
+        label = (_label(alias) or label) if alias else label
+        if value is None:
+            return f"There is no {label} value for the matching records."
+        return f"The {label} is {_format(value)}."
+
+    func = aggregate.group("func").lower()
+    arg = aggregate.group("arg")
+    if func == "count":
+        count = int(value or 0)
+        if aggregate.group("distinct"):
+            label = _label(arg)
+            if label is None:
+                return None
+            noun = "value" if count == 1 else "values"
+            return f"There {'is' if count == 1 else 'are'} {count:,} distinct {label} {noun}."
+        filtered = bool(_WHERE.search(sql))
+        if count == 0:
+            return "There are no matching records." if filtered else "There are no records."
+        if count == 1:
+            return "There is 1 matching record." if filtered else "There is 1 record in total."
+        return f"There are {count:,} {'matching records' if filtered else 'records in total'}."
+
+    # Prefer the aggregated column; fall back to the alias for expressions like SUM(price * units)
+    label = _label(arg) or (_label(alias) if alias else None)
+    if label is None:
+        return None
+    if value is None:
+        return f"There are no {label} values for the matching records."
+    phrase = {"sum": "total", "total": "total", "avg": "average", "min": "lowest", "max": "highest"}[func]
+    return f"The {phrase} {label} is {_format(value)}."
+
+
+def _table_reply(result: QueryResult) -> Optional[str]:
+    labels = [_column_label(column) for column in result.columns]
+    if any(label is None for label in labels):
+        return None
+    rows = [[_format(value) for value in row] for row in result.rows]
+    if any(len(value) > MAX_TEMPLATE_VALUE_CHARS for row in rows for value in row):
+        return None
+    if len(labels) == 1:
+        values = [row[0] for row in rows]
+        listed = ", ".join(values[:-1]) + f" and {values[-1]}"
+        return f"I found {len(values)} results for {labels[0]}: {listed}."
+    lines = ["- " + ", ".join(f"{label}: {value}" for label, value in zip(labels, row)) for row in rows]
+    if len(rows) == 1:
+        return "Here is the matching record:\n" + "\n".join(lines)
+    return f"I found {len(rows)} matching records:\n" + "\n".join(lines)
+
+
+def template_reply(question: str, sql: str, result: QueryResult) -> Optional[str]:
+    """
+    Phrases scalar and small tabular results without the LLM. Returns None when the result is
+    too large, failed, or the question asks for interpretation rather than the numbers.
+    """
+    if not settings.RESPONSE_ROUTER_ENABLED:
+        return None
+    if sql == SQL_GENERATION_ERROR:
+        return GENERATION_FAILED_REPLY
+    if result.error or result.truncated:
+        return None
+    if INTERPRETATION_WORDS.intersection(_normalize(question).split()):
+        return None
+    if result.row_count == 0:
+        return NO_ROWS_REPLY
+    if result.row_count != len(result.rows):
+        return None
+    if result.row_count == 1 and len(result.columns) == 1:
+        return _scalar_reply(sql, result.rows[0][0])
+    if result.row_count > settings.RESPONSE_TEMPLATE_MAX_ROWS or len(result.columns) > settings.RESPONSE_TEMPLATE_MAX_COLUMNS:
+        return None
+    return _table_reply(result)
@@ -0,0 +1,143 @@
+from collections import Counter
+from dataclasses import dataclass, field
+from app.core.config import settings
+from typing import Any, List, Optional, Tuple
+import csv
+import io
+import sqlite3
+
+# Rough size of a token for English text and CSV, used to turn the token budget into characters
+CHARS_PER_TOKEN = 4
+FETCH_BATCH_ROWS = 500
+# Distinct values tracked per text column when summarizing rows that did not fit the budget
+MAX_TRACKED_VALUES = 1000
+
+
+@dataclass
+class RenderedResult:
+    text: str
+    columns: List[str] = field(default_factory=list)
+    rows: List[Tuple[Any, ...]] = field(default_factory=list)
+    row_count: int = 0
+    # False when scanning stopped at RESULT_SUMMARY_MAX_ROWS and row_count is a lower bound
+    row_count_exact: bool = True
+    truncated: bool = False
+
+
+class ColumnSummary:
+    """Streaming statistics for one column: numeric range and mean, or the most common values."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.non_null = 0
+        self.numeric = 0
+        self.total = 0.0
+        self.minimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self.values: Counter = Counter()
+        self.values_overflowed = False
+
+    def add(self, value: Any):
+        if value is None:
+            return
+        self.non_null += 1
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            self.numeric += 1
+            self.total += value
+            self.minimum = value if self.minimum is None else min(self.minimum, value)
+            self.maximum = value if self.maximum is None else max(self.maximum, value)
+        elif value in self.values or len(self.values) < MAX_TRACKED_VALUES:
+            self.values[value] += 1
+        else:
+            self.values_overflowed = True
+
+    def describe(self) -> str:
+        if not self.non_null:
+            return f"{self.name}: all null"
+        if self.numeric == self.non_null:
+            mean = self.total / self.numeric
+            return f"{self.name}: min={format_value(self.minimum)}, max={format_value(self.maximum)}, mean={format_value(mean)}"
+        distinct = f"{len(self.values)}+" if self.values_overflowed else str(len(self.values))
+        common = ", ".join(f"{format_value(value)} ({count})" for value, count in self.values.most_common(3))
+        return f"{self.name}: {distinct} distinct values, most common: {common}"
+
+
+def format_value(value: Any) -> str:
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() and abs(value) < 1e15 else str(round(value, 4))
+    return "" if value is None else str(value)
+
+
+def _csv_line(values) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow([format_value(value) for value in values])
+    return buffer.getvalue()
+
+
+def render_cursor(
+    cursor: sqlite3.Cursor,
+    token_budget: int = settings.RESULT_TOKEN_BUDGET,
+    max_scan_rows: int = settings.RESULT_SUMMARY_MAX_ROWS,
+) -> RenderedResult:
+    """
+    Renders a query result as compact CSV within a token budget. Rows are fetched lazily in
+    batches; once the budget is used up the rest are only folded into per-column summary
+    statistics, and fetching stops after max_scan_rows so huge results are never materialized.
+    """
+    columns = [description[0] for description in cursor.description or []]
+    budget_chars = token_budget * CHARS_PER_TOKEN
+    header = _csv_line(columns)
+    lines = [header]
+    used_chars = len(header)
+    rows: List[Tuple[Any, ...]] = []
+    summaries: Optional[List[ColumnSummary]] = None
+    row_count = 0
+    exhausted = False
+
+    while True:
+        batch = cursor.fetchmany(FETCH_BATCH_ROWS)
+        if not batch:
+            exhausted = True
+            break
+        remaining = max_scan_rows - row_count
+        for row in batch[:remaining]:
+            row_count += 1
+            if summaries is None:
+                line = _csv_line(row)
+                if used_chars + len(line) <= budget_chars:
+                    lines.append(line)
+                    rows.append(tuple(row))
+                    used_chars += len(line)
+                    continue
+                # Over budget: summarize everything, including the rows already rendered
+                summaries = [ColumnSummary(name) for name in columns]
+                for rendered in rows:
+                    for summary, value in zip(summaries, rendered):
+                        summary.add(value)
+            for summary, value in zip(summaries, row):
+                summary.add(value)
+        if len(batch) >= remaining:
+            # Stop scanning; peek once to tell whether the row count is exact
+            exhausted = len(batch) == remaining and cursor.fetchone() is None
+            break
+
+    # A single value (e.g., COUNT, SUM) is returned on its own
+    if row_count == 1 and len(columns) == 1 and exhausted and rows:
+        return RenderedResult(text=str(rows[0][0]), columns=columns, rows=rows, row_count=1)
+    if row_count == 0:
+        return RenderedResult(text=f"No rows returned.\n{header}".rstrip("\n"), columns=columns)
+
+    text = "".join(lines)
+    if summaries is not None or not exhausted:
+        total = f"{row_count} rows in total" if exhausted else f"more than {row_count} rows in total"
+        text += f"... {row_count - len(rows)} more rows not shown ({total}).\n"
+    if summaries is not None:
+        text += "Summary of the scanned rows:\n" + "\n".join(summary.describe() for summary in summaries)
+    return RenderedResult(
+        text=text.rstrip("\n"),
+        columns=columns,
+        rows=rows,
+        row_count=row_count,
+        row_count_exact=exhausted,
+        truncated=summaries is not None or not exhausted,
+    )
@@ -0,0 +1,311 @@
+from dataclasses import dataclass, field
+from app.core.config import settings
+from app.db.sqlite_pool import quote_identifier
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import numpy as np
+import pandas as pd
+import re
+import sqlite3
+
+# "replace" rebuilds the table from the file. The other modes change it in place: "append" adds
+# the rows that are not in the table yet, "upsert" also updates rows whose key is already there,
+# and "sync" makes the table match the file, deleting the rows the file no longer has.
+# Without a key column a changed row cannot be told apart from a new one, so upsert behaves
+# like append and sync deletes the old version of the row and inserts the new one.
+LOAD_MODES = ("replace", "append", "upsert", "sync")
+HASH_TABLE_SUFFIX = "__row_hashes"
+# Which key column each table's row hashes were built with
+HASH_STATE_TABLE = "__row_hash_state"
+# Stands in for NULL in text columns, so missing values hash alike whichever side they come from
+NULL_TEXT = "\x00"
+ROWID_ALIASES = ("rowid", "_rowid_", "oid")
+# Frame column holding the rowid of rows read back from the table; cannot clash with a CSV column
+ROWID_COLUMN = "\x00rowid"
+# Rowids per statement when reading back the rows an update replaces
+ROWID_BATCH = 500
+SELECT_STAR_PATTERN = re.compile(r"(?:\bselect|,)\s*(?:distinct\s+)?\*|\.\s*\*")
+
+
+def hash_table_name(table_name: str) -> str:
+    return f"{table_name}{HASH_TABLE_SUFFIX}"
+
+
+def _is_numeric(column_type: str) -> bool:
+    # SQLite's affinity rules: INT, REAL, FLOA and DOUB give the column a numeric affinity
+    column_type = (column_type or "").upper()
+    return any(name in column_type for name in ("INT", "REAL", "FLOA", "DOUB"))
+
+
+@dataclass
+class LoadDelta:
+    """What a load changed in the table, reported on the ingestion job and used to invalidate caches selectively."""
+    mode: str
+    inserted: int = 0
+    updated: int = 0
+    deleted: int = 0
+    # Rows of the previous table left as they were
+    unchanged: int = 0
+    # Columns whose values changed in the updated rows
+    changed_columns: List[str] = field(default_factory=list)
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.inserted or self.updated or self.deleted)
+
+    def affects(self, sql_query: str) -> bool:
+        """
+        Whether the result of a query may differ after this load. Inserts and deletes can change
+        any result; updates only change queries that read one of the changed columns.
+        """
+        if self.mode == "replace" or self.inserted or self.deleted:
+            return True
+        if not self.updated:
+            return False
+        sql_query = sql_query.lower()
+        if SELECT_STAR_PATTERN.search(sql_query):
+            return True
+        return any(
+            re.search(rf"(?<!\w){re.escape(column.lower())}(?!\w)", sql_query) for column in self.changed_columns
+        )
+
+
+def canonical_frame(frame: pd.DataFrame, columns: Sequence[Tuple[str, str]]) -> pd.DataFrame:
+    """
+    Brings a CSV chunk and rows read back from SQLite to the same representation, so a row hashes
+    alike whichever side it came from: numeric columns as floats (SQLite may store 3.0 as 3) and
+    text columns as strings (pandas may parse "00123" as 123 in one chunk and as text in another).
+    """
+    canonical = {}
+    for column, column_type in columns:
+        series = frame[column]
+        if _is_numeric(column_type):
+            canonical[column] = pd.to_numeric(series, errors="coerce").astype("float64")
+        elif pd.api.types.infer_dtype(series, skipna=True) in ("string", "empty"):
+            canonical[column] = series.where(series.notna(), NULL_TEXT)
+        else:
+            canonical[column] = series.astype(str).where(series.notna(), NULL_TEXT)
+    return pd.DataFrame(canonical, index=frame.index)
+
+
+def row_hashes(canonical: pd.DataFrame) -> np.ndarray:
+    # SQLite integers are signed, so the unsigned 64-bit hashes are stored reinterpreted as int64
+    return pd.util.hash_pandas_object(canonical, index=False).to_numpy().view(np.int64)
+
+
+def _bind_values(frame: pd.DataFrame) -> Iterable[Tuple]:
+    # object dtype turns numpy scalars into Python values the sqlite3 driver can bind
+    return frame.astype(object).where(pd.notnull(frame), None).itertuples(index=False, name=None)
+
+
+class DeltaLoader:
+    """
+    Applies a CSV to an existing table in place. Every row of the table has a 64-bit content hash
+    (and a hash of its key, if one is declared) in a side table, so the file is compared with the
+    table by hash without reading the table itself; only the rows that differ are read a second
+    time and written. Indexes, statistics and the rowids of untouched rows are left as they are.
+    The caller runs all steps in one transaction, so readers see either the old or the new table.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, table_name: str, columns: Sequence[Tuple[str, str]], mode: str, key_column: Optional[str] = None):
+        self.connection = connection
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.mode = mode
+        self.key_column = key_column
+        self.hash_table = hash_table_name(table_name)
+        names = {column.lower() for column, _ in self.columns}
+        self.rowid = next(alias for alias in ROWID_ALIASES if alias not in names)
+        self.tracked_rows = 0
+        self.incoming: Optional[pd.DataFrame] = None
+
+    def _hash_frame(self, canonical: pd.DataFrame, ids: Iterable[int], id_column: str) -> pd.DataFrame:
+        frame = pd.DataFrame({id_column: np.fromiter(ids, dtype=np.int64, count=len(canonical)), "row_hash": row_hashes(canonical)})
+        if self.key_column:
+            frame["row_key"] = row_hashes(canonical[[self.key_column]])
+        return frame
+
+    def prepare(self, expected_rows: int):
+        """Makes sure the side table describes the current table, building it from the table if not."""
+        connection = self.connection
+        connection.execute(f"CREATE TABLE IF NOT EXISTS {quote_identifier(HASH_STATE_TABLE)} (table_name TEXT PRIMARY KEY, key_column TEXT)")
+        state = connection.execute(
+            f"SELECT key_column FROM {quote_identifier(HASH_STATE_TABLE)} WHERE table_name = ?", (self.table_name,)
+        ).fetchone()
+        exists = connection.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (self.hash_table,)).fetchone()
+        if exists and state is not None:
+            self.tracked_rows = connection.execute(f"SELECT COUNT(*) FROM {quote_identifier(self.hash_table)}").fetchone()[0]
+            if self.tracked_rows == expected_rows:
+                if state[0] != self.key_column:
+                    self._build_keys()
+                return
+        self._build_hashes()
+
+    def _save_state(self):
+        self.connection.execute(
+            f"INSERT INTO {quote_identifier(HASH_STATE_TABLE)} (table_name, key_column) VALUES (?, ?) "
+            "ON CONFLICT (table_name) DO UPDATE SET key_column = excluded.key_column",
+            (self.table_name, self.key_column),
+        )
+
+    def _build_keys(self):
+        """Re-hashes only the key column when a different key is declared than last time."""
+        hash_table = quote_identifier(self.hash_table)
+        if self.key_column is None:
+            self.connection.execute(f"UPDATE {hash_table} SET row_key = NULL")
+        else:
+            key_type = dict(self.columns)[self.key_column]
+            cursor = self.connection.execute(f"SELECT {self.rowid}, {quote_identifier(self.key_column)} FROM {quote_identifier(self.table_name)}")
+            while True:
+                rows = cursor.fetchmany(settings.INGESTION_CHUNK_ROWS)
+                if not rows:
+                    break
+                frame = pd.DataFrame.from_records(rows, columns=[ROWID_COLUMN, self.key_column], coerce_float=False)
+                keys = row_hashes(canonical_frame(frame, [(self.key_column, key_type)]))
+                self.connection.executemany(f"UPDATE {hash_table} SET row_key = ? WHERE row_id = ?", zip(keys.tolist(), frame[ROWID_COLUMN].tolist()))
+        self._save_state()
+
+    def _build_hashes(self):
+        connection = self.connection
+        hash_table = quote_identifier(self.hash_table)
+        connection.execute(f"DROP TABLE IF EXISTS {hash_table}")
+        connection.execute(f"CREATE TABLE {hash_table} (row_id INTEGER PRIMARY KEY, row_hash INTEGER NOT NULL, row_key INTEGER)")
+        names = [column for column, _ in self.columns]
+        cursor = connection.execute(f"SELECT {self.rowid}, {', '.join(map(quote_identifier, names))} FROM {quote_identifier(self.table_name)}")
+        self.tracked_rows = 0
+        while True:
+            rows = cursor.fetchmany(settings.INGESTION_CHUNK_ROWS)
+            if not rows:
+                break
+            frame = pd.DataFrame.from_records(rows, columns=[ROWID_COLUMN, *names], coerce_float=False)
+            self._track(self._hash_frame(canonical_frame(frame, self.columns), frame[ROWID_COLUMN], "row_id"))
+            self.tracked_rows += len(rows)
+        self._save_state()
+
+    def _track(self, hashes: pd.DataFrame):
+        self.connection.executemany(
+            f"INSERT INTO {quote_identifier(self.hash_table)} (row_id, row_hash, row_key) VALUES (?, ?, ?)",
+            zip(hashes["row_id"].tolist(), hashes["row_hash"].tolist(), hashes["row_key"].tolist() if self.key_column else repeat(None)),
+        )
+
+    def stage(self, chunks: Iterable[pd.DataFrame]) -> int:
+        """First pass over the file: hashes every row (and its key). Keeps 16-24 bytes per row in memory."""
+        frames = []
+        rows_read = 0
+        for chunk in chunks:
+            frames.append(self._hash_frame(canonical_frame(chunk, self.columns), range(rows_read, rows_read + len(chunk)), "row_no"))
+            rows_read += len(chunk)
+        if not frames:
+            frames.append(pd.DataFrame({"row_no": [], "row_hash": [], "row_key": []}, dtype=np.int64))
+        self.incoming = pd.concat(frames, ignore_index=True)
+        return rows_read
+
+    def diff(self) -> Tuple[np.ndarray, Dict[int, List[int]], List[int]]:
+        """
+        Compares the staged file with the side table. Returns the file rows to insert, the file
+        rows that replace table rows (file row -> rowids) and the rowids to delete.
+        """
+        columns = "row_id, row_hash, row_key" if self.key_column else "row_id, row_hash"
+        existing = pd.read_sql_query(f"SELECT {columns} FROM {quote_identifier(self.hash_table)} ORDER BY row_id", self.connection)
+        incoming = self.incoming
+        updates: Dict[int, List[int]] = {}
+        if self.key_column:
+            # With duplicate keys in the file the last row wins
+            incoming = incoming.drop_duplicates("row_key", keep="last")
+            inserts = incoming.loc[~incoming["row_key"].isin(existing["row_key"]), "row_no"]
+            deletes = existing.loc[~existing["row_key"].isin(incoming["row_key"]), "row_id"]
+            if self.mode != "append":
+                # An inner merge keeps the hashes as int64; an outer one would turn them into floats
+                both = incoming.merge(existing, on="row_key", suffixes=("", "_old"))
+                changed = both[both["row_hash"] != both["row_hash_old"]]
+                for row_no, row_id in zip(changed["row_no"].tolist(), changed["row_id"].tolist()):
+                    updates.setdefault(row_no, []).append(row_id)
+        else:
+            # Rows are compared as multisets: the n-th copy of a row in the file matches the n-th copy in the table
+            incoming = incoming.assign(occurrence=incoming.groupby("row_hash").cumcount())
+            existing = existing.assign(occurrence=existing.groupby("row_hash").cumcount())
+            matched = incoming.merge(existing, on=["row_hash", "occurrence"], how="outer", indicator=True)
+            inserts = matched.loc[matched["_merge"] == "left_only", "row_no"]
+            deletes = matched.loc[matched["_merge"] == "right_only", "row_id"]
+        deletes = deletes.astype(np.int64).tolist() if self.mode == "sync" else []
+        return inserts.to_numpy(dtype=np.int64), updates, deletes
+
+    def apply(self, chunks: Iterable[pd.DataFrame], inserts: np.ndarray, updates: Dict[int, List[int]], deletes: List[int]) -> LoadDelta:
+        """Second pass over the file: writes the rows found by diff() and deletes the others."""
+        connection = self.connection
+        delta = LoadDelta(mode=self.mode)
+        if deletes:
+            for statement in (
+                f"DELETE FROM {quote_identifier(self.table_name)} WHERE {self.rowid} = ?",
+                f"DELETE FROM {quote_identifier(self.hash_table)} WHERE row_id = ?",
+            ):
+                connection.executemany(statement, ((row_id,) for row_id in deletes))
+            delta.deleted = len(deletes)
+
+        changed_columns: Set[str] = set()
+        if len(inserts) or updates:
+            next_rowid = connection.execute(f"SELECT COALESCE(MAX({self.rowid}), 0) + 1 FROM {quote_identifier(self.table_name)}").fetchone()[0]
+            update_numbers = np.fromiter(updates, dtype=np.int64, count=len(updates))
+            rows_read = 0
+            for chunk in chunks:
+                numbers = np.arange(rows_read, rows_read + len(chunk))
+                rows_read += len(chunk)
+                insert_mask = np.isin(numbers, inserts)
+                if insert_mask.any():
+                    new_rows = chunk[insert_mask]
+                    self._insert_rows(new_rows, range(next_rowid, next_rowid + len(new_rows)))
+                    next_rowid += len(new_rows)
+                    delta.inserted += len(new_rows)
+                update_mask = np.isin(numbers, update_numbers)
+                if update_mask.any():
+                    targets = [updates[row_no] for row_no in numbers[update_mask].tolist()]
+                    changed_columns.update(self._update_rows(chunk[update_mask], targets))
+                    delta.updated += sum(len(rowids) for rowids in targets)
+
+        delta.unchanged = self.tracked_rows - delta.updated - delta.deleted
+        delta.changed_columns = [column for column, _ in self.columns if column in changed_columns]
+        return delta
+
+    def _insert_rows(self, rows: pd.DataFrame, rowids: range):
+        names = [column for column, _ in self.columns]
+        placeholders = ", ".join("?" for _ in range(len(names) + 1))
+        self.connection.executemany(
+            f"INSERT INTO {quote_identifier(self.table_name)} ({self.rowid}, {', '.join(map(quote_identifier, names))}) VALUES ({placeholders})",
+            ((rowid, *values) for rowid, values in zip(rowids, _bind_values(rows[names]))),
+        )
+        self._track(self._hash_frame(canonical_frame(rows, self.columns), rowids, "row_id"))
+
+    def _update_rows(self, rows: pd.DataFrame, targets: List[List[int]]) -> Set[str]:
+        """Overwrites the target rows with the file's rows and returns the columns whose values changed."""
+        names = [column for column, _ in self.columns]
+        table = quote_identifier(self.table_name)
+        positions = [position for position, rowids in enumerate(targets) for _ in rowids]
+        rowids = [rowid for rowids in targets for rowid in rowids]
+        new = canonical_frame(rows, self.columns).iloc[positions]
+
+        old_rows = []
+        for start in range(0, len(rowids), ROWID_BATCH):
+            batch = rowids[start:start + ROWID_BATCH]
+            old_rows.extend(self.connection.execute(
+                f"SELECT {self.rowid}, {', '.join(map(quote_identifier, names))} FROM {table} WHERE {self.rowid} IN ({', '.join('?' for _ in batch)})",
+                batch,
+            ))
+        old = pd.DataFrame.from_records(old_rows, columns=[ROWID_COLUMN, *names], coerce_float=False).set_index(ROWID_COLUMN)
+        old = canonical_frame(old, self.columns).loc[rowids]
+        changed = set()
+        for column in names:
+            new_values, old_values = new[column].to_numpy(), old[column].to_numpy()
+            if ((new_values != old_values) & ~(pd.isna(new_values) & pd.isna(old_values))).any():
+                changed.add(column)
+
+        assignments = ", ".join(f"{quote_identifier(column)} = ?" for column in names)
+        values = list(_bind_values(rows[names]))
+        self.connection.executemany(
+            f"UPDATE {table} SET {assignments} WHERE {self.rowid} = ?",
+            ((*values[position], rowid) for position, rowid in zip(positions, rowids)),
+        )
+        self.connection.executemany(
+            f"UPDATE {quote_identifier(self.hash_table)} SET row_hash = ? WHERE row_id = ?",
+            zip(row_hashes(new).tolist(), rowids),
+        )
+        return changed
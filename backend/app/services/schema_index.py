@@ -0,0 +1,198 @@
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from app.core.config import settings
+from app.db.sqlite_pool import quote_identifier
+from typing import Any, Dict, Iterable, List, Sequence, Set, Tuple
+import re
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+CAMEL_CASE_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+# Words that say nothing about which columns or values a question is about
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from", "has", "have",
+    "how", "i", "in", "is", "it", "its", "me", "many", "much", "my", "no", "not", "of", "on", "or",
+    "show", "that", "the", "their", "there", "these", "this", "to", "was", "what", "which", "who",
+    "with", "you", "all", "any", "list", "give", "tell", "find", "get", "number", "total", "value",
+}
+# Candidate values verified exactly per question; the rest only share common trigrams with it
+MAX_VALUE_CANDIDATES = 200
+MIN_VALUE_CHARS = 3
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cases and splits on anything that is not a letter or digit, including camelCase boundaries."""
+    return TOKEN_PATTERN.findall(CAMEL_CASE_BOUNDARY.sub(" ", str(text)).lower())
+
+
+def trigrams(text: str) -> Set[str]:
+    padded = f" {' '.join(tokenize(text))} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _tokens_match(column_token: str, question_token: str) -> bool:
+    # Prefix matches cover plurals and similar forms, e.g. "bedroom" and "bedrooms"
+    if column_token == question_token:
+        return True
+    shorter, longer = sorted((column_token, question_token), key=len)
+    return len(shorter) >= 3 and longer.startswith(shorter)
+
+
+def _word_match_score(value_tokens: List[str], question_tokens: Set[str]) -> float:
+    """
+    The share of a value's words found in the question. Numbers and very short words must
+    match exactly, and a missing number rules the value out, so "12 Main St" never
+    matches "512 Main St".
+    """
+    matched = 0
+    for token in value_tokens:
+        if token.isdigit() or len(token) < 3:
+            if token in question_tokens:
+                matched += 1
+            elif token.isdigit():
+                return 0.0
+        elif any(_tokens_match(token, question_token) for question_token in question_tokens):
+            matched += 1
+    return matched / len(value_tokens)
+
+
+@dataclass
+class PromptSchema:
+    """The columns and literal values to show the model for one question."""
+    columns: List[Tuple[str, str]]
+    # (column, value) pairs from the data that the question mentions
+    literals: List[Tuple[str, str]] = field(default_factory=list)
+    pruned: bool = False
+
+
+class SchemaIndex:
+    """
+    An inverted index over a table's column names and the distinct values of its categorical
+    columns. Values are indexed by character trigram to find candidates for a question cheaply,
+    and candidates are then checked word by word, which tolerates plurals, punctuation and case.
+    """
+
+    def __init__(self, columns: Sequence[Tuple[str, str]], values: Dict[str, Iterable[str]]):
+        self.columns = list(columns)
+        self.column_tokens = {
+            column: [token for token in tokenize(column) if token not in STOPWORDS and not token.isdigit()]
+            for column, _ in self.columns
+        }
+        self.values: List[Tuple[str, str]] = []
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+        for column, column_values in values.items():
+            for value in column_values:
+                normalized = " ".join(tokenize(value))
+                if len(normalized) < MIN_VALUE_CHARS or normalized in STOPWORDS:
+                    continue
+                value_id = len(self.values)
+                grams = trigrams(value)
+                self.values.append((column, value))
+                for gram in grams:
+                    self.postings[gram].append(value_id)
+        self.postings = dict(self.postings)
+        # Trigrams shared by a large share of the values only add noise to candidate generation
+        self.max_posting = max(1000, len(self.values) // 20)
+
+    @property
+    def value_count(self) -> int:
+        return len(self.values)
+
+    def match_columns(self, text: str) -> List[str]:
+        """Returns the columns whose name shares a word with the text, in table order."""
+        question_tokens = set(tokenize(text)) - STOPWORDS
+        return [
+            column for column, _ in self.columns
+            if any(_tokens_match(token, question_token) for token in self.column_tokens[column] for question_token in question_tokens)
+        ]
+
+    def match_values(self, text: str, limit: int = settings.SCHEMA_INDEX_MAX_LITERALS) -> List[Tuple[str, str]]:
+        """Returns (column, value) pairs whose value appears in the text, most specific first."""
+        hits: Counter = Counter()
+        for gram in trigrams(text):
+            posting = self.postings.get(gram)
+            if posting and len(posting) <= self.max_posting:
+                hits.update(posting)
+        # Trigrams only find candidates; a value matches when the question contains its words
+        question_tokens = set(tokenize(text))
+        matches = []
+        for value_id, _ in hits.most_common(MAX_VALUE_CANDIDATES):
+            column, value = self.values[value_id]
+            value_tokens = tokenize(value)
+            score = _word_match_score(value_tokens, question_tokens)
+            if score >= settings.SCHEMA_INDEX_MATCH_THRESHOLD:
+                matches.append((score, len(value_tokens), column, value))
+        matches.sort(key=lambda match: (-match[0], -match[1]))
+        return [(column, value) for _, _, column, value in matches[:limit]]
+
+    def prompt_schema(self, question: str, context: str = "") -> PromptSchema:
+        """
+        Picks the columns to show for a question: those named in the question or the recent
+        context, those holding a value it mentions, and the first few key columns. Narrow tables
+        and questions that match no column keep the full schema.
+        """
+        literals = self.match_values(question)
+        if len(self.columns) < settings.SCHEMA_PRUNE_MIN_COLUMNS:
+            return PromptSchema(columns=self.columns, literals=literals)
+        relevant = set(self.match_columns(f"{question} {context}")) | {column for column, _ in literals}
+        if not relevant:
+            return PromptSchema(columns=self.columns, literals=literals)
+        relevant.update(column for column, _ in self.columns[:settings.SCHEMA_PRUNE_KEY_COLUMNS])
+        columns = [(column, column_type) for column, column_type in self.columns if column in relevant]
+        return PromptSchema(columns=columns, literals=literals, pruned=len(columns) < len(self.columns))
+
+
+class SchemaIndexBuilder:
+    """
+    Collects the distinct values of a table's TEXT columns while it is loaded. Columns with more
+    than SCHEMA_INDEX_MAX_DISTINCT_PER_COLUMN distinct values are treated as free text and dropped.
+    """
+
+    def __init__(self, columns: Sequence[Tuple[str, str]]):
+        self.columns = list(columns)
+        self.distinct: Dict[str, Set[str]] = {column: set() for column, column_type in self.columns if column_type == "TEXT"}
+        self.dropped: Set[str] = set()
+
+    def _add(self, column: str, values: Iterable[Any]):
+        seen = self.distinct.get(column)
+        if seen is None:
+            return
+        seen.update(
+            str(value) for value in values
+            if value is not None and len(str(value)) <= settings.SCHEMA_INDEX_MAX_VALUE_CHARS
+        )
+        if len(seen) > settings.SCHEMA_INDEX_MAX_DISTINCT_PER_COLUMN:
+            del self.distinct[column]
+            self.dropped.add(column)
+
+    def add_chunk(self, chunk):
+        """Adds a pandas chunk whose columns are already sanitized."""
+        for column in list(self.distinct):
+            self._add(column, chunk[column].dropna().unique())
+
+    def add_rows(self, columns: Sequence[str], rows: Iterable[Sequence[Any]]):
+        rows = list(rows)
+        for position, column in enumerate(columns):
+            if column in self.distinct:
+                self._add(column, {row[position] for row in rows})
+
+    @property
+    def text_columns(self) -> List[str]:
+        return list(self.distinct)
+
+    def build(self) -> SchemaIndex:
+        # Within the overall budget, low-cardinality columns (statuses, types, cities) go first
+        budget = settings.SCHEMA_INDEX_MAX_VALUES
+        values: Dict[str, Iterable[str]] = {}
+        for column, distinct in sorted(self.distinct.items(), key=lambda item: len(item[1])):
+            if len(distinct) > budget:
+                break
+            values[column] = sorted(distinct)
+            budget -= len(distinct)
+        return SchemaIndex(self.columns, values)
+
+
+def format_literals(literals: List[Tuple[str, str]]) -> str:
+    """Renders matched values as SQL comparisons the model can copy verbatim."""
+    return "\n".join(
+        f"- {quote_identifier(column)} = '" + value.replace("'", "''") + "'" for column, value in literals
+    )
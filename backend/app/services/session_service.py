@@ -0,0 +1,80 @@
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from app.core.config import settings
+from app.core.security import create_session_token, decode_session_token
+from app.crud import crud_user
+from app.db.session import get_database
+from app.schemas.user import User
+from app.services.cache_service import LRUCache
+from app.services.metrics_service import registry
+from typing import Optional
+import time
+
+
+class SessionService:
+    """
+    Issues signed session tokens and resolves them to users. A token's first use on a worker
+    checks the signature and loads the user from MongoDB; after that the verified session is
+    served from an in-memory LRU until SESSION_CACHE_TTL_SECONDS pass or the token expires.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.cache = LRUCache(max_entries=max_entries, ttl_seconds=ttl_seconds)
+
+    def issue(self, user: User) -> str:
+        token = create_session_token(user.id)
+        claims = decode_session_token(token)
+        self.cache.put(token, (user, claims["exp"]))
+        return token
+
+    async def authenticate(self, token: str, db: AsyncIOMotorDatabase) -> Optional[User]:
+        """Returns the token's user, or None if the token is invalid, expired or its user no longer exists."""
+        cached = self.cache.get(token)
+        if cached is not None:
+            user, expires_at = cached
+            if expires_at >= time.time():
+                return user
+        claims = decode_session_token(token)
+        if claims is None:
+            return None
+        user = await crud_user.get_user_by_id(db, user_id=claims["sub"])
+        if user is None:
+            return None
+        self.cache.put(token, (user, claims["exp"]))
+        return user
+
+    def invalidate_user(self, user_id: str) -> int:
+        """Drops the user's cached sessions, e.g. after their profile changed."""
+        return self.cache.remove_where(lambda token: (decode_session_token(token) or {}).get("sub") == user_id)
+
+    def stats(self):
+        return self.cache.stats()
+
+
+# Create a single instance of the service
+session_service = SessionService(max_entries=settings.SESSION_CACHE_MAX_ENTRIES, ttl_seconds=settings.SESSION_CACHE_TTL_SECONDS)
+
+registry.register_collector(lambda: [
+    ("session_cache_hits_total", "counter", "Requests authenticated from the verified-session cache.", [({}, session_service.cache.hits)]),
+    ("session_cache_misses_total", "counter", "Session tokens that had to be verified against MongoDB.", [({}, session_service.cache.misses)]),
+])
+
+bearer_scheme = HTTPBearer(auto_error=False)
+
+
+async def get_session_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+) -> Optional[User]:
+    """Resolves an optional Bearer session token. A token that is present but invalid is rejected."""
+    if credentials is None:
+        return None
+    user = await session_service.authenticate(credentials.credentials, db)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired session token.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
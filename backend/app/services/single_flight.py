@@ -0,0 +1,53 @@
+from dataclasses import dataclass
+from app.core.config import settings
+from app.services.metrics_service import registry
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+COALESCED_CALLS = registry.counter("coalesced_calls_total", "Calls that joined an identical call already in flight.", ["stage"])
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller starts the work as a task and
+    callers that arrive while it runs await that same task instead of starting their own.
+    Results and exceptions reach every caller. A caller that is cancelled only stops waiting;
+    the work is cancelled once no caller is waiting for it any more. Nothing is kept after the
+    work finishes, so this complements the caches rather than replacing them.
+    """
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self._flights: Dict[Hashable, _Flight] = {}
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> T:
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await work()
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(work()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            COALESCED_CALLS.inc(stage=self.stage)
+        flight.waiters += 1
+        try:
+            # Shielded, so one caller's cancellation does not cancel the work the others wait for
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._forget(key, flight)
+                flight.task.cancel()
@@ -0,0 +1,149 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, ReturnDocument
+from app.core.config import settings
+from app.crud import crud_conversation
+from app.services.llm_gateway import INTERACTIVE, llm_gateway
+from app.services.llm_service import generate_tags_for_conversations
+from app.services.memory_service import build_history
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set
+import asyncio
+
+QUEUE_COLLECTION = "tagging_queue"
+
+
+async def enqueue_tagging(db: AsyncIOMotorDatabase, session_id: str):
+    """
+    Marks a session for re-tagging. Repeated turns within the debounce window collapse into one
+    queue entry, so tagging cost follows the number of active sessions rather than turns.
+    """
+    now = datetime.utcnow()
+    await db[QUEUE_COLLECTION].update_one(
+        {"session_id": session_id},
+        {
+            "$inc": {"pending_turns": 1},
+            "$setOnInsert": {
+                "due_at": now + timedelta(seconds=settings.TAGGING_DEBOUNCE_SECONDS),
+                "claimed_until": None,
+            },
+        },
+        upsert=True,
+    )
+
+
+class TaggingWorker:
+    """
+    Drains the durable tagging queue in Mongo. Due sessions are claimed with a lease, tagged
+    in batches with one LLM call per batch, and removed from the queue, unless new turns arrived
+    meanwhile, in which case they are re-queued for the next window. The worker runs with
+    bounded concurrency and backs off while interactive LLM calls are in flight.
+    """
+
+    def __init__(self):
+        self.db: Optional[AsyncIOMotorDatabase] = None
+        self._task: Optional[asyncio.Task] = None
+        # Batches being processed; held here so they are not garbage-collected mid-run
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self._semaphore = asyncio.Semaphore(settings.TAGGING_MAX_CONCURRENCY)
+
+    async def start(self, db: AsyncIOMotorDatabase):
+        self.db = db
+        await db[QUEUE_COLLECTION].create_index([("session_id", ASCENDING)], unique=True)
+        await db[QUEUE_COLLECTION].create_index([("due_at", ASCENDING)])
+        self._task = asyncio.create_task(self._run())
+        print("Tagging worker started.")
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        # Claimed items of cancelled batches become available again when their lease expires
+        batch_tasks = list(self._batch_tasks)
+        for task in batch_tasks:
+            task.cancel()
+        await asyncio.gather(*batch_tasks, return_exceptions=True)
+        print("Tagging worker stopped.")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.sleep(settings.TAGGING_POLL_INTERVAL_SECONDS)
+                # Interactive traffic has priority for the shared OpenAI rate limit
+                if llm_gateway.in_flight[INTERACTIVE] >= settings.TAGGING_YIELD_TO_INTERACTIVE:
+                    continue
+                await self._semaphore.acquire()
+                batch = await self._claim_batch()
+                if not batch:
+                    self._semaphore.release()
+                    continue
+                task = asyncio.create_task(self._process_batch(batch))
+                self._batch_tasks.add(task)
+                task.add_done_callback(self._batch_tasks.discard)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in tagging worker: {e}")
+
+    async def _claim_batch(self) -> List[dict]:
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=settings.TAGGING_LEASE_SECONDS)
+        batch = []
+        for _ in range(settings.TAGGING_BATCH_SIZE):
+            item = await self.db[QUEUE_COLLECTION].find_one_and_update(
+                {"due_at": {"$lte": now}, "$or": [{"claimed_until": None}, {"claimed_until": {"$lt": now}}]},
+                {"$set": {"claimed_until": lease_until}},
+                sort=[("due_at", ASCENDING)],
+                return_document=ReturnDocument.AFTER,
+            )
+            if item is None:
+                break
+            batch.append(item)
+        return batch
+
+    async def _process_batch(self, batch: List[dict]):
+        try:
+            conversations = await asyncio.gather(*[
+                crud_conversation.get_conversation_window(self.db, item["session_id"], settings.MEMORY_WINDOW_MESSAGES)
+                for item in batch
+            ])
+            histories: Dict[str, str] = {
+                conversation.id: build_history(conversation) for conversation in conversations if conversation
+            }
+            tags_by_session = await generate_tags_for_conversations(histories) if histories else {}
+            for session_id, tags in tags_by_session.items():
+                if tags:
+                    await crud_conversation.update_conversation_tags(self.db, session_id, tags)
+            print(f"Tagged {len(tags_by_session)} of {len(batch)} queued sessions.")
+            # Sessions the model returned no result for, e.g. because the call failed, stay
+            # claimed until their lease expires and are retried then. Deleted sessions are done.
+            for item in batch:
+                if item["session_id"] in tags_by_session or item["session_id"] not in histories:
+                    await self._finish(item)
+        except Exception as e:
+            # Claimed items become available again when their lease expires
+            print(f"Error processing tagging batch: {e}")
+        finally:
+            self._semaphore.release()
+
+    async def _finish(self, item: dict):
+        """Removes the queue entry, or re-queues it if more turns arrived while it was being tagged."""
+        result = await self.db[QUEUE_COLLECTION].delete_one({"_id": item["_id"], "pending_turns": item["pending_turns"]})
+        if result.deleted_count == 0:
+            await self.db[QUEUE_COLLECTION].update_one(
+                {"_id": item["_id"]},
+                {
+                    "$inc": {"pending_turns": -item["pending_turns"]},
+                    "$set": {
+                        "due_at": datetime.utcnow() + timedelta(seconds=settings.TAGGING_DEBOUNCE_SECONDS),
+                        "claimed_until": None,
+                    },
+                },
+            )
+
+
+# Create a single instance of the worker
+tagging_worker = TaggingWorker()
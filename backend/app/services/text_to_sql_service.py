@@ -1,40 +1,310 @@
 import pandas as pd
-import sqlalchemy
 from app.core.config import settings
+from app.services.cache_service import LRUCache, sql_translation_cache, sql_result_cache, canonicalize_sql, is_deterministic_sql
+from app.db.sqlite_pool import SQLiteReadPool, QueryBudgetError, QueryTimeoutError, maintenance_executor, query_executor, quote_identifier
+from app.services.index_advisor import IndexAdvisor
+from app.services.query_guard import GuardedQuery, review_query
+from app.services.row_delta import DeltaLoader, LoadDelta, hash_table_name
+from app.services.schema_index import SchemaIndex, SchemaIndexBuilder, format_literals
+from app.services.result_renderer import render_cursor
+from app.services.single_flight import SingleFlight
+from app.services.metrics_service import SQL_ERRORS, SQL_ROWS_FETCHED, SQL_ROWS_RETURNED, SQL_SECONDS, SQL_VM_STEPS
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+import asyncio
+import hashlib
 import logging
 import os
+import sqlite3
+import time
 
 logger = logging.getLogger(__name__)
 
+@dataclass
+class QueryResult:
+    """The rendered result of a SQL query together with its row metadata."""
+    text: str
+    columns: List[str] = field(default_factory=list)
+    # The rows rendered into text; rows beyond the token budget are only summarized
+    rows: List[Tuple[Any, ...]] = field(default_factory=list)
+    row_count: int = 0
+    truncated: bool = False
+    error: bool = False
+
+    @property
+    def size_bytes(self) -> int:
+        # The rendered text dominates; the rendered rows hold roughly the same data again
+        return 2 * len(self.text.encode("utf-8")) + sum(len(col) for col in self.columns) + 128
+
+ProgressCallback = Callable[[int, int, int], None]
+
+query_flights = SingleFlight("execute_sql")
+
+# Bulk loads rebuild the table from scratch, so durability is traded for insert speed.
+# WAL also lets the pooled readers keep querying while a load is writing.
+BULK_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = OFF",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+)
+# In-place loads change the live table, so they keep the default durability
+IN_PLACE_LOAD_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",
+)
+
+def sanitize_column_name(column: str) -> str:
+    return str(column).replace(' ', '_').replace('/', '_').replace('(', '').replace(')', '')
+
+def infer_sqlite_type(series: pd.Series) -> str:
+    """Maps a pandas column to a SQLite type affinity, keeping integral floats (ints with NaNs) as INTEGER."""
+    if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(series):
+        values = series.dropna()
+        return "INTEGER" if len(values) and (values % 1 == 0).all() else "REAL"
+    return "TEXT"
+
+def build_create_table(table_name: str, columns: List[Tuple[str, str]]) -> str:
+    column_defs = ",\n".join(f"{quote_identifier(col)} {col_type}" for col, col_type in columns)
+    return f"CREATE TABLE {quote_identifier(table_name)} (\n{column_defs}\n)"
+
 class TextToSQLService:
-    def __init__(self, db_path: str = settings.SQLITE_DB_PATH):
+    """Text-to-SQL access to one dataset, stored as a table in its own SQLite file."""
+
+    def __init__(self, dataset_id: str, db_path: str):
+        self.dataset_id = dataset_id
         self.db_path = db_path
-        self.engine = sqlalchemy.create_engine(f"sqlite:///{self.db_path}")
+        self.read_pool = SQLiteReadPool(self.db_path, size=settings.SQLITE_POOL_SIZE_PER_DATASET)
+        self.index_advisor = IndexAdvisor(self.db_path)
+        # Query guard reviews by (version, advisor generation, SQL): a query checked after
+        # generation is not planned again when it runs, nor by the index advisor
+        self._reviews = LRUCache(settings.SQL_GUARD_REVIEW_CACHE_MAX_ENTRIES, settings.SQL_GUARD_REVIEW_CACHE_TTL_SECONDS)
         self.table_name = None
         self.schema = None
+        self.row_count = 0
+        # Built while loading, or lazily from the table when the dataset is reopened
+        self.schema_index: Optional[SchemaIndex] = None
+        self._schema_index_pending = False
+        # Changes with every load so results computed against an older table are never served.
+        # The dataset catalog hands out versions, so they agree across workers
+        self.version = 0
 
-    def load_csv_to_sql(self, file_path: str):
+    def load_csv_to_sql(
+        self,
+        file_path: str,
+        table_name: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        version: Optional[int] = None,
+        mode: str = "replace",
+        key_column: Optional[str] = None,
+    ) -> Optional[LoadDelta]:
         """
-        Loads a CSV file into a SQLite database, overwriting the table if it exists.
+        Loads a CSV file into a SQLite database, replacing the table if it exists.
+        The file is parsed in chunks and bulk-inserted into a staging table, so memory use does not
+        grow with file size, and the staging table is swapped in atomically once it is complete, so
+        queries never see a half-loaded table.
+        The append, upsert and sync modes change the loaded table in place instead (see
+        load_csv_in_place), whatever the file is called; with no table loaded yet they load the
+        file in full. Returns what the load changed, or None if it failed. Raises ValueError,
+        changing nothing, when an in-place load's columns differ from the loaded table.
         """
+        # Use the filename (without extension) as the table name
+        table_name = table_name or os.path.splitext(os.path.basename(file_path))[0]
+        version = self.version + 1 if version is None else version
+        if mode != "replace" and self.schema:
+            try:
+                delta = self.load_csv_in_place(file_path, mode, key_column, progress_callback, version)
+            except ValueError:
+                # Bad input such as an unknown key column; the message goes to the ingestion job
+                raise
+            except Exception as e:
+                logger.error(f"Failed to {mode} CSV into {self.table_name}: {e}")
+                return None
+            if delta is None:
+                # A full load would drop the rows the caller meant to keep
+                raise ValueError(
+                    f"The columns of the file differ from the loaded table {self.table_name}, so it cannot be "
+                    f"loaded with mode={mode}. Upload it with mode=replace to rebuild the table."
+                )
+            return delta
+        staging_table = f"{table_name}__staging_{version}"
         try:
-            df = pd.read_csv(file_path)
-            # Sanitize column names for SQL compatibility
-            df.columns = [col.replace(' ', '_').replace('/', '_').replace('(', '').replace(')', '') for col in df.columns]
-            
-            # Use the filename (without extension) as the table name
-            self.table_name = os.path.splitext(os.path.basename(file_path))[0]
-            
-            logger.info(f"Loading data into SQLite table: {self.table_name}")
-            df.to_sql(self.table_name, self.engine, if_exists='replace', index=False)
-            
+            logger.info(f"Loading data into SQLite table: {table_name}")
+
+            total_bytes = os.path.getsize(file_path)
+            rows_loaded = 0
+            connection = sqlite3.connect(self.db_path)
+            try:
+                for pragma in BULK_LOAD_PRAGMAS:
+                    connection.execute(pragma)
+                with open(file_path, "rb") as handle:
+                    reader = pd.read_csv(handle, chunksize=settings.INGESTION_CHUNK_ROWS)
+                    columns = None
+                    index_builder = None
+                    for chunk in reader:
+                        # Sanitize column names for SQL compatibility
+                        chunk.columns = [sanitize_column_name(col) for col in chunk.columns]
+                        if columns is None:
+                            # Column affinities come from the first chunk and stay fixed; SQLite
+                            # coerces values from later chunks to them where possible.
+                            columns = [(col, infer_sqlite_type(chunk[col])) for col in chunk.columns]
+                            self._create_table(connection, staging_table, columns)
+                            index_builder = SchemaIndexBuilder(columns)
+                        if settings.SCHEMA_INDEX_ENABLED:
+                            index_builder.add_chunk(chunk)
+                        rows_loaded += self._insert_chunk(connection, staging_table, chunk)
+                        if rows_loaded % settings.INGESTION_ROWS_PER_TRANSACTION < len(chunk):
+                            connection.commit()
+                        if progress_callback:
+                            progress_callback(rows_loaded, min(handle.tell(), total_bytes), total_bytes)
+                if columns is None:
+                    header = pd.read_csv(file_path, nrows=0)
+                    columns = [(sanitize_column_name(col), "TEXT") for col in header.columns]
+                    self._create_table(connection, staging_table, columns)
+                    index_builder = SchemaIndexBuilder(columns)
+                connection.commit()
+                self._swap_in(connection, staging_table, table_name)
+                # Give the query planner statistics for the fresh table
+                connection.execute(f"ANALYZE {quote_identifier(table_name)}")
+                connection.commit()
+            finally:
+                connection.close()
+
             # Store the schema for later use in prompts
-            self.schema = pd.io.sql.get_schema(df, self.table_name, con=self.engine)
-            logger.info(f"Successfully loaded CSV to SQL. Schema:\n{self.schema}")
-            return True
+            self.table_name = table_name
+            self.schema = build_create_table(self.table_name, columns)
+            self.row_count = rows_loaded
+            self.index_advisor.reset(self.table_name)
+            # Translations and results computed against the old table must not be reused
+            self.version = version
+            self.schema_index = index_builder.build() if settings.SCHEMA_INDEX_ENABLED else None
+            sql_result_cache.invalidate(self.dataset_id, self.version)
+            sql_translation_cache.invalidate(self.dataset_id)
+            if progress_callback:
+                progress_callback(rows_loaded, total_bytes, total_bytes)
+            logger.info(f"Successfully loaded {rows_loaded} rows to SQL. Schema:\n{self.schema}")
+            return LoadDelta(mode="replace", inserted=rows_loaded)
         except Exception as e:
             logger.error(f"Failed to load CSV to SQL: {e}")
-            return False
+            self._drop_staging_table(staging_table)
+            return None
+
+    def load_csv_in_place(
+        self,
+        file_path: str,
+        mode: str,
+        key_column: Optional[str] = None,
+        progress_callback: Optional[ProgressCallback] = None,
+        version: Optional[int] = None,
+    ) -> Optional[LoadDelta]:
+        """
+        Applies a CSV to the loaded table, writing only the rows that differ from it, in a single
+        transaction. Rows are matched on key_column if given, otherwise on their content hash.
+        Indexes and planner statistics survive, and cached results the changes cannot affect stay
+        valid. Returns None, changing nothing, if the file's columns differ from the table's.
+        """
+        version = self.version + 1 if version is None else version
+        header = [sanitize_column_name(col) for col in pd.read_csv(file_path, nrows=0).columns]
+        connection = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            for pragma in IN_PLACE_LOAD_PRAGMAS:
+                connection.execute(pragma)
+            columns = [(row[1], row[2]) for row in connection.execute(f"PRAGMA table_info({quote_identifier(self.table_name)})")]
+            if [column for column, _ in columns] != header:
+                return None
+            if key_column is not None:
+                key_column = sanitize_column_name(key_column)
+                if key_column not in header:
+                    raise ValueError(f"Key column {key_column} is not in the file.")
+
+            logger.info(f"Loading {file_path} into SQLite table {self.table_name} in place ({mode}).")
+            loader = DeltaLoader(connection, self.table_name, columns, mode, key_column)
+            # One write transaction: the diff cannot go stale, and readers see the old table until it commits
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                loader.prepare(self.row_count)
+                rows_read = loader.stage(self._read_csv_chunks(file_path, progress_callback))
+                delta = loader.apply(self._read_csv_chunks(file_path), *loader.diff())
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+            if delta.inserted + delta.updated + delta.deleted > settings.INGESTION_ANALYZE_CHANGED_SHARE * max(loader.tracked_rows, 1):
+                connection.execute(f"ANALYZE {quote_identifier(self.table_name)}")
+        finally:
+            connection.close()
+
+        self.row_count = loader.tracked_rows + delta.inserted - delta.deleted
+        self.version = version
+        # The schema is unchanged, so cached translations stay valid; results only where the delta cannot affect them
+        sql_result_cache.carry_over(self.dataset_id, self.version, keep=lambda sql_query: not delta.affects(sql_query))
+        text_columns = {column for column, column_type in columns if column_type == "TEXT"}
+        if settings.SCHEMA_INDEX_ENABLED and (delta.inserted or delta.deleted or text_columns & set(delta.changed_columns)):
+            # The current index keeps serving until the rebuild is done
+            self._schema_index_pending = True
+            maintenance_executor.submit(self._rebuild_schema_index, self.version)
+        if progress_callback:
+            total_bytes = os.path.getsize(file_path)
+            progress_callback(rows_read, total_bytes, total_bytes)
+        logger.info(
+            f"Loaded {file_path} into {self.table_name} in place: {delta.inserted} inserted, {delta.updated} updated, "
+            f"{delta.deleted} deleted, {delta.unchanged} unchanged."
+        )
+        return delta
+
+    def _read_csv_chunks(self, file_path: str, progress_callback: Optional[ProgressCallback] = None) -> Iterator[pd.DataFrame]:
+        total_bytes = os.path.getsize(file_path)
+        rows_read = 0
+        with open(file_path, "rb") as handle:
+            for chunk in pd.read_csv(handle, chunksize=settings.INGESTION_CHUNK_ROWS):
+                chunk.columns = [sanitize_column_name(col) for col in chunk.columns]
+                rows_read += len(chunk)
+                if progress_callback:
+                    progress_callback(rows_read, min(handle.tell(), total_bytes), total_bytes)
+                yield chunk
+
+    def _create_table(self, connection: sqlite3.Connection, table_name: str, columns: List[Tuple[str, str]]):
+        connection.execute(f"DROP TABLE IF EXISTS {quote_identifier(table_name)}")
+        connection.execute(build_create_table(table_name, columns))
+
+    def _swap_in(self, connection: sqlite3.Connection, staging_table: str, table_name: str):
+        """Replaces the live table with the staging table in a single transaction."""
+        # The swap is the commit that matters, so it is made durable even though the bulk load is not
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for name in {table_name, self.table_name} - {None}:
+                connection.execute(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+                # Row hashes kept for in-place loads describe the old rows
+                connection.execute(f"DROP TABLE IF EXISTS {quote_identifier(hash_table_name(name))}")
+            connection.execute(f"ALTER TABLE {quote_identifier(staging_table)} RENAME TO {quote_identifier(table_name)}")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+
+    def _drop_staging_table(self, staging_table: str):
+        try:
+            connection = sqlite3.connect(self.db_path)
+            try:
+                connection.execute(f"DROP TABLE IF EXISTS {quote_identifier(staging_table)}")
+                connection.commit()
+            finally:
+                connection.close()
+        except Exception as e:
+            logger.warning(f"Could not drop staging table {staging_table}: {e}")
+
+    def _insert_chunk(self, connection: sqlite3.Connection, table_name: str, chunk: pd.DataFrame) -> int:
+        placeholders = ", ".join("?" for _ in chunk.columns)
+        statement = f"INSERT INTO {quote_identifier(table_name)} VALUES ({placeholders})"
+        # object dtype turns numpy scalars into Python values the sqlite3 driver can bind
+        values = chunk.astype(object).where(pd.notnull(chunk), None)
+        connection.executemany(statement, values.itertuples(index=False, name=None))
+        return len(chunk)
 
     def get_schema(self) -> str:
         """Returns the schema of the loaded table."""
@@ -43,25 +313,178 @@ class TextToSQLService:
             return "No schema loaded."
         return self.schema
 
+    def describe_for_question(self, question: str, context: str = "") -> Tuple[str, str]:
+        """
+        Returns the schema and the matching values from the data to show the model for a question.
+        On wide tables only the relevant columns are listed. The full schema is used until the
+        schema index is available.
+        """
+        index = self.get_schema_index()
+        if index is None:
+            return self.get_schema(), ""
+        prompt_schema = index.prompt_schema(question, context)
+        schema = self.get_schema()
+        if prompt_schema.pruned:
+            hidden = len(index.columns) - len(prompt_schema.columns)
+            schema = (
+                build_create_table(self.table_name, prompt_schema.columns)
+                + f"\n-- Only the columns relevant to the question are shown; {hidden} other columns are omitted."
+            )
+        return schema, format_literals(prompt_schema.literals)
+
+    def get_schema_index(self) -> Optional[SchemaIndex]:
+        """Returns the schema index, scheduling a rebuild from the table if it is missing."""
+        if self.schema_index is None and self.schema and settings.SCHEMA_INDEX_ENABLED and not self._schema_index_pending:
+            self._schema_index_pending = True
+            maintenance_executor.submit(self._rebuild_schema_index, self.version)
+        return self.schema_index
+
+    def _rebuild_schema_index(self, version: int):
+        """Rebuilds the index in a single pass over the table's TEXT columns."""
+        try:
+            connection = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            try:
+                table = quote_identifier(self.table_name)
+                columns = [(row[1], row[2]) for row in connection.execute(f"PRAGMA table_info({table})")]
+                builder = SchemaIndexBuilder(columns)
+                text_columns = builder.text_columns
+                if text_columns:
+                    cursor = connection.execute(f"SELECT {', '.join(map(quote_identifier, text_columns))} FROM {table}")
+                    while builder.text_columns:
+                        rows = cursor.fetchmany(settings.INGESTION_CHUNK_ROWS)
+                        if not rows:
+                            break
+                        builder.add_rows(text_columns, rows)
+            finally:
+                connection.close()
+            # A load that finished meanwhile has already built a newer index
+            if version == self.version:
+                self.schema_index = builder.build()
+                logger.info(f"Rebuilt schema index for dataset {self.dataset_id}: {self.schema_index.value_count} values.")
+        except Exception as e:
+            logger.warning(f"Could not build schema index for dataset {self.dataset_id}: {e}")
+        finally:
+            self._schema_index_pending = False
+
+    @property
+    def schema_hash(self) -> str:
+        """A short hash of the loaded schema, used to key caches that depend on it."""
+        return hashlib.sha256((self.schema or "").encode("utf-8")).hexdigest()[:16]
+
     def execute_sql_query(self, sql_query: str) -> str:
         """
         Executes a given SQL query against the database and returns just the raw result.
         """
-        try:
-            print(sql_query)
-            with self.engine.connect() as connection:
-                result = pd.read_sql_query(sql_query, connection)
+        return self.run_query(sql_query).text
 
-                # If the result is a single value (e.g., COUNT, SUM), extract it
-                if result.shape == (1, 1):
-                    return str(result.iat[0, 0])  # Get the only cell in the DataFrame
+    def run_query(self, sql_query: str, use_cache: bool = True) -> QueryResult:
+        """
+        Executes a SQL query and returns its rendered result, serving repeated deterministic
+        queries against an unchanged table from the result cache.
+        """
+        version = self.version
+        cacheable = use_cache and is_deterministic_sql(sql_query)
+        if cacheable:
+            cached = sql_result_cache.get(self.dataset_id, version, sql_query)
+            if cached is not None:
+                return cached
+        return self._execute(sql_query, version, cacheable)
 
-                # Otherwise, return the full table as string
-                return result.to_string(index=False)  # Drop index from display
+    async def run_query_async(self, sql_query: str, use_cache: bool = True) -> QueryResult:
+        """
+        Runs the query on the SQLite thread pool so the event loop never blocks on SQL. Identical
+        deterministic queries arriving while one is running wait for its result.
+        """
+        version = self.version
+        cacheable = use_cache and is_deterministic_sql(sql_query)
+        loop = asyncio.get_running_loop()
+        if not cacheable:
+            return await loop.run_in_executor(query_executor, self._execute, sql_query, version, cacheable)
+        cached = sql_result_cache.get(self.dataset_id, version, sql_query)
+        if cached is not None:
+            return cached
+        return await query_flights.do(
+            (self.dataset_id, version, canonicalize_sql(sql_query)),
+            lambda: loop.run_in_executor(query_executor, self._execute, sql_query, version, cacheable),
+        )
+
+    async def execute_sql_query_async(self, sql_query: str) -> str:
+        return (await self.run_query_async(sql_query)).text
+
+    def check_query(self, sql_query: str) -> GuardedQuery:
+        """Reviews a generated query with the query guard without running it."""
+        with self.read_pool.connection() as connection:
+            return self._review(connection, sql_query)
+
+    async def check_query_async(self, sql_query: str) -> GuardedQuery:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(query_executor, self.check_query, sql_query)
+
+    def _review(self, connection: sqlite3.Connection, sql_query: str) -> GuardedQuery:
+        key = (self.version, self.index_advisor.generation, sql_query)
+        guarded = self._reviews.get(key)
+        if guarded is None:
+            guarded = review_query(connection, sql_query, self.row_count)
+            self._reviews.put(key, guarded)
+        return guarded
+
+    def _execute(self, sql_query: str, version: int, cacheable: bool) -> QueryResult:
+        """
+        Runs the query on a pooled read-only connection and caches the rendered result. Every
+        query passes the query guard first, and runs within its VM-step budget and timeout.
+        """
+        try:
+            print(sql_query)
+            with self.read_pool.connection() as connection:
+                guarded = self._review(connection, sql_query)
+                if guarded.rejected:
+                    SQL_ERRORS.inc(reason="rejected")
+                    logger.warning(f"SQL query rejected '{sql_query}': {guarded.rejection}")
+                    return QueryResult(text=f"Error: The query was rejected because {guarded.rejection}.", error=True)
+                started = time.perf_counter()
+                steps_before = self.read_pool.steps_run(connection)
+                # Rows are fetched lazily and rendered within the token budget
+                rendered = render_cursor(connection.execute(guarded.sql))
+                elapsed = time.perf_counter() - started
+                SQL_VM_STEPS.observe(self.read_pool.steps_run(connection) - steps_before)
+                self._advise_indexes(guarded, elapsed, connection)
+                SQL_SECONDS.observe(elapsed)
+                SQL_ROWS_FETCHED.observe(rendered.row_count)
+                SQL_ROWS_RETURNED.observe(len(rendered.rows))
+                query_result = QueryResult(
+                    text=rendered.text,
+                    columns=rendered.columns,
+                    rows=rendered.rows,
+                    row_count=rendered.row_count,
+                    truncated=rendered.truncated,
+                )
+                if guarded.row_limit and rendered.row_count >= guarded.row_limit:
+                    query_result.text += f"\n(The result was limited to the first {guarded.row_limit} rows.)"
+                    query_result.truncated = True
+        except QueryBudgetError as e:
+            SQL_ERRORS.inc(reason="budget")
+            logger.warning(f"SQL query cancelled '{sql_query}': {e}")
+            return QueryResult(text=f"Error: Could not execute the query. Details: {e}", error=True)
+        except QueryTimeoutError as e:
+            SQL_ERRORS.inc(reason="timeout")
+            logger.warning(f"SQL query timed out '{sql_query}': {e}")
+            return QueryResult(text=f"Error: Could not execute the query. Details: {e}", error=True)
         except Exception as e:
+            SQL_ERRORS.inc(reason="error")
             logger.error(f"Error executing SQL query '{sql_query}': {e}")
-            return f"Error: Could not execute the query. Details: {e}"
+            return QueryResult(text=f"Error: Could not execute the query. Details: {e}", error=True)
 
+        if cacheable:
+            sql_result_cache.put(self.dataset_id, version, sql_query, query_result, query_result.size_bytes)
+        return query_result
+
+    def _advise_indexes(self, guarded: GuardedQuery, elapsed_seconds: float, connection: sqlite3.Connection):
+        try:
+            self.index_advisor.record(guarded.sql, elapsed_seconds, connection, guarded.plan)
+        except Exception as e:
+            # Advice is best effort and must never fail the user's query
+            logger.warning(f"Index advisor could not record query: {e}")
 
-# Create a single instance of the service
-text_to_sql_service = TextToSQLService()
\ No newline at end of file
+    def close(self):
+        """Releases the dataset's pooled connections."""
+        self.read_pool.close()
@@ -0,0 +1,39 @@
+"""Generates synthetic property listing CSVs of any size for benchmarks."""
+import csv
+import os
+import random
+
+STREETS = ["Broadway", "Main St", "5th Ave", "Park Ave", "Madison Ave", "Lexington Ave", "Wall St", "Canal St", "Houston St", "Bleecker St"]
+ASSOCIATES = ["Jack Sparrow", "Elizabeth Swann", "Will Turner", "Hector Barbossa", "Joshamee Gibbs", "Tia Dalma"]
+HEADER = [
+    "unique_id", "Property Address", "Floor", "Suite", "Size (SF)", "Rent/SF/Year", "Associate 1",
+    "BROKER Email ID", "Annual Rent", "Monthly Rent", "GCI On 3 Years",
+]
+
+
+def generate_listings_csv(path: str, rows: int, seed: int = 42) -> str:
+    """Writes `rows` listings to `path` and returns the path. The same seed gives the same file."""
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(HEADER)
+        for i in range(rows):
+            size = rng.randint(500, 20_000)
+            rent_per_sf = round(rng.uniform(40, 120), 2)
+            annual_rent = round(size * rent_per_sf, 2)
+            associate = rng.choice(ASSOCIATES)
+            writer.writerow([
+                i + 1,
+                f"{rng.randint(1, 999)} {rng.choice(STREETS)}",
+                f"E{rng.randint(1, 60)}",
+                f"{rng.randint(100, 9900)}",
+                size,
+                rent_per_sf,
+                associate,
+                associate.lower().replace(" ", ".") + "@example.com",
+                annual_rent,
+                round(annual_rent / 12, 2),
+                round(annual_rent * 3 * 0.04, 2),
+            ])
+    return path
@@ -0,0 +1,395 @@
+"""
+An in-memory stand-in for the parts of Motor the app uses, so the API can be benchmarked
+without a MongoDB server. Operations are applied synchronously to Python dicts and yield to
+the event loop once, which keeps the cost of the database layer out of the measurements.
+"""
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from bson import ObjectId
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+import asyncio
+import copy
+import re
+
+_MISSING = object()
+
+
+def _get_path(document: dict, path: str):
+    value = document
+    for part in path.split("."):
+        if isinstance(value, dict) and part in value:
+            value = value[part]
+        else:
+            return _MISSING
+    return value
+
+
+def _compare(value, other, op) -> bool:
+    try:
+        return op(value, other)
+    except TypeError:
+        return False
+
+
+def _match_operator(value, operator: str, operand) -> bool:
+    values = value if isinstance(value, list) else [value]
+    if operator == "$eq":
+        return _match_value(value, operand)
+    if operator == "$ne":
+        return not _match_value(value, operand)
+    if operator == "$gt":
+        return any(v is not _MISSING and _compare(v, operand, lambda a, b: a > b) for v in values)
+    if operator == "$gte":
+        return any(v is not _MISSING and _compare(v, operand, lambda a, b: a >= b) for v in values)
+    if operator == "$lt":
+        return any(v is not _MISSING and _compare(v, operand, lambda a, b: a < b) for v in values)
+    if operator == "$lte":
+        return any(v is not _MISSING and _compare(v, operand, lambda a, b: a <= b) for v in values)
+    if operator == "$in":
+        return any(_match_value(value, candidate) for candidate in operand)
+    if operator == "$nin":
+        return not any(_match_value(value, candidate) for candidate in operand)
+    if operator == "$all":
+        return all(_match_value(value, candidate) for candidate in operand)
+    if operator == "$exists":
+        return (value is not _MISSING) == bool(operand)
+    if operator == "$not":
+        return not _match_condition(value, operand)
+    if operator == "$regex":
+        return any(isinstance(v, str) and re.search(operand, v) for v in values)
+    raise NotImplementedError(f"Query operator {operator} is not supported by the in-memory Mongo")
+
+
+def _match_value(value, expected) -> bool:
+    if value is _MISSING:
+        return expected is None
+    if isinstance(value, list) and not isinstance(expected, list):
+        return expected in value
+    return value == expected
+
+
+def _match_condition(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition):
+        return all(_match_operator(value, operator, operand) for operator, operand in condition.items())
+    return _match_value(value, condition)
+
+
+def matches(document: dict, query: Optional[dict]) -> bool:
+    for key, condition in (query or {}).items():
+        if key == "$or":
+            if not any(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$and":
+            if not all(matches(document, sub) for sub in condition):
+                return False
+        elif key == "$nor":
+            if any(matches(document, sub) for sub in condition):
+                return False
+        elif not _match_condition(_get_path(document, key), condition):
+            return False
+    return True
+
+
+def _set_path(document: dict, path: str, value):
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.setdefault(part, {})
+    document[parts[-1]] = value
+
+
+def _apply_update(document: dict, update: dict, inserting: bool):
+    for operator, fields in update.items():
+        for path, value in fields.items():
+            current = _get_path(document, path)
+            if operator == "$set":
+                _set_path(document, path, copy.deepcopy(value))
+            elif operator == "$setOnInsert":
+                if inserting:
+                    _set_path(document, path, copy.deepcopy(value))
+            elif operator == "$unset":
+                parent = _get_path(document, path.rpartition(".")[0]) if "." in path else document
+                if isinstance(parent, dict):
+                    parent.pop(path.rpartition(".")[2], None)
+            elif operator == "$inc":
+                _set_path(document, path, (0 if current is _MISSING else current) + value)
+            elif operator in ("$push", "$addToSet"):
+                items = value["$each"] if isinstance(value, dict) and "$each" in value else [value]
+                target = [] if current is _MISSING else current
+                for item in items:
+                    if operator == "$push" or item not in target:
+                        target.append(copy.deepcopy(item))
+                _set_path(document, path, target)
+            elif operator == "$pull":
+                if isinstance(current, list):
+                    _set_path(document, path, [item for item in current if not _match_condition(item, value)])
+            else:
+                raise NotImplementedError(f"Update operator {operator} is not supported by the in-memory Mongo")
+
+
+def _evaluate(document: dict, expression):
+    """Evaluates the few aggregation expressions used in projections."""
+    if isinstance(expression, str) and expression.startswith("$"):
+        value = _get_path(document, expression[1:])
+        return None if value is _MISSING else value
+    if isinstance(expression, dict):
+        if "$size" in expression:
+            return len(_evaluate(document, expression["$size"]) or [])
+        if "$ifNull" in expression:
+            value, default = expression["$ifNull"]
+            result = _evaluate(document, value)
+            return _evaluate(document, default) if result is None else result
+    return expression
+
+
+def project(document: dict, projection: Optional[dict]) -> dict:
+    if not projection:
+        return copy.deepcopy(document)
+    include_id = projection.get("_id", 1)
+    fields = {key: value for key, value in projection.items() if key != "_id"}
+    inclusive = any(
+        (isinstance(value, dict) and "$slice" not in value) or (not isinstance(value, dict) and value)
+        for value in fields.values()
+    )
+    if inclusive:
+        result = {}
+        for key, value in fields.items():
+            if isinstance(value, dict) and "$slice" not in value:
+                result[key] = _evaluate(document, value)
+            elif key in document:
+                result[key] = copy.deepcopy(document[key])
+    else:
+        result = copy.deepcopy(document)
+        for key, value in fields.items():
+            if not isinstance(value, dict) and not value:
+                result.pop(key, None)
+    for key, value in fields.items():
+        if isinstance(value, dict) and "$slice" in value and isinstance(document.get(key), list):
+            window = value["$slice"]
+            items = document[key]
+            if isinstance(window, list):
+                start, count = window
+                sliced = items[start:start + count] if start >= 0 else items[start:][:count]
+            else:
+                sliced = items[window:] if window < 0 else items[:window]
+            result[key] = copy.deepcopy(sliced)
+    if include_id and "_id" in document:
+        result["_id"] = document["_id"]
+    elif not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def _sort_key(spec):
+    def key(document):
+        parts = []
+        for field, direction in spec:
+            value = _get_path(document, field)
+            # Missing and None sort first, as in MongoDB
+            rank = (0, 0) if value in (_MISSING, None) else (1, value)
+            parts.append(_Reversed(rank) if direction < 0 else rank)
+        return parts
+    return key
+
+
+class _Reversed:
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+def _sort_spec(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    return list(key_or_list)
+
+
+class FakeCursor:
+    def __init__(self, documents: List[dict], projection: Optional[dict]):
+        self._documents = documents
+        self._projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._iterator = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, count: int):
+        self._skip = count
+        return self
+
+    def limit(self, count: int):
+        self._limit = count
+        return self
+
+    def _results(self) -> List[dict]:
+        documents = self._documents
+        if self._sort:
+            documents = sorted(documents, key=_sort_key(self._sort))
+        documents = documents[self._skip:]
+        if self._limit:
+            documents = documents[:self._limit]
+        return [project(document, self._projection) for document in documents]
+
+    async def to_list(self, length: Optional[int] = None) -> List[dict]:
+        await asyncio.sleep(0)
+        results = self._results()
+        return results[:length] if length else results
+
+    def __aiter__(self):
+        self._iterator = iter(self._results())
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self._documents: List[dict] = []
+        self._unique: List[List[str]] = []
+
+    def _check_unique(self, document: dict, exclude: Optional[dict] = None):
+        for fields in self._unique:
+            key = [_get_path(document, field) for field in fields]
+            if _MISSING in key:
+                continue
+            for other in self._documents:
+                if other is not exclude and [_get_path(other, field) for field in fields] == key:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {fields}")
+
+    def _find(self, query: Optional[dict], sort=None) -> List[dict]:
+        found = [document for document in self._documents if matches(document, query)]
+        if sort:
+            found.sort(key=_sort_key(_sort_spec(sort)))
+        return found
+
+    async def create_index(self, keys, unique: bool = False, **kwargs) -> str:
+        fields = [field for field, _ in _sort_spec(keys)]
+        if unique and fields not in self._unique:
+            self._unique.append(fields)
+        return "_".join(fields)
+
+    async def insert_one(self, document: dict):
+        await asyncio.sleep(0)
+        document.setdefault("_id", ObjectId())
+        self._check_unique(document)
+        self._documents.append(copy.deepcopy(document))
+        return SimpleNamespace(inserted_id=document["_id"])
+
+    async def insert_many(self, documents: List[dict], ordered: bool = True):
+        ids = [(await self.insert_one(document)).inserted_id for document in documents]
+        return SimpleNamespace(inserted_ids=ids)
+
+    async def find_one(self, query: Optional[dict] = None, projection: Optional[dict] = None, sort=None) -> Optional[dict]:
+        await asyncio.sleep(0)
+        found = self._find(query, sort)
+        return project(found[0], projection) if found else None
+
+    def find(self, query: Optional[dict] = None, projection: Optional[dict] = None) -> FakeCursor:
+        return FakeCursor(self._find(query), projection)
+
+    async def count_documents(self, query: dict) -> int:
+        await asyncio.sleep(0)
+        return len(self._find(query))
+
+    def _upsert_document(self, query: dict, update: dict) -> dict:
+        document = {key: value for key, value in query.items() if not key.startswith("$") and not isinstance(value, dict)}
+        document["_id"] = ObjectId()
+        _apply_update(document, update, inserting=True)
+        self._check_unique(document)
+        self._documents.append(document)
+        return document
+
+    def _update(self, document: dict, update: dict):
+        updated = copy.deepcopy(document)
+        _apply_update(updated, update, inserting=False)
+        self._check_unique(updated, exclude=document)
+        document.clear()
+        document.update(updated)
+
+    async def update_one(self, query: dict, update: dict, upsert: bool = False):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        if found:
+            self._update(found[0], update)
+            return SimpleNamespace(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            document = self._upsert_document(query, update)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=document["_id"])
+        return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def update_many(self, query: dict, update: dict, upsert: bool = False):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        for document in found:
+            self._update(document, update)
+        if not found and upsert:
+            document = self._upsert_document(query, update)
+            return SimpleNamespace(matched_count=0, modified_count=0, upserted_id=document["_id"])
+        return SimpleNamespace(matched_count=len(found), modified_count=len(found), upserted_id=None)
+
+    async def find_one_and_update(self, query: dict, update: dict, projection: Optional[dict] = None, sort=None,
+                                  upsert: bool = False, return_document=ReturnDocument.BEFORE) -> Optional[dict]:
+        await asyncio.sleep(0)
+        found = self._find(query, sort)
+        if not found:
+            if not upsert:
+                return None
+            document = self._upsert_document(query, update)
+            return project(document, projection) if return_document == ReturnDocument.AFTER else None
+        before = copy.deepcopy(found[0])
+        self._update(found[0], update)
+        return project(found[0] if return_document == ReturnDocument.AFTER else before, projection)
+
+    async def delete_one(self, query: dict):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        if found:
+            self._documents.remove(found[0])
+        return SimpleNamespace(deleted_count=len(found[:1]))
+
+    async def delete_many(self, query: dict):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        for document in found:
+            self._documents.remove(document)
+        return SimpleNamespace(deleted_count=len(found))
+
+
+class FakeDatabase:
+    def __init__(self, name: str):
+        self.name = name
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+
+class FakeMongoClient:
+    """Drop-in for AsyncIOMotorClient; connection arguments are accepted and ignored."""
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        self._databases: Dict[str, FakeDatabase] = {}
+
+    def __getitem__(self, name: str) -> FakeDatabase:
+        if name not in self._databases:
+            self._databases[name] = FakeDatabase(name)
+        return self._databases[name]
+
+    def close(self):
+        pass
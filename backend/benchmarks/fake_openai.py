@@ -0,0 +1,125 @@
+"""
+A local OpenAI-compatible chat completions server for benchmarks. It answers SQL generation,
+synthesis, tagging and summary prompts with plausible canned output, paced to simulate a
+configurable time to first token and token rate.
+
+    python -m benchmarks.fake_openai --port 8901 --latency 0.3 --tokens-per-second 80
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import argparse
+import asyncio
+import hashlib
+import json
+import re
+import time
+import uvicorn
+
+app = FastAPI(title="Fake OpenAI")
+app.state.latency = 0.3
+app.state.tokens_per_second = 80.0
+app.state.answer_tokens = 60
+
+ANSWER_WORDS = (
+    "Based on the listings data, the property you asked about has the following details and the "
+    "figures come directly from the query results for the matching rows in the knowledge base"
+).split()
+TABLE_PATTERN = re.compile(r'CREATE TABLE "([^"]+)"')
+COLUMN_PATTERN = re.compile(r'^"([^"]+)" (INTEGER|REAL|TEXT)', re.MULTILINE)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def generate_sql(prompt: str) -> str:
+    """Picks one of a few query shapes for the prompt's table, deterministically per question."""
+    table = TABLE_PATTERN.search(prompt)
+    if not table:
+        return "SELECT 1"
+    columns = COLUMN_PATTERN.findall(prompt)
+    numeric = [name for name, column_type in columns if column_type in ("INTEGER", "REAL")]
+    text = [name for name, column_type in columns if column_type == "TEXT"]
+    question = prompt.rsplit("User's Latest Question:", 1)[-1]
+    choice = int(hashlib.md5(question.encode("utf-8")).hexdigest(), 16)
+    numbers = re.findall(r"\d+", question)
+    quoted_table = f'"{table.group(1)}"'
+    shapes = ["SELECT COUNT(*) FROM " + quoted_table]
+    if numeric:
+        column = f'"{numeric[choice % len(numeric)]}"'
+        shapes.append(f"SELECT AVG({column}), MIN({column}), MAX({column}) FROM {quoted_table}")
+        if numbers:
+            shapes.append(f"SELECT * FROM {quoted_table} WHERE {column} > {numbers[0]} LIMIT 20")
+    if text:
+        column = f'"{text[0]}"'
+        shapes.append(f"SELECT {column}, COUNT(*) FROM {quoted_table} GROUP BY {column} ORDER BY 2 DESC LIMIT 10")
+        if numbers:
+            shapes.append(f"SELECT * FROM {quoted_table} WHERE {column} LIKE '{numbers[0]} %'")
+    return shapes[choice % len(shapes)]
+
+
+def build_reply(body: dict) -> str:
+    prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+    if "generates SQLite queries" in prompt:
+        return generate_sql(prompt)
+    if body.get("response_format", {}).get("type") == "json_object":
+        if '"results"' in prompt:
+            sessions = re.findall(r"^### Session (.+)$", prompt, re.MULTILINE)
+            return json.dumps({"results": [{"session_id": session, "tags": ["Property Inquiry"]} for session in sessions]})
+        return json.dumps({"tags": ["Property Inquiry", "General Question"]})
+    count = min(body.get("max_tokens") or app.state.answer_tokens, app.state.answer_tokens)
+    return " ".join(ANSWER_WORDS[i % len(ANSWER_WORDS)] for i in range(count)) + "."
+
+
+def usage(prompt_tokens: int, completion_tokens: int) -> dict:
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    reply = build_reply(body)
+    prompt_tokens = estimate_tokens(json.dumps(body.get("messages", [])))
+    words = reply.split(" ")
+    created = int(time.time())
+    base = {"id": f"chatcmpl-{created}", "created": created, "model": body.get("model", "fake")}
+    await asyncio.sleep(app.state.latency)
+
+    if not body.get("stream"):
+        await asyncio.sleep(len(words) / app.state.tokens_per_second)
+        return JSONResponse({
+            **base,
+            "object": "chat.completion",
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+            "usage": usage(prompt_tokens, len(words)),
+        })
+
+    async def events():
+        for i, word in enumerate(words):
+            delta = {"content": word if i == 0 else " " + word}
+            yield "data: " + json.dumps({**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}) + "\n\n"
+            await asyncio.sleep(1 / app.state.tokens_per_second)
+        yield "data: " + json.dumps({**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}) + "\n\n"
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield "data: " + json.dumps({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage(prompt_tokens, len(words))}) + "\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token.")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--answer-tokens", type=int, default=60, help="Length of synthesized answers.")
+    args = parser.parse_args()
+    app.state.latency = args.latency
+    app.state.tokens_per_second = args.tokens_per_second
+    app.state.answer_tokens = args.answer_tokens
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+Offline load test for the API. Boots the fake OpenAI server and the app (with the in-memory
+Mongo stand-in) as subprocesses, generates a listings CSV, then drives `/documents/upload-docs`
+and `/crm/login`, then `/chat/` and `/crm/conversations/{user_id}` at a fixed concurrency. Reports
+throughput and p50/p95/p99 latency per endpoint and per chat stage, and compares them with a saved baseline.
+
+    python -m benchmarks.run --rows 100000 --chat-requests 400 --concurrency 16
+    python -m benchmarks.run --save-baseline benchmarks/baselines/default.json
+"""
+from benchmarks.datasets import generate_listings_csv
+from collections import defaultdict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_BASELINE = os.path.join(BACKEND_DIR, "benchmarks", "baselines", "default.json")
+DEFAULT_RESULTS = os.path.join(BACKEND_DIR, "benchmarks", "results", "latest.json")
+API = "/api/v1"
+QUESTIONS = [
+    "How many listings are there?",
+    "What is the average rent per square foot?",
+    "Which associates have the most listings?",
+    "Show me listings larger than {n} square feet",
+    "What is on {n} Broadway?",
+    "What are the minimum and maximum annual rents?",
+    "Show me listings larger than {n} square feet on a high floor",
+    "Which suites have a monthly rent over {n}?",
+]
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def describe(latencies: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(latencies, 50), 4),
+        "p95": round(percentile(latencies, 95), 4),
+        "p99": round(percentile(latencies, 99), 4),
+        "mean": round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+    }
+
+
+class Recorder:
+    """Collects request latencies per endpoint and the per-stage timings returned by /chat/."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.durations: Dict[str, float] = {}
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+
+    def add(self, endpoint: str, latency: float, ok: bool):
+        self.latencies[endpoint].append(latency)
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def summary(self) -> Dict[str, dict]:
+        endpoints = {}
+        for endpoint, latencies in self.latencies.items():
+            duration = self.durations.get(endpoint) or sum(latencies)
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "errors": self.errors[endpoint],
+                "throughput_rps": round(len(latencies) / duration, 2) if duration else 0.0,
+                **describe(latencies),
+            }
+        return {
+            "endpoints": endpoints,
+            "stages": {stage: describe(latencies) for stage, latencies in self.stages.items()},
+        }
+
+
+async def run_closed_loop(name: str, total: int, concurrency: int, send: Callable[[int], Awaitable[None]], recorder: Recorder):
+    """Runs `total` requests with `concurrency` workers, each sending its next request as soon as the last returns."""
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            await send(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, total))])
+    recorder.durations[name] = time.perf_counter() - started
+
+
+async def timed_request(client: httpx.AsyncClient, recorder: Recorder, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+    started = time.perf_counter()
+    try:
+        response = await client.request(method, url, **kwargs)
+    except httpx.HTTPError as e:
+        recorder.add(endpoint, time.perf_counter() - started, ok=False)
+        print(f"{endpoint} request failed: {e}")
+        return None
+    recorder.add(endpoint, time.perf_counter() - started, ok=response.is_success)
+    return response
+
+
+async def wait_for(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+BENCH_PASSWORD = "benchmark-password"
+
+
+def bench_email(index: int) -> str:
+    return f"bench.user{index}@example.com"
+
+
+async def create_users(client: httpx.AsyncClient, count: int) -> List[str]:
+    user_ids = []
+    for i in range(count):
+        response = await client.post(f"{API}/crm/users", json={
+            "email": bench_email(i), "name": f"Bench User {i}", "password": BENCH_PASSWORD,
+        })
+        response.raise_for_status()
+        user_ids.append(response.json()["id"])
+    return user_ids
+
+
+async def run_uploads(
+    client: httpx.AsyncClient, csv_path: str, user_ids: List[str], recorder: Recorder, tokens: Dict[str, str],
+) -> Dict[str, float]:
+    """
+    Uploads the CSV to the default dataset, and to every user's dataset through the login
+    that issues their session token, waiting for each job. The tokens are stored in `tokens`.
+    """
+    with open(csv_path, "rb") as handle:
+        content = handle.read()
+    ingestion_seconds, rows = [], 0
+    for index in range(-1, len(user_ids)):
+        files = {"file": ("listings.csv", content, "text/csv")}
+        if index < 0:
+            response = await timed_request(
+                client, recorder, "POST /documents/upload-docs", "POST", f"{API}/documents/upload-docs", files=files,
+            )
+        else:
+            response = await timed_request(
+                client, recorder, "POST /crm/login", "POST", f"{API}/crm/login",
+                files=files, data={"email": bench_email(index), "password": BENCH_PASSWORD},
+            )
+        if response is None or not response.is_success:
+            raise RuntimeError(f"Upload failed: {response.text if response is not None else 'no response'}")
+        body = response.json()
+        job_id = body["id"] if index < 0 else body["ingestion_job_id"]
+        if index >= 0:
+            tokens[user_ids[index]] = body["access_token"]
+        while True:
+            job = (await client.get(f"{API}/documents/jobs/{job_id}")).json()
+            if job["status"] in ("completed", "failed"):
+                break
+            await asyncio.sleep(0.05)
+        if job["status"] != "completed":
+            raise RuntimeError(f"Ingestion job {job_id} failed: {job['error']}")
+        finished_at, created_at = datetime.fromisoformat(job["finished_at"]), datetime.fromisoformat(job["created_at"])
+        ingestion_seconds.append((finished_at - created_at).total_seconds())
+        rows = job["rows_loaded"]
+    return {
+        "jobs": len(ingestion_seconds),
+        "rows_per_job": rows,
+        "bytes_per_job": len(content),
+        **describe(ingestion_seconds),
+        "rows_per_second": round(rows * len(ingestion_seconds) / sum(ingestion_seconds), 1) if sum(ingestion_seconds) else 0.0,
+    }
+
+
+async def run_chat(client: httpx.AsyncClient, user_ids: List[str], tokens: Dict[str, str], args, recorder: Recorder):
+    async def send(i: int):
+        user_id = user_ids[i % len(user_ids)]
+        session_id = f"bench-{user_id}-{(i // len(user_ids)) % args.sessions_per_user}"
+        question = QUESTIONS[i % len(QUESTIONS)].format(n=100 + (i * 37) % 900)
+        response = await timed_request(
+            client, recorder, "POST /chat/", "POST", f"{API}/chat/", params={"include_timings": "true"},
+            json={"user_id": user_id, "session_id": session_id, "message": question},
+            headers={"Authorization": f"Bearer {tokens[user_id]}"},
+        )
+        if response is not None and response.is_success:
+            for stage, seconds in (response.json().get("timings") or {}).items():
+                recorder.stages[stage].append(seconds)
+        elif response is not None:
+            print(f"POST /chat/ returned {response.status_code}: {response.text[:200]}")
+
+    await run_closed_loop("POST /chat/", args.chat_requests, args.concurrency, send, recorder)
+
+
+async def run_conversations(client: httpx.AsyncClient, user_ids: List[str], args, recorder: Recorder):
+    async def send(i: int):
+        await timed_request(
+            client, recorder, "GET /crm/conversations/{user_id}", "GET", f"{API}/crm/conversations/{user_ids[i % len(user_ids)]}",
+        )
+
+    await run_closed_loop("GET /crm/conversations/{user_id}", args.conversation_requests, args.concurrency, send, recorder)
+
+
+def start_servers(args, workdir: str):
+    env = {**os.environ, "PYTHONPATH": BACKEND_DIR, "OPENAI_API_KEY": "sk-benchmark", "DB_NAME": "benchmark",
+           "SECRET_KEY": "benchmark-secret", "OPENAI_BASE_URL": f"http://127.0.0.1:{args.llm_port}/v1",
+           "MONGO_URI": "memory://benchmark"}
+    # Server logs are noisy under load; they are only shown with --verbose
+    output = None if args.verbose else subprocess.DEVNULL
+    llm = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai", "--port", str(args.llm_port), "--latency", str(args.llm_latency),
+         "--tokens-per-second", str(args.tokens_per_second), "--answer-tokens", str(args.answer_tokens)],
+        cwd=BACKEND_DIR, env=env, stdout=output, stderr=output,
+    )
+    api = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.serve_app", "--port", str(args.port)], cwd=workdir, env=env, stdout=output, stderr=output,
+    )
+    return [llm, api]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> List[str]:
+    """Prints latency and throughput changes against the baseline and returns the regressions."""
+    regressions = []
+    print(f"\nCompared with baseline from {baseline.get('created_at', 'unknown')}:")
+    for section in ("endpoints", "stages"):
+        for name, current in results[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if not previous:
+                print(f"  {name}: new")
+                continue
+            changes = []
+            for metric in ("p50", "p95", "p99", "throughput_rps"):
+                if metric not in current or not previous.get(metric):
+                    continue
+                change = (current[metric] - previous[metric]) / previous[metric]
+                # Latency going up or throughput going down is a regression
+                worse = change > threshold if metric != "throughput_rps" else change < -threshold
+                changes.append(f"{metric} {previous[metric]} -> {current[metric]} ({change:+.0%}){' REGRESSION' if worse else ''}")
+                if worse:
+                    regressions.append(f"{section}/{name} {metric}")
+            print(f"  {name}: " + "; ".join(changes))
+    return regressions
+
+
+def print_results(results: dict):
+    print(f"\n{'endpoint':<36}{'reqs':>6}{'errors':>8}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, stats in results["endpoints"].items():
+        print(f"{name:<36}{stats['requests']:>6}{stats['errors']:>8}{stats['throughput_rps']:>9}{stats['p50']:>9}{stats['p95']:>9}{stats['p99']:>9}")
+    print(f"\n{'chat stage':<36}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, stats in results["stages"].items():
+        print(f"{name:<36}{stats['p50']:>9}{stats['p95']:>9}{stats['p99']:>9}")
+    ingestion = results["ingestion"]
+    print(f"\ningestion: {ingestion['jobs']} jobs of {ingestion['rows_per_job']} rows, p50 {ingestion['p50']}s, {ingestion['rows_per_second']} rows/s")
+
+
+async def run(args) -> dict:
+    recorder = Recorder()
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        csv_path = generate_listings_csv(os.path.join(workdir, "listings.csv"), args.rows, seed=args.seed)
+        processes = start_servers(args, workdir)
+        try:
+            base_url = f"http://127.0.0.1:{args.port}"
+            await wait_for(f"http://127.0.0.1:{args.llm_port}/docs")
+            await wait_for(base_url + "/")
+            limits = httpx.Limits(max_connections=args.concurrency * 2)
+            async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+                user_ids = await create_users(client, args.users)
+                tokens: Dict[str, str] = {}
+                ingestion = await run_uploads(client, csv_path, user_ids, recorder, tokens)
+                await run_chat(client, user_ids, tokens, args, recorder)
+                await run_conversations(client, user_ids, args, recorder)
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.wait(timeout=10)
+
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            key: getattr(args, key) for key in (
+                "rows", "users", "sessions_per_user", "chat_requests", "conversation_requests", "concurrency",
+                "llm_latency", "tokens_per_second", "answer_tokens", "seed",
+            )
+        },
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        **recorder.summary(),
+        "ingestion": ingestion,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000, help="Rows in the generated CSV.")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--sessions-per-user", type=int, default=4)
+    parser.add_argument("--chat-requests", type=int, default=200)
+    parser.add_argument("--conversation-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Fake LLM time to first token, in seconds.")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0, help="Fake LLM token rate.")
+    parser.add_argument("--answer-tokens", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--llm-port", type=int, default=8901)
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help="Where to write this run's results.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline to compare against, if it exists.")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Also save the results as the baseline.")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Relative change reported as a regression.")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--verbose", action="store_true", help="Show the servers' logs.")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print_results(results)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as handle:
+            json.dump(results, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"Results written to {path}")
+
+    regressions = []
+    if args.baseline and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as handle:
+            regressions = compare(results, json.load(handle), args.threshold)
+    elif args.baseline and not args.save_baseline:
+        print(f"\nNo baseline at {args.baseline}; nothing was compared. Record one with --save-baseline.")
+    if regressions:
+        print(f"\n{len(regressions)} regressions: " + ", ".join(regressions))
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
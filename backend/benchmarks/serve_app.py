@@ -0,0 +1,25 @@
+"""
+Runs the API with the in-memory Mongo stand-in. Point OPENAI_BASE_URL at the fake OpenAI
+server to run without any external service.
+
+    OPENAI_BASE_URL=http://127.0.0.1:8901/v1 python -m benchmarks.serve_app --port 8900
+"""
+from benchmarks.fake_mongo import FakeMongoClient
+import argparse
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    args = parser.parse_args()
+
+    from app.db import session
+    session.AsyncIOMotorClient = FakeMongoClient
+    from app.main import app
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
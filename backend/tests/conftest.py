@@ -0,0 +1,7 @@
+import os
+import sys
+
+# Settings are read at import time; the tests never call the real API
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,84 @@
+from app.services.cache_service import SQLTranslationCache, _parameterize_sql, is_deterministic_sql
+
+
+def make_cache():
+    return SQLTranslationCache(max_entries=100, ttl_seconds=60, context_messages=4)
+
+
+def test_comparison_literal_is_parameterized():
+    cache = make_cache()
+    cache.put("d", "s", "units with 3 bedrooms", [], "SELECT * FROM t WHERE Bedrooms = 3")
+    assert cache.get("d", "s", "units with 4 bedrooms", []) == "SELECT * FROM t WHERE Bedrooms = 4"
+
+
+def test_quoted_operand_is_parameterized():
+    cache = make_cache()
+    cache.put("d", "s", "units on 5th ave", [], "SELECT * FROM t WHERE Address LIKE '%5th Ave%'")
+    assert cache.get("d", "s", "units on 7th ave", []) == "SELECT * FROM t WHERE Address LIKE '%7th Ave%'"
+
+
+def test_limit_literal_is_parameterized():
+    sql = "SELECT * FROM t ORDER BY Rent DESC LIMIT 5"
+    assert _parameterize_sql(sql, ["5"]) == "SELECT * FROM t ORDER BY Rent DESC LIMIT \x000\x00"
+
+
+def test_number_outside_an_operand_keeps_the_literal_key():
+    cache = make_cache()
+    sql = "SELECT ROUND(AVG(Rent), 3) FROM t WHERE Bedrooms = 3"
+    cache.put("d", "s", "average rent for 3 bedroom", [], sql)
+    assert cache.get("d", "s", "average rent for 4 bedroom", []) is None
+    assert cache.get("d", "s", "average rent for 3 bedroom", []) == sql
+
+
+def test_rounding_precision_is_not_parameterized():
+    assert _parameterize_sql("SELECT ROUND(AVG(Rent), 2) FROM t", ["2"]) is None
+
+
+def test_number_repeated_in_sql_keeps_the_literal_key():
+    cache = make_cache()
+    sql = "SELECT * FROM t WHERE Address LIKE '%Building 7%' LIMIT 7"
+    cache.put("d", "s", "building 7", [], sql)
+    assert cache.get("d", "s", "building 8", []) is None
+    assert cache.get("d", "s", "building 7", []) == sql
+
+
+def test_question_number_missing_from_sql_keeps_the_literal_key():
+    cache = make_cache()
+    sql = "SELECT * FROM t ORDER BY Rent DESC LIMIT 100000"
+    cache.put("d", "s", "top 1000000 listings", [], sql)
+    assert cache.get("d", "s", "top 5 listings", []) is None
+    assert cache.get("d", "s", "top 1000000 listings", []) == sql
+
+
+def test_between_bounds_are_parameterized():
+    sql = "SELECT * FROM t WHERE Rent BETWEEN 2000 AND 3000"
+    template = _parameterize_sql(sql, ["2000", "3000"])
+    assert template == "SELECT * FROM t WHERE Rent BETWEEN \x000\x00 AND \x001\x00"
+
+
+def test_clock_reads_are_not_deterministic():
+    for sql in (
+        "SELECT date('now')",
+        "SELECT date('NOW')",
+        "SELECT datetime('Now', '-1 day')",
+        "SELECT datetime()",
+        "SELECT date()",
+        "SELECT time( )",
+        "SELECT julianday()",
+        "SELECT unixepoch()",
+        "SELECT strftime('%s')",
+        "SELECT STRFTIME('%Y-%m-%d')",
+        "SELECT * FROM t WHERE Listed > CURRENT_DATE",
+        "SELECT * FROM t ORDER BY RANDOM() LIMIT 1",
+    ):
+        assert not is_deterministic_sql(sql), sql
+
+
+def test_date_functions_on_column_values_are_deterministic():
+    for sql in (
+        "SELECT date(Listed) FROM t",
+        "SELECT strftime('%Y', Listed) FROM t",
+        "SELECT julianday('2024-01-01') - julianday(Listed) FROM t",
+        "SELECT * FROM t WHERE Notes = 'call now'",
+    ):
+        assert is_deterministic_sql(sql), sql
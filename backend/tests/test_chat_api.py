@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_mongo import FakeDatabase
+from app.api.endpoints import chat
+from app.core.config import settings
+from app.crud import crud_user
+from app.db.session import get_database
+from app.main import app
+from app.schemas.message import ChatRequest
+from app.services.session_service import session_service
+
+CHAT = f"{settings.API_V1_STR}/chat/"
+
+
+class FakeDataset:
+    def __init__(self, dataset_id):
+        self.dataset_id = dataset_id
+
+    def get_schema(self):
+        return 'CREATE TABLE "listings" ("rent" REAL)'
+
+
+@pytest.fixture
+def db(monkeypatch):
+    db = FakeDatabase("test")
+    for user_id in ("u1", "u2", "u3"):
+        asyncio.run(db["users"].insert_one({"id": user_id, "email": f"{user_id}@example.com", "name": user_id, "hashed_password": "x"}))
+    # u1 and u2 have their own datasets; u3 uses the shared default
+    monkeypatch.setattr(chat.dataset_manager, "resolve_dataset_id", lambda user_id: user_id if user_id in ("u1", "u2") else settings.DEFAULT_DATASET_ID)
+    monkeypatch.setattr(chat.dataset_manager, "get_service", FakeDataset)
+    monkeypatch.setitem(app.dependency_overrides, get_database, lambda: db)
+    return db
+
+
+def token_for(db, user_id):
+    user = asyncio.run(crud_user.get_user_by_id(db, user_id=user_id))
+    return {"Authorization": f"Bearer {session_service.issue(user)}"}
+
+
+def ask(user_id):
+    return {"user_id": user_id, "session_id": "s1", "message": "What is the average rent?"}
+
+
+def test_private_dataset_requires_a_session_token(db):
+    response = TestClient(app).post(CHAT, json=ask("u1"))
+    assert response.status_code == 401
+
+
+def test_token_of_another_user_is_rejected(db):
+    response = TestClient(app).post(CHAT, json=ask("u1"), headers=token_for(db, "u2"))
+    assert response.status_code == 403
+
+
+def test_owner_token_opens_the_private_dataset(db):
+    user = asyncio.run(crud_user.get_user_by_id(db, user_id="u1"))
+    _, dataset = asyncio.run(chat.load_turn_context(ChatRequest(**ask("u1")), db, user))
+    assert dataset.dataset_id == "u1"
+
+
+def test_default_dataset_needs_no_token(db):
+    _, dataset = asyncio.run(chat.load_turn_context(ChatRequest(**ask("u3")), db))
+    assert dataset.dataset_id == settings.DEFAULT_DATASET_ID
+
+
+def test_unauthenticated_context_for_a_private_dataset_raises(db):
+    with pytest.raises(HTTPException) as raised:
+        asyncio.run(chat.load_turn_context(ChatRequest(**ask("u2")), db))
+    assert raised.value.status_code == 401
+
+
+def test_non_ascii_token_is_rejected_as_invalid(db):
+    headers = {"Authorization": "Bearer tokené.signature".encode("latin-1")}
+    response = TestClient(app).post(CHAT, json=ask("u1"), headers=headers)
+    assert response.status_code == 401
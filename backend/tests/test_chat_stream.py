@@ -0,0 +1,73 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import BackgroundTasks
+
+from benchmarks.fake_mongo import FakeDatabase
+from app.api.endpoints import chat
+from app.schemas.conversation import ConversationWindow
+from app.schemas.message import ChatRequest
+
+
+class FakeDataset:
+    async def run_query_async(self, sql):
+        return SimpleNamespace(text="count\n42", rows=[(42,)], columns=["count"], row_count=1)
+
+
+class FakeHTTPRequest:
+    def __init__(self, disconnect_after: int):
+        self.checks = 0
+        self.disconnect_after = disconnect_after
+
+    async def is_disconnected(self):
+        self.checks += 1
+        return self.checks > self.disconnect_after
+
+
+def stream_turn(monkeypatch, disconnect_after: int, close_early: bool = False):
+    db = FakeDatabase("test")
+    request = ChatRequest(user_id="u1", session_id="s1", message="Which suites are the largest?")
+
+    async def load_turn_context(request, db, session_user=None):
+        return ConversationWindow(id="s1", user_id="u1"), FakeDataset()
+
+    async def generate_sql_for_turn(request, conversation, dataset):
+        return "SELECT 42"
+
+    async def tokens(question, sql, results):
+        for token in ["The ", "largest ", "suite ", "is ", "42."]:
+            yield token
+
+    monkeypatch.setattr(chat, "load_turn_context", load_turn_context)
+    monkeypatch.setattr(chat, "generate_sql_for_turn", generate_sql_for_turn)
+    monkeypatch.setattr(chat, "template_reply", lambda *args: None)
+    monkeypatch.setattr(chat, "stream_response_from_sql", tokens)
+
+    async def scenario():
+        response = await chat.handle_chat_stream(request, FakeHTTPRequest(disconnect_after), BackgroundTasks(), db=db)
+        events = []
+        async for event in response.body_iterator:
+            events.append(event)
+            if close_early and len(events) == 4:
+                await response.body_iterator.aclose()
+                break
+        await asyncio.gather(*chat.interrupted_turn_saves)
+        return events, await db["conversations"].find_one({"id": "s1"})
+
+    return asyncio.run(scenario())
+
+
+def test_disconnect_saves_the_partial_answer(monkeypatch):
+    events, conversation = stream_turn(monkeypatch, disconnect_after=2)
+    assert not any(event.startswith("event: done") for event in events)
+    assert [message["content"] for message in conversation["messages"]] == ["Which suites are the largest?", "The largest"]
+
+
+def test_disconnect_before_any_token_saves_the_question(monkeypatch):
+    _, conversation = stream_turn(monkeypatch, disconnect_after=0)
+    assert [message["role"] for message in conversation["messages"]] == ["user"]
+
+
+def test_stream_closed_by_the_server_saves_the_partial_answer(monkeypatch):
+    _, conversation = stream_turn(monkeypatch, disconnect_after=100, close_early=True)
+    assert [message["content"] for message in conversation["messages"]] == ["Which suites are the largest?", "The largest"]
@@ -0,0 +1,108 @@
+import asyncio
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+
+from benchmarks.fake_mongo import FakeDatabase
+from app.crud import crud_conversation
+from app.schemas.conversation import Message
+
+
+def turn(number: int):
+    return [Message(role="user", content=f"question {number}"), Message(role="assistant", content=f"answer {number}")]
+
+
+def test_append_turn_creates_the_conversation_and_appends_in_order():
+    db = FakeDatabase("test")
+    asyncio.run(crud_conversation.append_turn(db, "s1", "u1", turn(1)))
+    asyncio.run(crud_conversation.append_turn(db, "s1", "u1", turn(2)))
+    conversation = asyncio.run(crud_conversation.get_conversation_by_session_id(db, "s1"))
+    assert conversation.user_id == "u1"
+    assert conversation.summary == "" and conversation.summarized_count == 0
+    assert [message.content for message in conversation.messages] == ["question 1", "answer 1", "question 2", "answer 2"]
+
+
+def test_window_holds_the_last_messages_and_counts_all_of_them():
+    db = FakeDatabase("test")
+    for number in range(5):
+        asyncio.run(crud_conversation.append_turn(db, "s1", "u1", turn(number)))
+    window = asyncio.run(crud_conversation.get_conversation_window(db, "s1", 3))
+    assert window.message_count == 10
+    assert [message.content for message in window.messages] == ["answer 3", "question 4", "answer 4"]
+
+
+def test_window_of_a_short_conversation_holds_every_message():
+    db = FakeDatabase("test")
+    asyncio.run(crud_conversation.append_turn(db, "s1", "u1", turn(1)[:1]))
+    window = asyncio.run(crud_conversation.get_conversation_window(db, "s1", 10))
+    assert window.message_count == 1
+    assert [message.content for message in window.messages] == ["question 1"]
+
+
+def test_window_of_an_unknown_session_is_none():
+    assert asyncio.run(crud_conversation.get_conversation_window(FakeDatabase("test"), "missing", 10)) is None
+
+
+def test_messages_range_fetches_only_the_requested_slice():
+    db = FakeDatabase("test")
+    for number in range(3):
+        asyncio.run(crud_conversation.append_turn(db, "s1", "u1", turn(number)))
+    messages = asyncio.run(crud_conversation.get_messages_range(db, "s1", 1, 2))
+    assert [message.content for message in messages] == ["answer 0", "question 1"]
+
+
+def add_conversations(db, created: dict):
+    for convo_id, created_at in created.items():
+        asyncio.run(db["conversations"].insert_one({
+            "id": convo_id, "user_id": "u1", "tags": [], "created_at": created_at,
+            "summary": "", "summarized_count": 0, "messages": [],
+        }))
+
+
+def read_pages(db, limit: int):
+    ids, after = [], None
+    while True:
+        page, has_more = asyncio.run(crud_conversation.get_conversations_page(db, "u1", limit, after=after))
+        ids.append([conversation.id for conversation in page])
+        if not has_more:
+            return ids
+        after = crud_conversation.decode_page_cursor(crud_conversation.encode_page_cursor(page[-1]))
+
+
+def test_pages_follow_created_at_then_id_without_gaps_or_repeats():
+    db = FakeDatabase("test")
+    start = datetime(2024, 1, 1)
+    # c2, c3 and c4 share a created_at, so the id decides their order
+    add_conversations(db, {"c1": start, "c2": start + timedelta(1), "c3": start + timedelta(1), "c4": start + timedelta(1), "c5": start + timedelta(2)})
+    assert read_pages(db, 2) == [["c5", "c4"], ["c3", "c2"], ["c1"]]
+    assert read_pages(db, 5) == [["c5", "c4", "c3", "c2", "c1"]]
+
+
+def test_conversations_added_while_paging_do_not_shift_later_pages():
+    db = FakeDatabase("test")
+    start = datetime(2024, 1, 1)
+    add_conversations(db, {f"c{day}": start + timedelta(day) for day in range(4)})
+    first, has_more = asyncio.run(crud_conversation.get_conversations_page(db, "u1", 2))
+    assert has_more and [conversation.id for conversation in first] == ["c3", "c2"]
+    add_conversations(db, {"new": start + timedelta(10)})
+    after = crud_conversation.decode_page_cursor(crud_conversation.encode_page_cursor(first[-1]))
+    second, has_more = asyncio.run(crud_conversation.get_conversations_page(db, "u1", 2, after=after))
+    assert not has_more and [conversation.id for conversation in second] == ["c1", "c0"]
+
+
+def _cursor(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    _cursor("{}"),
+    _cursor("null"),
+    _cursor('["2024-01-01T00:00:00"]'),
+    _cursor('["yesterday", "c1"]'),
+    _cursor('[1, "c1"]'),
+])
+def test_tampered_page_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid page cursor"):
+        crud_conversation.decode_page_cursor(cursor)
@@ -0,0 +1,97 @@
+import sqlite3
+
+import pytest
+
+from app.core.config import settings
+from app.db.dataset_catalog import DatasetCatalogEntry, DatasetCatalogStore
+from app.services.dataset_service import DatasetManager
+
+HEADER = "id,city,rent\n"
+
+
+def write_csv(tmp_path, name: str, rows) -> str:
+    path = tmp_path / name
+    path.write_text(HEADER + "\n".join(rows) + "\n")
+    return str(path)
+
+
+def table_names(db_path: str):
+    connection = sqlite3.connect(db_path)
+    try:
+        return sorted(name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"))
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def workers(tmp_path, monkeypatch):
+    """Two dataset managers sharing one catalog, like two workers of the same deployment."""
+    monkeypatch.setattr(settings, "DATASETS_DIR", str(tmp_path / "datasets"))
+    monkeypatch.setattr(settings, "SQLITE_DB_PATH", str(tmp_path / "knowledge_base.db"))
+    catalog_path = str(tmp_path / "datasets" / "catalog.db")
+    managers = [DatasetManager(catalog_path=catalog_path), DatasetManager(catalog_path=catalog_path)]
+    yield managers
+    for manager in managers:
+        for service in manager._open.values():
+            service.close()
+        manager.store.close()
+
+
+def test_catalog_reports_changes_committed_by_other_connections(tmp_path):
+    path = str(tmp_path / "catalog.db")
+    writer, reader = DatasetCatalogStore(path), DatasetCatalogStore(path)
+    assert reader.changed()
+    assert not reader.changed()
+    writer.save(DatasetCatalogEntry(dataset_id="u1", db_path="u1.db", version=writer.reserve_version("u1")))
+    assert reader.changed()
+    assert [entry.dataset_id for entry in reader.load_all()] == ["u1"]
+    writer.close()
+    reader.close()
+
+
+def test_catalog_keeps_the_newest_version(tmp_path):
+    store = DatasetCatalogStore(str(tmp_path / "catalog.db"))
+    first, second = store.reserve_version("u1"), store.reserve_version("u1")
+    assert second == first + 1
+    assert store.save(DatasetCatalogEntry(dataset_id="u1", db_path="u1.db", version=second, row_count=2))
+    # A load that started earlier but finished later must not overwrite the newer one
+    assert not store.save(DatasetCatalogEntry(dataset_id="u1", db_path="u1.db", version=first, row_count=1))
+    assert [(entry.version, entry.row_count) for entry in store.load_all()] == [(second, 2)]
+    store.close()
+
+
+def test_open_dataset_is_reloaded_when_another_worker_loads_it(workers, tmp_path):
+    loader, reader = workers
+    loader.load_csv("u1", write_csv(tmp_path, "listings.csv", ["1,NYC,2000"]))
+    service = reader.get_service("u1")
+    assert (service.version, service.row_count) == (1, 1)
+    assert service.run_query("SELECT count(*) FROM listings").text == "1"
+
+    loader.load_csv("u1", write_csv(tmp_path, "listings.csv", ["1,NYC,2000", "2,LA,1500"]))
+    assert reader.resolve_dataset_id("u1") == "u1"
+    assert (service.version, service.row_count) == (2, 2)
+    # The cached result of version 1 is not served for version 2
+    assert service.run_query("SELECT count(*) FROM listings").text == "2"
+
+
+def test_reloading_the_same_file_is_skipped(workers, tmp_path):
+    manager, _ = workers
+    path = write_csv(tmp_path, "listings.csv", ["1,NYC,2000"])
+    manager.load_csv("u1", path)
+    delta = manager.load_csv("u1", path)
+    assert delta.unchanged == 1 and delta.inserted == 0
+    assert manager.get_service("u1").version == 1
+
+
+def test_failed_replace_load_leaves_the_live_table_untouched(workers, tmp_path, monkeypatch):
+    manager, _ = workers
+    manager.load_csv("u1", write_csv(tmp_path, "listings.csv", ["1,NYC,2000", "2,LA,1500"]))
+    monkeypatch.setattr(settings, "INGESTION_CHUNK_ROWS", 2)
+    # The malformed row is only parsed after the first chunk was written to the staging table
+    broken = write_csv(tmp_path, "listings.csv", ["3,SF,3000", "4,Austin,1200", "5,Boston,2500", "6,NYC,1,2,3"])
+    assert manager.load_csv("u1", broken) is None
+
+    service = manager.get_service("u1")
+    assert service.run_query("SELECT id FROM listings ORDER BY id", use_cache=False).text == "id\n1\n2"
+    assert table_names(service.db_path) == ["listings"]
+    assert service.version == 1
@@ -0,0 +1,55 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from benchmarks.fake_mongo import FakeDatabase
+from app.core.config import settings
+from app.db.session import get_database
+from app.main import app
+from app.services import ingestion_service as ingestion_module
+from app.services.session_service import session_service
+
+UPLOAD = f"{settings.API_V1_STR}/documents/upload-docs"
+CSV = {"file": ("listings.csv", b"a,b\n1,2\n", "text/csv")}
+
+
+def make_client(monkeypatch):
+    db = FakeDatabase("test")
+    for user_id in ("u1", "u2"):
+        asyncio.run(db["users"].insert_one({"id": user_id, "email": f"{user_id}@example.com", "name": user_id, "hashed_password": "x"}))
+    submitted = []
+
+    async def submit_upload(file, dataset_id, mode="replace", key_column=None):
+        submitted.append(dataset_id)
+        raise RuntimeError("not loaded in tests")
+
+    monkeypatch.setattr(ingestion_module.ingestion_service, "submit_upload", submit_upload)
+    monkeypatch.setitem(app.dependency_overrides, get_database, lambda: db)
+    return TestClient(app), db, submitted
+
+
+def token_for(client, db, user_id):
+    from app.crud import crud_user
+    user = asyncio.run(crud_user.get_user_by_id(db, user_id=user_id))
+    return {"Authorization": f"Bearer {session_service.issue(user)}"}
+
+
+def test_user_dataset_upload_requires_a_session_token(monkeypatch):
+    client, _, submitted = make_client(monkeypatch)
+    response = client.post(UPLOAD, files=CSV, data={"user_id": "u1"})
+    assert response.status_code == 401
+    assert submitted == []
+
+
+def test_token_of_another_user_is_rejected(monkeypatch):
+    client, db, submitted = make_client(monkeypatch)
+    response = client.post(UPLOAD, files=CSV, data={"user_id": "u1"}, headers=token_for(client, db, "u2"))
+    assert response.status_code == 403
+    assert submitted == []
+
+
+def test_upload_goes_to_the_token_user_dataset(monkeypatch):
+    client, db, submitted = make_client(monkeypatch)
+    client.post(UPLOAD, files=CSV, headers=token_for(client, db, "u1"))
+    client.post(UPLOAD, files=CSV)
+    assert submitted == ["u1", settings.DEFAULT_DATASET_ID]
@@ -0,0 +1,46 @@
+import sqlite3
+
+import pytest
+
+from app.services.text_to_sql_service import TextToSQLService
+
+HEADER = "id,city,rent\n"
+ROWS = ["1,NYC,2000", "2,LA,1500", "3,SF,3000"]
+
+
+def write_csv(tmp_path, name: str, rows, header: str = HEADER) -> str:
+    path = tmp_path / name
+    path.write_text(header + "\n".join(rows) + "\n")
+    return str(path)
+
+
+def table_rows(service: TextToSQLService, table: str):
+    connection = sqlite3.connect(service.db_path)
+    try:
+        return sorted(connection.execute(f'SELECT * FROM "{table}"').fetchall())
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = TextToSQLService("test", str(tmp_path / "test.db"))
+    service.load_csv_to_sql(write_csv(tmp_path, "listings.csv", ROWS))
+    yield service
+    service.read_pool.close()
+
+
+def test_append_from_a_differently_named_file_targets_the_loaded_table(service, tmp_path):
+    delta = service.load_csv_to_sql(write_csv(tmp_path, "listings_2024.csv", ["4,Austin,1200"]), mode="append")
+    assert delta.mode == "append" and delta.inserted == 1
+    assert service.table_name == "listings"
+    assert len(table_rows(service, "listings")) == 4
+
+
+def test_in_place_load_with_other_columns_fails_without_changes(service, tmp_path):
+    other = write_csv(tmp_path, "listings.csv", ["1,NYC"], header="id,city\n")
+    for mode in ("append", "upsert", "sync"):
+        with pytest.raises(ValueError, match="mode=replace"):
+            service.load_csv_to_sql(other, mode=mode)
+    assert len(table_rows(service, "listings")) == 3
+    assert service.table_name == "listings"
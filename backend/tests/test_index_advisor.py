@@ -0,0 +1,80 @@
+import sqlite3
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.db.sqlite_pool import maintenance_executor
+from app.services.index_advisor import IndexAdvisor, index_name
+
+FILTER_QUERY = "SELECT b FROM t WHERE a = 7"
+# Idle indexes are checked for while recording queries that have index candidates
+OTHER_QUERY = "SELECT a FROM t ORDER BY b"
+
+
+@pytest.fixture
+def advisor(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INDEX_ADVISOR_ENABLED", True)
+    monkeypatch.setattr(settings, "INDEX_ADVISOR_USAGE_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "INDEX_ADVISOR_IDLE_CHECK_EVERY", 1_000)
+    path = str(tmp_path / "data.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+    connection.executemany("INSERT INTO t VALUES (?, ?)", ((i, str(i)) for i in range(1_000)))
+    connection.commit()
+    connection.close()
+    advisor = IndexAdvisor(path)
+    advisor.reset("t")
+    return advisor
+
+
+def run(advisor, sql: str, times: int = 1):
+    connection = sqlite3.connect(advisor.db_path)
+    try:
+        for _ in range(times):
+            connection.execute(sql).fetchall()
+            advisor.record(sql, 0.01, connection)
+    finally:
+        connection.close()
+    # Index maintenance runs on the background writer
+    maintenance_executor.submit(lambda: None).result()
+
+
+def auto_indexes(advisor):
+    connection = sqlite3.connect(advisor.db_path)
+    try:
+        return [name for name, in connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'")]
+    finally:
+        connection.close()
+
+
+def test_index_is_created_once_a_scan_reaches_the_usage_threshold(advisor):
+    run(advisor, FILTER_QUERY, times=2)
+    assert auto_indexes(advisor) == []
+    assert advisor.report()["candidates"][0] == {"columns": ["a"], "uses": 2, "avg_scan_ms": 10.0}
+
+    run(advisor, FILTER_QUERY)
+    assert auto_indexes(advisor) == [index_name("t", ("a",))]
+    assert list(advisor.indexes) == [("a",)]
+
+
+def test_queries_using_the_index_count_as_uses_and_do_not_add_candidates(advisor):
+    run(advisor, FILTER_QUERY, times=3)
+    run(advisor, FILTER_QUERY, times=2)
+    index = advisor.indexes[("a",)]
+    assert index.uses_after == 2
+    assert advisor.report()["candidates"] == []
+
+
+def test_indexes_unused_for_the_idle_period_are_dropped(advisor, monkeypatch):
+    run(advisor, FILTER_QUERY, times=3)
+    monkeypatch.setattr(settings, "INDEX_ADVISOR_IDLE_SECONDS", 60)
+    monkeypatch.setattr(settings, "INDEX_ADVISOR_IDLE_CHECK_EVERY", 1)
+    advisor.indexes[("a",)].last_used = time.time() - 30
+    run(advisor, OTHER_QUERY)
+    assert auto_indexes(advisor) == [index_name("t", ("a",))]
+
+    advisor.indexes[("a",)].last_used = time.time() - 120
+    run(advisor, OTHER_QUERY)
+    assert auto_indexes(advisor) == []
+    assert advisor.indexes == {}
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from app.services.llm_gateway import Completion, CompletionRequest, LLMBackend, LocalBackend
+
+
+def test_incomplete_backend_fails_at_construction():
+    class CompleteOnly(LLMBackend):
+        async def complete(self, request):
+            return Completion(content="")
+
+    with pytest.raises(TypeError):
+        CompleteOnly()
+
+
+def test_local_backend_implements_both_methods():
+    backend = LocalBackend()
+    request = CompletionRequest(messages=[{"role": "user", "content": "hello there"}])
+
+    async def collect():
+        return [chunk.content async for chunk in backend.stream(request)]
+
+    assert asyncio.run(backend.complete(request)).content == "hello there"
+    assert "".join(asyncio.run(collect())) == "hello there"
@@ -0,0 +1,44 @@
+import sqlite3
+
+from app.core.config import settings
+from app.services.query_guard import apply_row_limit, review_query
+
+
+def make_connection():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE t (a INTEGER, b TEXT)")
+    return connection
+
+
+def test_limit_is_appended_after_a_trailing_comment():
+    sql, row_limit, _ = apply_row_limit("SELECT a FROM t -- all rows", 100)
+    assert sql == "SELECT a FROM t LIMIT 100"
+    assert row_limit == 100
+
+
+def test_trailing_semicolons_and_block_comments_are_dropped():
+    sql, _, _ = apply_row_limit("SELECT a FROM t; /* done */ ;", 100)
+    assert sql == "SELECT a FROM t LIMIT 100"
+
+
+def test_comment_markers_inside_literals_are_kept():
+    sql, _, _ = apply_row_limit("SELECT a FROM t WHERE b = '-- x'", 100)
+    assert sql == "SELECT a FROM t WHERE b = '-- x' LIMIT 100"
+
+
+def test_existing_limit_followed_by_a_comment_is_lowered():
+    sql, row_limit, _ = apply_row_limit("SELECT a FROM t LIMIT 500 -- first page", 100)
+    assert sql == "SELECT a FROM t LIMIT 100"
+    assert row_limit == 100
+
+
+def test_wrapped_query_with_a_trailing_comment_is_valid():
+    sql, _, _ = apply_row_limit("SELECT a FROM t LIMIT (SELECT 500) -- x", 100)
+    assert sql == "SELECT * FROM (SELECT a FROM t LIMIT (SELECT 500)) LIMIT 100"
+    make_connection().execute(sql)
+
+
+def test_review_caps_a_query_ending_in_a_comment():
+    guarded = review_query(make_connection(), "SELECT a FROM t -- all rows", table_rows=10)
+    assert not guarded.rejected
+    assert guarded.sql == f"SELECT a FROM t LIMIT {settings.SQL_GUARD_MAX_ROWS}"
@@ -0,0 +1,50 @@
+import pytest
+
+from app.services import text_to_sql_service
+from app.services.text_to_sql_service import TextToSQLService
+
+CSV = "id,city,rent\n1,NYC,2000\n2,LA,1500\n3,SF,3000\n"
+QUERY = "SELECT city FROM listings WHERE rent > 1000"
+
+
+@pytest.fixture
+def service(tmp_path):
+    path = tmp_path / "listings.csv"
+    path.write_text(CSV)
+    service = TextToSQLService("test", str(tmp_path / "test.db"))
+    service.load_csv_to_sql(str(path))
+    yield service
+    service.read_pool.close()
+
+
+@pytest.fixture
+def reviews(monkeypatch):
+    reviewed = []
+    review_query = text_to_sql_service.review_query
+
+    def counting_review(connection, sql, table_rows):
+        reviewed.append(sql)
+        return review_query(connection, sql, table_rows)
+
+    monkeypatch.setattr(text_to_sql_service, "review_query", counting_review)
+    return reviewed
+
+
+def test_a_checked_query_is_not_planned_again_when_it_runs(service, reviews, monkeypatch):
+    plans = []
+    monkeypatch.setattr(service.index_advisor, "record", lambda sql, elapsed, connection, plan=None: plans.append(plan))
+    assert not service.check_query(QUERY).rejected
+    result = service.run_query(QUERY, use_cache=False)
+    assert not result.error and result.row_count == 3
+    assert reviews == [QUERY]
+    # The index advisor gets the guard's plan instead of running EXPLAIN itself
+    assert plans and plans[0]
+
+
+def test_a_new_load_reviews_the_query_again(service, reviews, tmp_path):
+    service.check_query(QUERY)
+    path = tmp_path / "more.csv"
+    path.write_text("id,city,rent\n4,Austin,1200\n")
+    service.load_csv_to_sql(str(path), mode="append")
+    service.check_query(QUERY)
+    assert reviews == [QUERY, QUERY]
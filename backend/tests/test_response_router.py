@@ -0,0 +1,51 @@
+import sqlite3
+
+import pytest
+
+from app.services.response_router import template_reply
+from app.services.text_to_sql_service import QueryResult
+
+QUESTION = "How many listings are vacant?"
+
+
+def run(sql: str) -> QueryResult:
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE listings (city TEXT, rent REAL, status TEXT)")
+    connection.executemany("INSERT INTO listings VALUES (?, ?, ?)", [
+        ("NYC", 2000, "vacant"), ("NYC", 3000, "leased"), ("LA", None, "leased"), ("LA", None, "leased"),
+    ])
+    cursor = connection.execute(sql)
+    rows = cursor.fetchall()
+    columns = [description[0] for description in cursor.description]
+    return QueryResult(text="", columns=columns, rows=rows, row_count=len(rows))
+
+
+def reply(sql: str):
+    return template_reply(QUESTION, sql, run(sql))
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT COUNT(*) FROM listings", "There are 4 records in total."),
+    ("SELECT COUNT(*) FROM listings WHERE status = 'vacant'", "There is 1 matching record."),
+    ("SELECT COUNT(DISTINCT city) FROM listings", "There are 2 distinct city values."),
+    ("SELECT ROUND(AVG(rent), 2) AS avg_rent FROM listings", "The average rent is 2,500."),
+    ("SELECT MAX(rent) FROM listings WHERE city IN (SELECT city FROM listings)", "The highest rent is 3,000."),
+    ("SELECT SUM(rent * 2) AS doubled_rent FROM listings", "The total doubled rent is 10,000."),
+    ("SELECT rent FROM listings WHERE status = 'vacant'", "The rent is 2,000."),
+])
+def test_single_aggregates_and_columns_use_templates(sql, expected):
+    assert reply(sql) == expected
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT COUNT(*) * 100.0 / (SELECT COUNT(*) FROM listings) FROM listings WHERE status = 'vacant'",
+    "SELECT COUNT(*) - COUNT(rent) FROM listings",
+    "SELECT COUNT(*) / COUNT(DISTINCT city) FROM listings",
+    "SELECT MAX(rent) - MIN(rent) AS rent_range FROM listings",
+    "SELECT ROUND(MAX(rent), 2) - ROUND(MIN(rent), 2) FROM listings",
+    "SELECT (SELECT COUNT(*) FROM listings) AS total",
+    "SELECT rent * 12 AS annual_rent FROM listings WHERE status = 'vacant'",
+    "SELECT CASE WHEN COUNT(*) > 1 THEN 'many' ELSE 'one' END AS size FROM listings",
+])
+def test_compound_expressions_go_to_the_llm(sql):
+    assert reply(sql) is None
@@ -0,0 +1,54 @@
+import sqlite3
+
+from app.services.result_renderer import CHARS_PER_TOKEN, render_cursor
+
+
+def make_connection(rows: int):
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE t (id INTEGER, city TEXT, rent REAL)")
+    cities = ["NYC", "LA", "NYC", "SF"]
+    connection.executemany(
+        "INSERT INTO t VALUES (?, ?, ?)", ((i, cities[i % len(cities)], 1000.0 + i) for i in range(rows))
+    )
+    return connection
+
+
+def test_small_result_is_rendered_in_full_as_csv():
+    result = render_cursor(make_connection(3).execute("SELECT id, city, rent FROM t"), token_budget=1_000)
+    assert result.text == "id,city,rent\n0,NYC,1000\n1,LA,1001\n2,NYC,1002"
+    assert result.rows == [(0, "NYC", 1000.0), (1, "LA", 1001.0), (2, "NYC", 1002.0)]
+    assert result.row_count == 3 and not result.truncated
+
+
+def test_single_value_is_returned_on_its_own():
+    result = render_cursor(make_connection(10).execute("SELECT count(*) FROM t"))
+    assert result.text == "10"
+
+
+def test_empty_result_names_the_columns():
+    result = render_cursor(make_connection(3).execute("SELECT id, city FROM t WHERE id < 0"))
+    assert result.text == "No rows returned.\nid,city"
+    assert result.row_count == 0
+
+
+def test_rows_over_the_token_budget_are_summarized():
+    token_budget = 20
+    result = render_cursor(make_connection(100).execute("SELECT id, city, rent FROM t"), token_budget=token_budget)
+    rendered, summary = result.text.split("Summary of the scanned rows:\n")
+    # The header and rendered rows fit the budget; the summary is appended after it
+    assert len(rendered.split("...")[0]) <= token_budget * CHARS_PER_TOKEN
+    assert f"... {100 - len(result.rows)} more rows not shown (100 rows in total)." in rendered
+    assert summary.splitlines() == [
+        "id: min=0, max=99, mean=49.5",
+        "city: 3 distinct values, most common: NYC (50), LA (25), SF (25)",
+        "rent: min=1000, max=1099, mean=1049.5",
+    ]
+    assert result.truncated and result.row_count == 100 and result.row_count_exact
+
+
+def test_scanning_stops_at_the_row_limit():
+    result = render_cursor(make_connection(100).execute("SELECT id FROM t"), token_budget=5, max_scan_rows=10)
+    assert result.row_count == 10
+    assert not result.row_count_exact
+    assert "(more than 10 rows in total)" in result.text
+    assert "id: min=0, max=9, mean=4.5" in result.text
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from app.services.row_delta import LoadDelta
+from app.services.text_to_sql_service import TextToSQLService
+
+HEADER = "id,city,rent\n"
+ROWS = ["1,NYC,2000", "2,LA,1500", "3,SF,3000"]
+
+
+def write_csv(tmp_path, rows) -> str:
+    path = tmp_path / "listings.csv"
+    path.write_text(HEADER + "\n".join(rows) + "\n")
+    return str(path)
+
+
+def table_rows(service: TextToSQLService):
+    connection = sqlite3.connect(service.db_path)
+    try:
+        return sorted(connection.execute('SELECT id, city, rent FROM "listings"').fetchall())
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def service(tmp_path):
+    service = TextToSQLService("test", str(tmp_path / "test.db"))
+    service.load_csv_to_sql(write_csv(tmp_path, ROWS))
+    yield service
+    service.read_pool.close()
+
+
+def test_upsert_with_a_key_inserts_and_updates(service, tmp_path):
+    delta = service.load_csv_to_sql(write_csv(tmp_path, ["2,LA,1600", "3,SF,3000", "4,Austin,1200"]), mode="upsert", key_column="id")
+    assert (delta.inserted, delta.updated, delta.deleted) == (1, 1, 0)
+    assert delta.changed_columns == ["rent"]
+    assert table_rows(service) == [(1, "NYC", 2000.0), (2, "LA", 1600.0), (3, "SF", 3000.0), (4, "Austin", 1200.0)]
+    assert service.row_count == 4
+
+
+def test_sync_with_a_key_also_deletes_rows_missing_from_the_file(service, tmp_path):
+    delta = service.load_csv_to_sql(write_csv(tmp_path, ["2,LA,1600", "3,SF,3000"]), mode="sync", key_column="id")
+    assert (delta.inserted, delta.updated, delta.deleted, delta.unchanged) == (0, 1, 1, 1)
+    assert table_rows(service) == [(2, "LA", 1600.0), (3, "SF", 3000.0)]
+
+
+def test_sync_without_a_key_replaces_changed_rows(service, tmp_path):
+    delta = service.load_csv_to_sql(write_csv(tmp_path, ["1,NYC,2000", "2,LA,1600"]), mode="sync")
+    # Without a key the old version of a changed row is deleted and the new one inserted
+    assert (delta.inserted, delta.updated, delta.deleted, delta.unchanged) == (1, 0, 2, 1)
+    assert table_rows(service) == [(1, "NYC", 2000.0), (2, "LA", 1600.0)]
+
+
+def test_reloading_an_identical_file_changes_nothing(service, tmp_path):
+    delta = service.load_csv_to_sql(write_csv(tmp_path, ROWS), mode="sync", key_column="id")
+    assert not delta.changed and delta.unchanged == 3
+    assert table_rows(service) == [(1, "NYC", 2000.0), (2, "LA", 1500.0), (3, "SF", 3000.0)]
+
+
+def test_updates_only_affect_queries_reading_the_changed_columns():
+    delta = LoadDelta(mode="upsert", updated=1, changed_columns=["rent"])
+    assert delta.affects("SELECT AVG(rent) FROM listings")
+    assert delta.affects("SELECT * FROM listings")
+    assert not delta.affects("SELECT city, COUNT(*) FROM listings GROUP BY city")
+    assert LoadDelta(mode="sync", deleted=1).affects("SELECT city FROM listings")
@@ -0,0 +1,69 @@
+from app.core.config import settings
+from app.services.schema_index import SchemaIndex, SchemaIndexBuilder, format_literals
+
+VALUES = {
+    "Neighborhood": ["Upper East Side", "Lower East Side", "Williamsburg", "SoHo"],
+    "Address": ["12 Main St", "512 Main St"],
+    "Status": ["Available", "Leased"],
+}
+
+
+def make_index(extra_columns: int = 0) -> SchemaIndex:
+    columns = [("Listing_ID", "TEXT"), ("Neighborhood", "TEXT"), ("Address", "TEXT"), ("Status", "TEXT"), ("Monthly_Rent", "REAL")]
+    columns += [(f"Extra_Field_{i}", "TEXT") for i in range(extra_columns)]
+    return SchemaIndex(columns, VALUES)
+
+
+def test_values_mentioned_in_the_question_are_matched():
+    index = make_index()
+    assert index.match_values("listings in williamsburg that are available") == [
+        ("Neighborhood", "Williamsburg"), ("Status", "Available"),
+    ]
+
+
+def test_value_matching_tolerates_case_punctuation_and_partial_words():
+    index = make_index()
+    # A partial match scores lower and is ranked after the full one
+    assert index.match_values("rents on the upper-east side?") == [
+        ("Neighborhood", "Upper East Side"), ("Neighborhood", "Lower East Side"),
+    ]
+
+
+def test_numbers_in_a_value_must_match_exactly():
+    index = make_index()
+    assert index.match_values("who lives at 12 Main St") == [("Address", "12 Main St")]
+    assert index.match_values("who lives at 13 Main St") == []
+
+
+def test_narrow_tables_keep_the_full_schema():
+    schema = make_index().prompt_schema("average monthly rent in SoHo")
+    assert not schema.pruned
+    assert len(schema.columns) == 5
+    assert schema.literals == [("Neighborhood", "SoHo")]
+
+
+def test_wide_tables_are_pruned_to_the_relevant_and_key_columns():
+    index = make_index(extra_columns=settings.SCHEMA_PRUNE_MIN_COLUMNS)
+    schema = index.prompt_schema("average monthly rent in SoHo")
+    assert schema.pruned
+    # The key columns come first, then the column named in the question
+    assert [column for column, _ in schema.columns] == ["Listing_ID", "Neighborhood", "Address", "Monthly_Rent"]
+
+
+def test_wide_table_question_matching_no_column_keeps_the_full_schema():
+    index = make_index(extra_columns=settings.SCHEMA_PRUNE_MIN_COLUMNS)
+    schema = index.prompt_schema("hello there")
+    assert not schema.pruned and len(schema.columns) == len(index.columns)
+
+
+def test_builder_drops_high_cardinality_text_columns(monkeypatch):
+    monkeypatch.setattr(settings, "SCHEMA_INDEX_MAX_DISTINCT_PER_COLUMN", 3)
+    builder = SchemaIndexBuilder([("City", "TEXT"), ("Notes", "TEXT"), ("Rent", "REAL")])
+    builder.add_rows(["City", "Notes", "Rent"], [("NYC", f"note {i}", 1000.0 + i) for i in range(10)])
+    assert builder.text_columns == ["City"]
+    assert builder.dropped == {"Notes"}
+    assert builder.build().match_values("rent in nyc") == [("City", "NYC")]
+
+
+def test_literals_are_rendered_as_quoted_comparisons():
+    assert format_literals([("Owner", "O'Brien")]) == """- "Owner" = 'O''Brien'"""
@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from app.core.security import create_session_token, decode_session_token
+
+
+def test_issued_token_decodes_to_its_claims():
+    claims = decode_session_token(create_session_token("u1", ttl_seconds=60))
+    assert claims["sub"] == "u1"
+    assert claims["exp"] > time.time()
+
+
+def test_expired_token_is_rejected():
+    assert decode_session_token(create_session_token("u1", ttl_seconds=-1)) is None
+
+
+@pytest.mark.parametrize("token", ["", "no-signature", ".signature-only", "é.é"])
+def test_malformed_token_is_rejected(token):
+    assert decode_session_token(token) is None
+
+
+def test_token_with_non_ascii_characters_is_rejected():
+    payload, _, signature = create_session_token("u1").partition(".")
+    assert decode_session_token(f"{payload}é.{signature}") is None
+    assert decode_session_token(f"{payload}.{signature}é") is None
+
+
+def test_forged_signature_is_rejected():
+    payload, _, _ = create_session_token("u1").partition(".")
+    _, _, signature = create_session_token("u2").partition(".")
+    assert decode_session_token(f"{payload}.{signature}") is None
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_with_the_same_key_share_one_run():
+    flights = SingleFlight("test")
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("key", work) for _ in range(5)), flights.do("other", work))
+
+    assert asyncio.run(main()) == ["result"] * 6
+    assert len(runs) == 2
+
+
+def test_exceptions_reach_every_caller_and_are_not_kept():
+    flights = SingleFlight("test")
+    runs = []
+
+    async def failing():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        results = await asyncio.gather(flights.do("key", failing), flights.do("key", failing), return_exceptions=True)
+        # The next call after the flight finished starts a new run
+        with pytest.raises(RuntimeError):
+            await flights.do("key", failing)
+        return results
+
+    results = asyncio.run(main())
+    assert [str(result) for result in results] == ["boom", "boom"]
+    assert len(runs) == 2
+
+
+def test_work_continues_while_any_caller_still_waits():
+    flights = SingleFlight("test")
+
+    async def main():
+        done = asyncio.Event()
+
+        async def work():
+            await asyncio.sleep(0.05)
+            done.set()
+            return "result"
+
+        leaving = asyncio.ensure_future(flights.do("key", work))
+        staying = asyncio.ensure_future(flights.do("key", work))
+        await asyncio.sleep(0.01)
+        leaving.cancel()
+        assert await staying == "result"
+        return leaving.cancelled(), done.is_set()
+
+    assert asyncio.run(main()) == (True, True)
+
+
+def test_work_is_cancelled_when_the_last_caller_leaves():
+    flights = SingleFlight("test")
+
+    async def main():
+        cancelled = asyncio.Event()
+
+        async def work():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.ensure_future(flights.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        # A new call does not join the cancelled flight
+        return await flights.do("key", lambda: asyncio.sleep(0, result="fresh"))
+
+    assert asyncio.run(main()) == "fresh"
@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+from app.core.config import settings
+from app.db.sqlite_pool import QueryTimeoutError, SQLiteReadPool
+
+
+def make_pool(tmp_path, rows: int) -> SQLiteReadPool:
+    path = str(tmp_path / "data.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE t (a INTEGER)")
+    connection.executemany("INSERT INTO t VALUES (?)", ((i,) for i in range(rows)))
+    connection.commit()
+    connection.close()
+    return SQLiteReadPool(path, size=1)
+
+
+def test_steps_run_grows_with_the_rows_a_query_reads(tmp_path):
+    pool = make_pool(tmp_path, 20_000)
+    with pool.connection() as connection:
+        connection.execute("SELECT a FROM t WHERE a = 7").fetchall()
+        full_scan = pool.steps_run(connection)
+        connection.execute("SELECT a FROM t WHERE rowid = 7").fetchall()
+        lookup = pool.steps_run(connection) - full_scan
+    assert full_scan >= 20_000
+    assert full_scan % settings.SQLITE_PROGRESS_HANDLER_STEPS == 0
+    assert lookup < full_scan
+    pool.close()
+
+
+def test_steps_are_forgotten_when_the_connection_is_released(tmp_path):
+    pool = make_pool(tmp_path, 10_000)
+    with pool.connection() as connection:
+        connection.execute("SELECT count(*) FROM t WHERE a > 0").fetchall()
+    assert pool.steps_run(connection) == 0
+    pool.close()
+
+
+def test_waiting_for_a_busy_pool_times_out(tmp_path):
+    pool = make_pool(tmp_path, 10)
+    with pool.connection():
+        with pytest.raises(QueryTimeoutError):
+            with pool.connection(timeout=0.05):
+                pass
+    # The connection is free again once its holder releases it
+    with pool.connection(timeout=0.05) as connection:
+        assert connection.execute("SELECT count(*) FROM t").fetchone() == (10,)
+    pool.close()
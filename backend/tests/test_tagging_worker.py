@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime
+
+from benchmarks.fake_mongo import FakeDatabase
+from app.services import tagging_worker as worker_module
+from app.services.tagging_worker import QUEUE_COLLECTION, TaggingWorker, enqueue_tagging
+
+
+async def queued_worker(session_ids):
+    db = FakeDatabase("test")
+    for session_id in session_ids:
+        await db["conversations"].insert_one({
+            "id": session_id, "user_id": "u1", "tags": [], "created_at": datetime.utcnow(),
+            "summary": "", "summarized_count": 0, "messages": [{"role": "user", "content": "hi"}],
+        })
+        await enqueue_tagging(db, session_id)
+    await db[QUEUE_COLLECTION].update_many({}, {"$set": {"due_at": datetime.utcnow()}})
+    worker = TaggingWorker()
+    worker.db = db
+    return worker, db
+
+
+def run_batch(monkeypatch, session_ids, tags_by_session):
+    async def fake_tags(histories):
+        return tags_by_session
+
+    monkeypatch.setattr(worker_module, "generate_tags_for_conversations", fake_tags)
+
+    async def scenario():
+        worker, db = await queued_worker(session_ids)
+        await worker._semaphore.acquire()
+        await worker._process_batch(await worker._claim_batch())
+        return await db[QUEUE_COLLECTION].find({}).to_list(None)
+
+    return asyncio.run(scenario())
+
+
+def test_failed_tagging_call_keeps_the_queue_entries(monkeypatch):
+    remaining = run_batch(monkeypatch, ["s1", "s2"], {})
+    assert sorted(item["session_id"] for item in remaining) == ["s1", "s2"]
+    assert all(item["claimed_until"] is not None for item in remaining)
+
+
+def test_only_tagged_sessions_leave_the_queue(monkeypatch):
+    remaining = run_batch(monkeypatch, ["s1", "s2"], {"s1": ["Resolved"]})
+    assert [item["session_id"] for item in remaining] == ["s2"]
+
+
+def test_stop_cancels_batches_in_flight(monkeypatch):
+    started = asyncio.Event()
+
+    async def slow_tags(histories):
+        started.set()
+        await asyncio.sleep(3600)
+
+    monkeypatch.setattr(worker_module, "generate_tags_for_conversations", slow_tags)
+
+    async def scenario():
+        worker, _ = await queued_worker(["s1"])
+        await worker._semaphore.acquire()
+        task = asyncio.create_task(worker._process_batch(await worker._claim_batch()))
+        worker._batch_tasks.add(task)
+        task.add_done_callback(worker._batch_tasks.discard)
+        await started.wait()
+        await worker.stop()
+        return task
+
+    task = asyncio.run(scenario())
+    assert task.cancelled()
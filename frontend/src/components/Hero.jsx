@@ -94,6 +94,8 @@ const AuthModal = ({ isOpen, onClose }) => {
         // --- FIX: Save user ID and a new session ID to localStorage ---
         localStorage.setItem('userId', userData.id);
         localStorage.setItem('sessionId', generateSessionId());
+        // The session token is required to chat with the uploaded data
+        localStorage.setItem('accessToken', userData.access_token);
         // ----------------------------------------------------------------
 
         toast({
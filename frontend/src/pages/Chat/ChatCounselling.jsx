@@ -73,6 +73,7 @@ const ChatCounselling = () => {
                 method: "POST",
                 headers: {
                     "Content-Type": "application/json",
+                    Authorization: `Bearer ${localStorage.getItem('accessToken')}`,
                 },
                 // Use the IDs retrieved from localStorage
                 body: JSON.stringify({